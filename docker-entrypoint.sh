@@ -8,6 +8,11 @@ python manage.py collectstatic --noinput -v 2
 echo "Applying database migrations..."
 python manage.py migrate
 
-# Start server
-echo "Starting server..."
-gunicorn --bind 0.0.0.0:8000 roteiro_ibiapaba.wsgi:application
\ No newline at end of file
+# Start server. SERVER_MODE=asgi runs the same app on uvicorn workers, where the
+# async views (itinerary generation, password reset) wait on I/O without holding a worker.
+# Both modes honour WEB_CONCURRENCY for the number of worker processes
+echo "Starting server (${SERVER_MODE:-wsgi})..."
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn --bind 0.0.0.0:8000 -k uvicorn.workers.UvicornWorker roteiro_ibiapaba.asgi:application
+fi
+exec gunicorn --bind 0.0.0.0:8000 roteiro_ibiapaba.wsgi:application
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Favorite
+from .models import Favorite, SimilarSpot
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'ponto_turistico', 'data_adicionado')
@@ -7,3 +7,9 @@ class FavoriteAdmin(admin.ModelAdmin):
     search_fields = ('usuario__nome', 'ponto_turistico__nome')
 
 admin.site.register(Favorite, FavoriteAdmin)
+
+class SimilarSpotAdmin(admin.ModelAdmin):
+    list_display = ('ponto_turistico', 'semelhante', 'score', 'calculado_em')
+    search_fields = ('ponto_turistico__nome', 'semelhante__nome')
+
+admin.site.register(SimilarSpot, SimilarSpotAdmin)
@@ -0,0 +1,68 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from tourist_spots.models import TouristSpot
+
+_state = threading.local()
+
+def apply(deltas):
+    """
+    Aplica ``{id do ponto: variação}`` a ``favoritos_count`` com expressões
+    ``F()``: uma consulta por valor de variação, atômica no banco. O contador
+    nunca fica negativo; desvios são corrigidos por ``reconcile``.
+    """
+    by_delta = defaultdict(list)
+    for spot_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(spot_id)
+    for delta, spot_ids in by_delta.items():
+        count = F('favoritos_count') + delta
+        TouristSpot.objects.filter(pk__in=spot_ids).update(favoritos_count=Greatest(count, 0) if delta < 0 else count)
+
+def adjust(spot_ids, delta):
+    """
+    Soma ``delta`` ao contador dos pontos. Dentro de ``batch()`` as variações
+    são acumuladas e aplicadas juntas no fim do bloco.
+    """
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        apply({spot_id: delta for spot_id in spot_ids})
+        return
+    for spot_id in spot_ids:
+        pending[spot_id] += delta
+
+@contextmanager
+def batch():
+    """
+    Agrupa as atualizações de contadores do bloco (inclusive as disparadas
+    pelos sinais de cada favorito removido) em poucas consultas.
+    """
+    if getattr(_state, 'pending', None) is not None:
+        yield
+        return
+    _state.pending = defaultdict(int)
+    try:
+        yield
+        pending = _state.pending
+    finally:
+        _state.pending = None
+    apply(pending)
+
+def reconcile():
+    """
+    Recalcula ``favoritos_count`` a partir da tabela de favoritos e retorna
+    o número de pontos cujo contador estava errado.
+    """
+    from .models import Favorite
+
+    counts = (
+        Favorite.objects.filter(ponto_turistico=OuterRef('pk'))
+        .values('ponto_turistico')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    actual = Coalesce(Subquery(counts), 0)
+    drifted = TouristSpot.objects.annotate(actual=actual).exclude(favoritos_count=F('actual'))
+    return TouristSpot.objects.filter(pk__in=drifted.values('pk')).update(favoritos_count=actual)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from favorites.recommendations import build, build_incremental
+
+class Command(BaseCommand):
+    help = (
+        'Calcula os pontos semelhantes (vizinhos por favoritos em comum) usados nas recomendações. '
+        'Use --incremental com frequência e o recálculo completo periodicamente (por exemplo, diariamente): '
+        'só ele reflete favoritos removidos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true', help='Recalcula apenas os pontos afetados por favoritos criados desde o último cálculo e os que os têm como vizinhos')
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            spots, pairs = build_incremental()
+            if spots is not None:
+                self.stdout.write(self.style.SUCCESS(f'{spots} pontos recalculados, {pairs} pares gravados.'))
+                return
+        else:
+            pairs = build()
+        self.stdout.write(self.style.SUCCESS(f'Recálculo completo: {pairs} pares gravados.'))
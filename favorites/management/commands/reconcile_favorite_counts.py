@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from favorites.counters import reconcile
+
+class Command(BaseCommand):
+    help = 'Recalcula o contador de favoritos (favoritos_count) dos pontos turísticos'
+
+    def handle(self, *args, **options):
+        fixed = reconcile()
+        self.stdout.write(self.style.SUCCESS(f'{fixed} contadores corrigidos.'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['usuario', 'data_adicionado', 'id'], name='favorite_usuario_data_id_idx'),
+        ),
+    ]
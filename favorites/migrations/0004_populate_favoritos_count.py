@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_favoritos_count(apps, schema_editor):
+    TouristSpot = apps.get_model('tourist_spots', 'TouristSpot')
+    Favorite = apps.get_model('favorites', 'Favorite')
+    counts = (
+        Favorite.objects.filter(ponto_turistico=OuterRef('pk'))
+        .values('ponto_turistico')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    TouristSpot.objects.update(favoritos_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0003_keyset_index'),
+        ('tourist_spots', '0008_touristspot_favoritos_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_favoritos_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0004_populate_favoritos_count'),
+        ('tourist_spots', '0008_touristspot_favoritos_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarSpot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('calculado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ponto_turistico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semelhantes', to='tourist_spots.touristspot')),
+                ('semelhante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semelhante_de', to='tourist_spots.touristspot')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ponto_turistico', '-score'], name='similarspot_ponto_score_idx')],
+                'unique_together': {('ponto_turistico', 'semelhante')},
+            },
+        ),
+    ]
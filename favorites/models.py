@@ -12,6 +12,27 @@ class Favorite(models.Model):
     
     class Meta:
         unique_together = ('usuario', 'ponto_turistico')
+        # Keyset pagination of a user's favorites, newest first
+        indexes = [models.Index(fields=['usuario', 'data_adicionado', 'id'], name='favorite_usuario_data_id_idx')]
         
     def __str__(self):
         return f"{self.usuario.nome} - {self.ponto_turistico.nome}"
+
+class SimilarSpot(models.Model):
+    """
+    Vizinho pré-calculado de um ponto turístico: pontos favoritados pelos
+    mesmos usuários, com a similaridade de cosseno entre eles. Gerado por
+    ``manage.py build_recommendations``.
+    """
+    ponto_turistico = models.ForeignKey(TouristSpot, on_delete=models.CASCADE, related_name='semelhantes')
+    semelhante = models.ForeignKey(TouristSpot, on_delete=models.CASCADE, related_name='semelhante_de')
+    score = models.FloatField()
+    calculado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('ponto_turistico', 'semelhante')
+        # A spot's neighbors, best first, in one index range scan
+        indexes = [models.Index(fields=['ponto_turistico', '-score'], name='similarspot_ponto_score_idx')]
+
+    def __str__(self):
+        return f"{self.ponto_turistico_id} -> {self.semelhante_id} ({self.score:.3f})"
@@ -0,0 +1,176 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Sum, Value, When
+from django.utils import timezone
+from tourist_spots import geo
+from tourist_spots.cache import bump_catalog_version
+from tourist_spots.images import annotate_cover
+from tourist_spots.models import TouristSpot
+from .models import Favorite, SimilarSpot
+
+def top_k():
+    return getattr(settings, 'RECOMMENDATION_TOP_K', 20)
+
+def requested_limit(request, default=10):
+    """
+    ``?limit=`` das recomendações, entre 1 e ``RECOMMENDATION_TOP_K``.
+    """
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        limit = default
+    return min(max(limit, 1), top_k())
+
+def _user_baskets(favorites):
+    """
+    Conjuntos de pontos favoritados por usuário (as linhas da matriz
+    usuário × ponto), limitados a ``RECOMMENDATION_MAX_USER_FAVORITES`` para
+    que um único usuário não domine o custo quadrático.
+    """
+    limit = getattr(settings, 'RECOMMENDATION_MAX_USER_FAVORITES', 500)
+    rows = favorites.order_by('usuario_id', '-data_adicionado').values_list('usuario_id', 'ponto_turistico_id')
+    for _, group in groupby(rows.iterator(chunk_size=5000), key=lambda row: row[0]):
+        yield [spot_id for _, spot_id in group][:limit]
+
+def compute_neighbors(spot_ids=None):
+    """
+    Calcula os ``RECOMMENDATION_TOP_K`` vizinhos por similaridade de cosseno
+    entre as colunas da matriz esparsa usuário × ponto.
+
+    A coocorrência (``AᵀA``) é acumulada percorrendo apenas os pares de pontos
+    de cada usuário, e a norma de cada coluna é a raiz do número de favoritos
+    do ponto. Com ``spot_ids`` apenas as linhas desses pontos são calculadas,
+    a partir dos usuários que os favoritaram.
+    Retorna ``{ponto: [(vizinho, score), ...]}``.
+    """
+    favorites = Favorite.objects.all()
+    if spot_ids is not None:
+        spot_ids = set(spot_ids)
+        favorites = favorites.filter(usuario__in=Favorite.objects.filter(ponto_turistico__in=spot_ids).values('usuario'))
+
+    cooccurrence = defaultdict(Counter)
+    for basket in _user_baskets(favorites):
+        targets = basket if spot_ids is None else [spot_id for spot_id in basket if spot_id in spot_ids]
+        for spot_id in targets:
+            row = cooccurrence[spot_id]
+            for other in basket:
+                if other != spot_id:
+                    row[other] += 1
+
+    involved = set(cooccurrence).union(*cooccurrence.values()) if cooccurrence else set()
+    totals = dict(
+        Favorite.objects.filter(ponto_turistico__in=involved)
+        .values('ponto_turistico').annotate(total=Count('pk')).values_list('ponto_turistico', 'total')
+    )
+    min_support = getattr(settings, 'RECOMMENDATION_MIN_SUPPORT', 1)
+    neighbors = {}
+    for spot_id, row in cooccurrence.items():
+        scores = (
+            (other, count / math.sqrt(totals[spot_id] * totals[other]))
+            for other, count in row.items() if count >= min_support
+        )
+        neighbors[spot_id] = heapq.nlargest(top_k(), scores, key=lambda item: (item[1], str(item[0])))
+    return neighbors
+
+def build(spot_ids=None):
+    """
+    Recalcula e grava os vizinhos (todos, ou só as linhas de ``spot_ids``)
+    em uma transação e invalida o cache do catálogo. Retorna o número de
+    pares gravados.
+    """
+    # Taken before reading favorites: build_incremental picks up whatever was
+    # favorited from here on, including during the computation
+    now = timezone.now()
+    neighbors = compute_neighbors(spot_ids)
+    rows = [
+        SimilarSpot(ponto_turistico_id=spot_id, semelhante_id=other, score=score, calculado_em=now)
+        for spot_id, items in neighbors.items()
+        for other, score in items
+    ]
+    with transaction.atomic():
+        stale = SimilarSpot.objects.all() if spot_ids is None else SimilarSpot.objects.filter(ponto_turistico__in=spot_ids)
+        stale.delete()
+        SimilarSpot.objects.bulk_create(rows, batch_size=1000)
+        transaction.on_commit(bump_catalog_version)
+    return len(rows)
+
+def build_incremental():
+    """
+    Atualiza apenas os pontos afetados pelos favoritos criados desde o último
+    cálculo: os pontos favoritados, os demais favoritos dos mesmos usuários
+    e os pontos que têm algum deles entre os vizinhos (o novo total de
+    favoritos muda a normalização desses scores). Favoritos gravados até
+    ``RECOMMENDATION_INCREMENTAL_OVERLAP`` segundos antes do último cálculo
+    são revistos, porque a data é definida antes do commit.
+    Remoções só são refletidas no recálculo completo, que deve rodar
+    periodicamente. Sem cálculo anterior, faz o recálculo completo.
+    Retorna ``(pontos recalculados, pares gravados)``.
+    """
+    last_run = SimilarSpot.objects.aggregate(last=Max('calculado_em'))['last']
+    if last_run is None:
+        return None, build()
+    overlap = timedelta(seconds=getattr(settings, 'RECOMMENDATION_INCREMENTAL_OVERLAP', 300))
+    users = Favorite.objects.filter(data_adicionado__gt=last_run - overlap).values('usuario')
+    spot_ids = set(Favorite.objects.filter(usuario__in=users).values_list('ponto_turistico_id', flat=True))
+    if not spot_ids:
+        return 0, 0
+    spot_ids |= set(SimilarSpot.objects.filter(semelhante__in=spot_ids).values_list('ponto_turistico_id', flat=True))
+    return len(spot_ids), build(spot_ids)
+
+def _summaries():
+    return annotate_cover(TouristSpot.objects.only('id', 'nome', 'categoria', 'cidade', 'latitude', 'longitude'))
+
+def similar_spots(spot_id, limit):
+    """
+    Vizinhos pré-calculados de um ponto, do mais para o menos semelhante, em
+    uma única consulta pelo índice ``(ponto_turistico, -score)``.
+    """
+    return list(
+        _summaries().filter(semelhante_de__ponto_turistico=spot_id)
+        .annotate(score=F('semelhante_de__score'), origem=Value('favoritos'))
+        .order_by('-score', 'pk')[:limit]
+    )
+
+def fallback_for_spot(spot, limit):
+    """
+    Para pontos sem vizinhos calculados (sem favoritos em comum com outros):
+    pontos próximos e da mesma categoria primeiro, depois os mais populares.
+    """
+    radius_km = getattr(settings, 'RECOMMENDATION_FALLBACK_RADIUS_KM', 25)
+    nearby = geo.cells_query(geo.cells_for_radius(spot.latitude, spot.longitude, radius_km))
+    same_category = Q(categoria=spot.categoria)
+    affinity = (
+        Case(When(nearby, then=Value(1)), default=Value(0), output_field=IntegerField())
+        + Case(When(same_category, then=Value(1)), default=Value(0), output_field=IntegerField())
+    )
+    return list(
+        _summaries().filter(nearby | same_category).exclude(pk=spot.pk)
+        .annotate(afinidade=affinity, origem=Value('proximidade'))
+        .order_by('-afinidade', '-favoritos_count', 'pk')[:limit]
+    )
+
+def recommend_for_user(user, limit):
+    """
+    Recomendações para um usuário: soma das similaridades dos vizinhos dos
+    seus favoritos, sem os pontos que ele já favoritou. Sem vizinhos
+    (usuário novo ou favoritos sem coocorrência), os mais populares.
+    """
+    favorited = Favorite.objects.filter(usuario=user).values('ponto_turistico')
+    spots = list(
+        _summaries().filter(semelhante_de__ponto_turistico__in=favorited)
+        .exclude(pk__in=favorited)
+        .annotate(score=Sum('semelhante_de__score'), origem=Value('favoritos'))
+        .order_by('-score', 'pk')[:limit]
+    )
+    if spots:
+        return spots
+    return list(
+        _summaries().exclude(pk__in=favorited)
+        .annotate(origem=Value('populares'))
+        .order_by('-favoritos_count', 'pk')[:limit]
+    )
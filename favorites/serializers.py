@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Favorite
-from tourist_spots.serializers import TouristSpotSerializer
+from tourist_spots.serializers import TouristSpotSerializer, TouristSpotSummarySerializer
 
 class FavoriteSerializer(serializers.ModelSerializer):
     """
@@ -14,4 +14,46 @@ class FavoriteSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'usuario', 'data_adicionado')
         extra_kwargs = {
             'ponto_turistico': {'help_text': 'ID do ponto turístico a ser favoritado'},
-        }
\ No newline at end of file
+        }
+
+class FavoriteCompactSerializer(serializers.ModelSerializer):
+    """
+    Favorito com apenas o resumo do ponto turístico (``?view=compact``).
+    """
+    ponto_turistico_resumo = TouristSpotSummarySerializer(source='ponto_turistico', read_only=True)
+    
+    class Meta:
+        model = Favorite
+        fields = ('id', 'ponto_turistico', 'ponto_turistico_resumo', 'data_adicionado')
+        read_only_fields = fields
+
+class FavoriteSyncSerializer(serializers.Serializer):
+    """
+    Sincronização de favoritos: o conjunto desejado completo (``ids``) ou as
+    alterações (``adicionar`` / ``remover``).
+    """
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, help_text='Conjunto completo de pontos favoritados desejado')
+    adicionar = serializers.ListField(child=serializers.UUIDField(), required=False, help_text='Pontos a adicionar aos favoritos')
+    remover = serializers.ListField(child=serializers.UUIDField(), required=False, help_text='Pontos a remover dos favoritos')
+    
+    def validate(self, attrs):
+        if 'ids' in attrs and ('adicionar' in attrs or 'remover' in attrs):
+            raise serializers.ValidationError('Envie ids ou adicionar/remover, não ambos.')
+        if not attrs:
+            raise serializers.ValidationError('Envie ids ou adicionar/remover.')
+        max_items = 1000
+        if any(len(values) > max_items for values in attrs.values()):
+            raise serializers.ValidationError(f'No máximo {max_items} pontos por sincronização.')
+        return attrs
+
+class RecommendedSpotSerializer(TouristSpotSummarySerializer):
+    """
+    Ponto recomendado: o resumo do ponto, a similaridade e a origem da
+    recomendação (``favoritos``, ``proximidade`` ou ``populares``).
+    """
+    score = serializers.FloatField(read_only=True, default=None, help_text='Similaridade calculada a partir dos favoritos (nula nas alternativas)')
+    origem = serializers.CharField(read_only=True, help_text='favoritos, proximidade ou populares')
+    
+    class Meta(TouristSpotSummarySerializer.Meta):
+        fields = TouristSpotSummarySerializer.Meta.fields + ('score', 'origem')
+        read_only_fields = fields
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import counters
+from .models import Favorite
+
+@receiver(post_save, sender=Favorite)
+def increment_favorite_count(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantém ``TouristSpot.favoritos_count`` ao criar favoritos. Inserções em
+    lote (``bulk_create``) não disparam o sinal e ajustam o contador por conta
+    própria.
+    """
+    if created and not raw:
+        counters.adjust([instance.ponto_turistico_id], 1)
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorite_count(sender, instance, **kwargs):
+    counters.adjust([instance.ponto_turistico_id], -1)
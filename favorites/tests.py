@@ -1,3 +1,237 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Max
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from tourist_spots.models import TouristSpot
+from tourist_spots.tests import create_spots
+from . import recommendations
+from .models import Favorite, SimilarSpot
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class FavoriteQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.favorites = [Favorite.objects.create(usuario=self.user, ponto_turistico=spot) for spot in create_spots(8)]
+
+    def test_list_within_budget(self):
+        response = self.client.get('/api/favorites/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 8)
+
+    def test_retrieve_within_budget(self):
+        response = self.client.get(f'/api/favorites/{self.favorites[0].id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_compact_list_within_budget(self):
+        response = self.client.get('/api/favorites/?view=compact')
+        self.assertEqual(response.status_code, 200)
+        item = response.data['results'][0]
+        self.assertEqual(set(item), {'id', 'ponto_turistico', 'ponto_turistico_resumo', 'data_adicionado'})
+        self.assertNotIn('descricao', item['ponto_turistico_resumo'])
+        self.assertIsNotNone(item['ponto_turistico_resumo']['capa'])
+
+    def test_ids_within_budget(self):
+        response = self.client.get('/api/favorites/ids/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['ids']), 8)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class FavoriteSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.spots = create_spots(4, images_per_spot=0)
+        Favorite.objects.create(usuario=self.user, ponto_turistico=self.spots[0])
+        Favorite.objects.create(usuario=self.user, ponto_turistico=self.spots[1])
+
+    def test_sync_to_desired_set(self):
+        desired = [str(self.spots[1].pk), str(self.spots[2].pk), str(self.spots[3].pk)]
+        response = self.client.post('/api/favorites/sync/', {'ids': desired}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(str(pk) for pk in response.data['ids']), sorted(desired))
+        self.assertEqual((response.data['adicionados'], response.data['removidos']), (2, 1))
+
+    def test_sync_changes_ignores_unknown_and_duplicate_ids(self):
+        unknown = '00000000-0000-0000-0000-000000000000'
+        response = self.client.post('/api/favorites/sync/', {
+            'adicionar': [str(self.spots[0].pk), str(self.spots[2].pk), unknown],
+            'remover': [str(self.spots[1].pk)],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['ids']), {self.spots[0].pk, self.spots[2].pk})
+
+    def test_sync_requires_a_body(self):
+        self.assertEqual(self.client.post('/api/favorites/sync/', {}, format='json').status_code, 400)
+
+    def test_duplicate_create_is_a_client_error(self):
+        response = self.client.post('/api/favorites/', {'ponto_turistico': str(self.spots[0].pk)}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class FavoriteCounterTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(email=f'turista{i}@example.com', password='senha-segura-123', nome='Turista')
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.spots = create_spots(3, images_per_spot=0)
+
+    def counts(self):
+        return [spot.favoritos_count for spot in TouristSpot.objects.filter(pk__in=[s.pk for s in self.spots]).order_by('nome')]
+
+    def test_create_and_delete_keep_the_counter(self):
+        favorite = Favorite.objects.create(usuario=self.users[1], ponto_turistico=self.spots[0])
+        self.client.post('/api/favorites/', {'ponto_turistico': str(self.spots[0].pk)}, format='json')
+        self.assertEqual(self.counts(), [2, 0, 0])
+        favorite.delete()
+        self.assertEqual(self.counts(), [1, 0, 0])
+
+    def test_deleting_the_same_favorite_twice_decrements_once(self):
+        Favorite.objects.create(usuario=self.users[1], ponto_turistico=self.spots[0])
+        favorite = Favorite.objects.create(usuario=self.users[0], ponto_turistico=self.spots[0])
+        self.assertEqual(self.client.delete(f'/api/favorites/{favorite.pk}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'/api/favorites/{favorite.pk}/').status_code, 404)
+        self.assertEqual(self.counts(), [1, 0, 0])
+
+        # A stale instance deleted again still fires post_delete; the counter stays non-negative
+        last = Favorite.objects.get()
+        stale = Favorite.objects.get()
+        last.delete()
+        stale.delete()
+        self.assertEqual(self.counts(), [0, 0, 0])
+
+    def test_sync_adjusts_counters(self):
+        Favorite.objects.create(usuario=self.users[0], ponto_turistico=self.spots[0])
+        response = self.client.post('/api/favorites/sync/', {'ids': [str(self.spots[1].pk), str(self.spots[2].pk)]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(), [0, 1, 1])
+
+    def test_spot_save_does_not_overwrite_counter(self):
+        stale = TouristSpot.objects.get(pk=self.spots[0].pk)
+        Favorite.objects.create(usuario=self.users[1], ponto_turistico=self.spots[0])
+        stale.nome = 'Ponto renomeado'
+        stale.save()
+        self.assertEqual(TouristSpot.objects.get(pk=self.spots[0].pk).favoritos_count, 1)
+
+    def test_reconcile_command_fixes_drift(self):
+        Favorite.objects.create(usuario=self.users[1], ponto_turistico=self.spots[2])
+        TouristSpot.objects.filter(pk=self.spots[2].pk).update(favoritos_count=7)
+        TouristSpot.objects.filter(pk=self.spots[1].pk).update(favoritos_count=3)
+        out = StringIO()
+        call_command('reconcile_favorite_counts', stdout=out)
+        self.assertIn('2 contadores corrigidos', out.getvalue())
+        self.assertEqual(self.counts(), [0, 0, 1])
+
+    def test_popular_ranks_by_favorites(self):
+        for i, user in enumerate(self.users):
+            for spot in self.spots[:i + 1]:
+                Favorite.objects.create(usuario=user, ponto_turistico=spot)
+        response = APIClient().get('/api/tourist-spots/popular/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([(item['nome'], item['favoritos_count']) for item in results], [('Ponto 0', 3), ('Ponto 1', 2)])
+        following = APIClient().get(response.data['next']).data['results']
+        self.assertEqual([item['nome'] for item in following], ['Ponto 2'])
+        ordered = APIClient().get('/api/tourist-spots/?ordering=-favoritos_count&expand=favoritos_count')
+        self.assertEqual([item['favoritos_count'] for item in ordered.data['results']], [3, 2, 1])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(email=f'turista{i}@example.com', password='senha-segura-123', nome='Turista')
+            for i in range(3)
+        ]
+        self.spots = create_spots(5, images_per_spot=1)
+        # Spots 0 and 1 are always favorited together; 2 only once with them; 4 never
+        baskets = [[0, 1, 2], [0, 1], [0, 1, 3]]
+        for user, basket in zip(self.users, baskets):
+            for index in basket:
+                Favorite.objects.create(usuario=user, ponto_turistico=self.spots[index])
+        recommendations.build()
+
+    def test_similar_spots_ranked_by_cosine(self):
+        response = self.client.get(f'/api/tourist-spots/{self.spots[0].pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['nome'] for item in response.data][:1], ['Ponto 1'])
+        self.assertAlmostEqual(response.data[0]['score'], 1.0)
+        self.assertEqual({item['origem'] for item in response.data}, {'favoritos'})
+        self.assertIsNotNone(response.data[0]['capa'])
+
+    def test_cold_start_spot_falls_back_to_nearby(self):
+        response = self.client.get(f'/api/tourist-spots/{self.spots[4].pk}/similar/?limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['origem'], 'proximidade')
+        self.assertNotIn(str(self.spots[4].pk), [str(item['id']) for item in response.data])
+        self.assertEqual(self.client.get('/api/tourist-spots/00000000-0000-0000-0000-000000000000/similar/').status_code, 404)
+
+    def test_personalized_recommendations_skip_favorites(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        response = client.get('/api/favorites/recommendations/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item['nome'] for item in response.data}, {'Ponto 2', 'Ponto 3'})
+
+    def test_new_user_gets_popular_spots(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(email='novo@example.com', password='senha-segura-123', nome='Novo'))
+        response = client.get('/api/favorites/recommendations/?limit=2')
+        self.assertEqual({(item['nome'], item['origem']) for item in response.data}, {('Ponto 0', 'populares'), ('Ponto 1', 'populares')})
+
+    @override_settings(RECOMMENDATION_INCREMENTAL_OVERLAP=0)
+    def test_incremental_build_updates_affected_spots(self):
+        Favorite.objects.create(usuario=self.users[0], ponto_turistico=self.spots[4])
+        out = StringIO()
+        call_command('build_recommendations', '--incremental', stdout=out)
+        # Spots 0, 1, 2 and 4 from the user's favorites, plus 3, which has 0 and 1 as neighbors
+        self.assertIn('5 pontos recalculados', out.getvalue())
+        self.assertTrue(SimilarSpot.objects.filter(ponto_turistico=self.spots[4], semelhante=self.spots[0]).exists())
+
+    def test_favorites_added_during_a_build_are_picked_up_next_time(self):
+        compute_neighbors = recommendations.compute_neighbors
+
+        def favorite_while_computing(spot_ids=None):
+            neighbors = compute_neighbors(spot_ids)
+            Favorite.objects.create(usuario=self.users[1], ponto_turistico=self.spots[4])
+            return neighbors
+
+        with mock.patch.object(recommendations, 'compute_neighbors', side_effect=favorite_while_computing):
+            recommendations.build()
+        affected, _ = recommendations.build_incremental()
+        self.assertGreater(affected, 0)
+        self.assertTrue(SimilarSpot.objects.filter(ponto_turistico=self.spots[4], semelhante=self.spots[0]).exists())
+
+    def snapshot(self):
+        return {(row.ponto_turistico_id, row.semelhante_id): round(row.score, 6) for row in SimilarSpot.objects.all()}
+
+    @override_settings(RECOMMENDATION_INCREMENTAL_OVERLAP=0)
+    def test_incremental_build_matches_a_full_rebuild(self):
+        # A new favorite of spot 2 alone changes how spot 0 and 1 score it
+        newcomer = User.objects.create_user(email='novo@example.com', password='senha-segura-123', nome='Novo')
+        Favorite.objects.create(usuario=newcomer, ponto_turistico=self.spots[2])
+        recommendations.build_incremental()
+        incremental = self.snapshot()
+        recommendations.build()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_favorites_stamped_before_the_last_build_are_picked_up(self):
+        last_run = SimilarSpot.objects.aggregate(last=Max('calculado_em'))['last']
+        Favorite.objects.create(usuario=self.users[1], ponto_turistico=self.spots[4], data_adicionado=last_run - timedelta(seconds=1))
+        recommendations.build_incremental()
+        self.assertTrue(SimilarSpot.objects.filter(ponto_turistico=self.spots[4], semelhante=self.spots[0]).exists())
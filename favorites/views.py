@@ -1,11 +1,20 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from tourist_spots.images import annotate_cover
+from tourist_spots.models import TouristSpot
+from . import counters, recommendations
 from .models import Favorite
-from .serializers import FavoriteSerializer
+from .serializers import FavoriteCompactSerializer, FavoriteSerializer, FavoriteSyncSerializer, RecommendedSpotSerializer
+from roteiro_ibiapaba.pagination import KeysetPagination
+from roteiro_ibiapaba.query_budget import QueryBudgetMixin
+from roteiro_ibiapaba.routers import pin_user
 
-class FavoriteViewSet(viewsets.ModelViewSet):
+class FavoriteViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     """
     API endpoint para gerenciar pontos turísticos favoritos do usuário.
     
@@ -23,12 +32,41 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     """
     serializer_class = FavoriteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    # sync: user lock, read, spot check, insert, delete (select + delete, for the
+    # counter signals), re-read and one counter UPDATE per delta; plus
+    # SAVEPOINT/RELEASE when already inside a transaction (tests)
+    query_budget = {'list': 2, 'retrieve': 2, 'ids': 1, 'sync': 11, 'recommendations': 2}
+    
+    def is_compact(self):
+        return self.action in ('list', 'retrieve') and self.request.query_params.get('view') == 'compact'
     
     def get_queryset(self):
         """
         Retorna apenas os favoritos do usuário autenticado.
+        
+        Os pontos e suas imagens vêm em um número fixo de consultas; no modo
+        compacto, apenas as colunas do resumo e a capa de cada ponto.
+        """
+        queryset = Favorite.objects.filter(usuario=self.request.user).order_by('-data_adicionado')
+        if self.is_compact():
+            summary = annotate_cover(TouristSpot.objects.only('id', 'nome', 'categoria', 'cidade', 'latitude', 'longitude'))
+            return queryset.only('id', 'ponto_turistico', 'data_adicionado').prefetch_related(
+                Prefetch('ponto_turistico', queryset=summary)
+            )
+        return queryset.select_related('ponto_turistico').prefetch_related('ponto_turistico__imagens')
+    
+    def lock_user(self, user):
+        """
+        Serializa as escritas de favoritos de um mesmo usuário, para que os
+        contadores de favoritos dos pontos reflitam exatamente o que foi gravado.
         """
-        return Favorite.objects.filter(usuario=self.request.user)
+        type(user).objects.select_for_update().filter(pk=user.pk).exists()
+    
+    def get_serializer_class(self):
+        if self.is_compact():
+            return FavoriteCompactSerializer
+        return super().get_serializer_class()
     
     def perform_create(self, serializer):
         """
@@ -37,7 +75,10 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         serializer.save(usuario=self.request.user)
     
     @swagger_auto_schema(
-        operation_description="Retorna uma lista de todos os pontos turísticos favoritados pelo usuário autenticado"
+        operation_description="Retorna uma lista de todos os pontos turísticos favoritados pelo usuário autenticado",
+        manual_parameters=[
+            openapi.Parameter('view', openapi.IN_QUERY, description="compact: apenas o resumo de cada ponto (sem descrição e imagens)", type=openapi.TYPE_STRING),
+        ]
     )
     def list(self, request, *args, **kwargs):
         """
@@ -45,6 +86,37 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         """
         return super().list(request, *args, **kwargs)
     
+    @swagger_auto_schema(
+        operation_description="Retorna os ids de todos os pontos turísticos favoritados pelo usuário autenticado",
+        responses={200: "Lista de ids em 'ids'"}
+    )
+    @action(detail=False, methods=['get'])
+    def ids(self, request):
+        """
+        Retorna, sem paginação, os ids dos pontos favoritados (uma única
+        consulta sobre o índice de favoritos), para o app marcar os favoritos
+        em qualquer lista.
+        """
+        ids = Favorite.objects.filter(usuario=request.user).values_list('ponto_turistico_id', flat=True)
+        return Response({'ids': list(ids)})
+    
+    @swagger_auto_schema(
+        operation_description="Recomenda pontos turísticos a partir dos favoritos do usuário autenticado",
+        manual_parameters=[
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Número de pontos (padrão 10, máximo RECOMMENDATION_TOP_K)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: RecommendedSpotSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    def recommendations(self, request):
+        """
+        Pontos semelhantes aos favoritos do usuário, ordenados pela soma das
+        similaridades pré-calculadas (uma consulta). Sem vizinhos, os pontos
+        mais populares que o usuário ainda não favoritou.
+        """
+        spots = recommendations.recommend_for_user(request.user, recommendations.requested_limit(request))
+        return Response(RecommendedSpotSerializer(spots, many=True, context=self.get_serializer_context()).data)
+    
     @swagger_auto_schema(
         operation_description="Adiciona um ponto turístico aos favoritos do usuário autenticado",
         request_body=openapi.Schema(
@@ -67,12 +139,70 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         """
         # Check if the favorite already exists
         ponto_turistico_id = request.data.get('ponto_turistico')
+        duplicate = Response(
+            {"detail": "Este ponto turístico já está em seus favoritos."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
         if Favorite.objects.filter(usuario=request.user, ponto_turistico_id=ponto_turistico_id).exists():
-            return Response(
-                {"detail": "Este ponto turístico já está em seus favoritos."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        return super().create(request, *args, **kwargs)
+            return duplicate
+        try:
+            # A concurrent request may insert the same favorite after the check above
+            with transaction.atomic():
+                self.lock_user(request.user)
+                response = super().create(request, *args, **kwargs)
+        except IntegrityError:
+            return duplicate
+        pin_user(request.user)
+        return response
+    
+    @swagger_auto_schema(
+        operation_description="Sincroniza os favoritos do usuário com um conjunto de pontos (ou uma lista de alterações)",
+        request_body=FavoriteSyncSerializer,
+        responses={
+            200: "Ids resultantes em 'ids', com o número de adicionados e removidos",
+            400: "Corpo inválido"
+        }
+    )
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Aplica de uma vez o conjunto de favoritos mantido pelo app (por exemplo,
+        offline).
+        
+        Com ``ids`` os favoritos passam a ser exatamente esse conjunto; com
+        ``adicionar``/``remover`` apenas essas alterações são aplicadas. A
+        diferença é calculada no servidor e aplicada em uma transação com um
+        ``bulk_create`` (conflitos ignorados, então requisições concorrentes não
+        falham) e um único ``DELETE``. Ids de pontos inexistentes são ignorados.
+        Os contadores ``favoritos_count`` dos pontos afetados são atualizados
+        com um ``UPDATE`` agrupado por variação.
+        """
+        serializer = FavoriteSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        favorites = Favorite.objects.filter(usuario=request.user)
+        
+        with transaction.atomic(), counters.batch():
+            self.lock_user(request.user)
+            current = set(favorites.values_list('ponto_turistico_id', flat=True))
+            if 'ids' in data:
+                to_add, to_remove = set(data['ids']) - current, current - set(data['ids'])
+            else:
+                to_add = set(data.get('adicionar', [])) - current
+                to_remove = set(data.get('remover', [])) & current
+            if to_add:
+                to_add = set(TouristSpot.objects.filter(pk__in=to_add).values_list('pk', flat=True))
+                Favorite.objects.bulk_create(
+                    [Favorite(usuario=request.user, ponto_turistico_id=spot_id) for spot_id in to_add],
+                    ignore_conflicts=True
+                )
+                # bulk_create sends no post_save; the user lock makes to_add exactly what was inserted
+                counters.adjust(to_add, 1)
+            removed = favorites.filter(ponto_turistico_id__in=to_remove).delete()[0] if to_remove else 0
+            ids = list(favorites.order_by('-data_adicionado').values_list('ponto_turistico_id', flat=True))
+        
+        pin_user(request.user)
+        return Response({'ids': ids, 'adicionados': len(to_add), 'removidos': removed})
     
     @swagger_auto_schema(
         operation_description="Retorna os detalhes de um favorito específico"
@@ -89,5 +219,13 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """
         Remove um ponto turístico dos favoritos do usuário autenticado.
+        
+        O favorito é lido depois da trava do usuário: um segundo pedido
+        concorrente para o mesmo favorito recebe 404 em vez de decrementar o
+        contador outra vez.
         """
-        return super().destroy(request, *args, **kwargs)
+        with transaction.atomic():
+            self.lock_user(request.user)
+            response = super().destroy(request, *args, **kwargs)
+        pin_user(request.user)
+        return response
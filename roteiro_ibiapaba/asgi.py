@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'roteiro_ibiapaba.settings')
 
 application = get_asgi_application()
+
+# Load the revoked token filter before the first refresh request
+from users.revocation import revoked_tokens  # noqa: E402
+
+revoked_tokens.warm()
@@ -0,0 +1,37 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+class AsyncAPIView(APIView):
+    """
+    ``APIView`` cujos handlers (``async def post`` etc.) são corrotinas.
+
+    Sob ASGI a requisição não ocupa uma thread enquanto o handler aguarda E/S
+    (modelo de linguagem, SMTP); sob WSGI o Django executa a view com
+    ``async_to_sync`` e ela continua funcionando. Autenticação, permissões e
+    throttling são síncronos no DRF (podem consultar o banco) e rodam na
+    thread do ORM antes do handler.
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,51 @@
+import dj_database_url
+
+def database_config(url, conn_max_age=60, pool=False, statement_timeout=None, connect_timeout=None):
+    """
+    Configuração de uma conexão a partir de uma URL (``postgres://...``,
+    ``sqlite:///...``), com verificação da conexão antes de reutilizá-la.
+
+    Com ``pool`` o PostgreSQL usa o pool de conexões do Django (exige
+    psycopg 3 e ``CONN_MAX_AGE = 0``); senão, cada thread mantém sua conexão
+    aberta por ``conn_max_age`` segundos. ``statement_timeout`` (em
+    milissegundos) e ``connect_timeout`` (em segundos) só valem para o
+    PostgreSQL.
+    """
+    config = dj_database_url.parse(url, conn_max_age=0 if pool else conn_max_age, conn_health_checks=True)
+    if config['ENGINE'] != 'django.db.backends.postgresql':
+        return config
+    options = config.setdefault('OPTIONS', {})
+    if pool:
+        options['pool'] = True
+    if statement_timeout:
+        options['options'] = f'-c statement_timeout={int(statement_timeout)}'
+    if connect_timeout:
+        options['connect_timeout'] = int(connect_timeout)
+    return config
+
+def databases_from_env(environ, default_url, server_mode='wsgi', management_command=False):
+    """
+    ``DATABASES`` a partir das variáveis de ambiente: ``DATABASE_URL`` para o
+    banco principal e, opcionalmente, ``DATABASE_REPLICA_URL`` para uma réplica
+    de leitura (alias ``replica``, usada por ``roteiro_ibiapaba.routers``).
+
+    Comandos de gerenciamento (migrações, criação de índices, recálculos) não
+    têm limite de tempo por consulta, a menos que
+    ``DATABASE_STATEMENT_TIMEOUT`` seja definida.
+    """
+    # Under ASGI each sync_to_async call may run on a different thread, so
+    # persistent per-thread connections would pile up; prefer the pool there
+    conn_max_age = int(environ.get('DATABASE_CONN_MAX_AGE', 0 if server_mode == 'asgi' else 60))
+    options = {
+        'conn_max_age': conn_max_age,
+        'pool': environ.get('DATABASE_POOL', 'False') == 'True',
+        'statement_timeout': environ.get('DATABASE_STATEMENT_TIMEOUT', 0 if management_command else 30000),
+        'connect_timeout': environ.get('DATABASE_CONNECT_TIMEOUT', 5),
+    }
+    databases = {'default': database_config(environ.get('DATABASE_URL', default_url), **options)}
+    if environ.get('DATABASE_REPLICA_URL'):
+        replica = database_config(environ['DATABASE_REPLICA_URL'], **options)
+        # Tests run against the primary's test database through this alias
+        replica['TEST'] = {'MIRROR': 'default'}
+        databases['replica'] = replica
+    return databases
@@ -0,0 +1,153 @@
+import hashlib
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+HASH_LENGTH = 12
+# name.<hash>.ext, optionally followed by the suffix FileSystemStorage adds on collisions
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{%d}(_[A-Za-z0-9]{7})?\.[^./]+$' % HASH_LENGTH)
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """
+    Storage de mídia que inclui no nome do arquivo o hash do conteúdo
+    (``foto.3f2a9c1b0d4e.jpg``). Como um nome nunca passa a apontar para outro
+    conteúdo, as URLs podem ser servidas com ``Cache-Control: immutable``.
+    """
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        # chunks() rewinds the file, so the content can be read again below
+        for chunk in content.chunks():
+            digest.update(chunk)
+        root, ext = os.path.splitext(name)
+        hashed = self.get_available_name(f"{root}.{digest.hexdigest()[:HASH_LENGTH]}{ext}")
+        return super()._save(hashed, content)
+
+def is_hashed(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+def cache_control(name):
+    if is_hashed(name):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+
+class RangeFile:
+    """
+    Expõe apenas ``length`` bytes de um arquivo a partir de ``start``, para
+    respostas 206 com ``FileResponse``.
+    """
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.file = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+def parse_range(header, size):
+    """
+    Interpreta um cabeçalho ``Range`` de um único intervalo. Retorna
+    ``(início, fim)`` inclusivos, ``None`` para ignorá-lo ou levanta
+    ``ValueError`` se o intervalo não puder ser atendido.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: the last N bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve arquivos de ``MEDIA_ROOT`` conforme ``MEDIA_SERVE_MODE``:
+
+    - ``x-accel``: delega o envio ao nginx (``X-Accel-Redirect`` para
+      ``MEDIA_ACCEL_REDIRECT_PREFIX``);
+    - ``x-sendfile``: delega ao Apache/lighttpd (``X-Sendfile``);
+    - ``django``: ``FileResponse`` (sendfile do servidor WSGI quando
+      disponível) com ``ETag``, ``If-None-Match`` e requisições ``Range``.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    if mode in ('x-accel', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel':
+            response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/') + path
+        else:
+            response['X-Sendfile'] = fullpath
+        response['Cache-Control'] = cache_control(path)
+        return response
+
+    stat = os.stat(fullpath)
+    etag = quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+    last_modified = int(stat.st_mtime)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        if isinstance(not_modified, HttpResponseNotModified):
+            not_modified['Cache-Control'] = cache_control(path)
+        return not_modified
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    # A stale If-Range means the client's partial copy is outdated: send everything
+    if range_header and request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    f = open(fullpath, 'rb')
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(RangeFile(f, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(f, content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control(path)
+    return response
+
+def media_urlpatterns():
+    """
+    Rotas de mídia. Com ``MEDIA_SERVE_MODE = 'off'`` (mídia servida pelo
+    servidor web ou CDN diretamente) nenhuma rota é registrada.
+    """
+    if getattr(settings, 'MEDIA_SERVE_MODE', 'django') == 'off':
+        return []
+    prefix = settings.MEDIA_URL.lstrip('/')
+    return [re_path(r'^%s(?P<path>.+)$' % re.escape(prefix), serve_media, name='media')]
@@ -0,0 +1,211 @@
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import and_, or_
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder truncates datetimes to milliseconds; cursors need exact values
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sem ``COUNT(*)`` nem ``OFFSET``.
+
+    A posição é dada pelos valores das colunas de ordenação do último item
+    mais o ``id`` como desempate, então cada página é uma busca por intervalo
+    no índice composto ``(campo, id)``, não importa quão longe esteja.
+    A ordenação é a da queryset já filtrada (``?ordering=``, relevância da
+    busca) ou ``ordering``. O cliente escolhe o tamanho da página com
+    ``?page_size=`` até ``max_page_size``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    ordering = ('-data_criacao',)
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Triplas ``(campo, decrescente, nulos no fim)`` da ordenação, sempre
+        terminando em ``pk``. ``nulos no fim`` é ``None`` para colunas sem
+        nulos; em campos que aceitam nulos, vale o ``nulls_first``/``nulls_last``
+        pedido ou, sem ele, nulos no fim, aplicado explicitamente para que a
+        ordem não dependa do banco.
+        """
+        terms = queryset.query.order_by or self.ordering
+        ordering = []
+        for term in terms:
+            if isinstance(term, OrderBy) and isinstance(term.expression, F):
+                nulls_last = True if term.nulls_last else False if term.nulls_first else None
+                ordering.append((term.expression.name, term.descending, nulls_last))
+            elif isinstance(term, str) and term != '?':
+                ordering.append((term.lstrip('-'), term.startswith('-'), None))
+            else:
+                raise ValueError(f'Ordenação não suportada pela paginação por cursor: {term!r}')
+        ordering = [
+            (name, desc, True if nulls_last is None and self.is_nullable(queryset.model, name) else nulls_last)
+            for name, desc, nulls_last in ordering
+        ]
+        names = [name for name, _, _ in ordering]
+        if 'pk' not in names and 'id' not in names:
+            ordering.append(('pk', ordering[-1][1] if ordering else False, None))
+        return ordering
+
+    def is_nullable(self, model, name):
+        field = self.get_field(model, name)
+        return field is not None and field.null
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_fields = self.get_ordering(queryset)
+        self.signature = ','.join(
+            ('-' if desc else '') + name + ('' if nulls_last is None else ':nl' if nulls_last else ':nf')
+            for name, desc, nulls_last in self.ordering_fields
+        )
+
+        position, self.reverse = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, self.reverse))
+
+        order_by = []
+        for name, desc, nulls_last in self.ordering_fields:
+            nulls = {}
+            if nulls_last is not None:
+                # Walking backwards flips where the nulls are
+                nulls = {'nulls_last': True} if nulls_last != self.reverse else {'nulls_first': True}
+            order_by.append(getattr(F(name), 'asc' if desc == self.reverse else 'desc')(**nulls))
+        results = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = results
+        return results
+
+    def position_filter(self, values, reverse):
+        """
+        Comparação de tupla ``(c1, c2, ...) > (v1, v2, ...)`` expandida em
+        ``c1 > v1 OR (c1 = v1 AND c2 > v2) OR ...``, respeitando a direção de
+        cada coluna e a posição dos nulos.
+        """
+        clauses = []
+        for i, (name, desc, nulls_last) in enumerate(self.ordering_fields):
+            equal = [self.equal_to(prev, values[j]) for j, (prev, _, _) in enumerate(self.ordering_fields[:i])]
+            after = self.after(name, 'gt' if desc == reverse else 'lt', values[i], None if nulls_last is None else nulls_last != reverse)
+            if after is not None:
+                clauses.append(reduce(and_, equal + [after]))
+        return reduce(or_, clauses) if clauses else Q(pk__in=[])
+
+    def equal_to(self, name, value):
+        return Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+
+    def after(self, name, lookup, value, nulls_at_end):
+        """
+        Linhas depois de ``value`` na coluna ``name`` no sentido percorrido, ou
+        ``None`` se não houver nenhuma.
+        """
+        if nulls_at_end is None:
+            return Q(**{f'{name}__{lookup}': value})
+        if value is None:
+            return None if nulls_at_end else Q(**{f'{name}__isnull': False})
+        after = Q(**{f'{name}__{lookup}': value})
+        return after | Q(**{f'{name}__isnull': True}) if nulls_at_end else after
+
+    def item_position(self, item):
+        values = []
+        for name, _, _ in self.ordering_fields:
+            value = item
+            for part in name.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, item, reverse):
+        payload = json.dumps({'o': self.signature, 'v': self.item_position(item), 'r': reverse}, cls=CursorEncoder)
+        cursor = urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if payload['o'] != self.signature or len(payload['v']) != len(self.ordering_fields):
+                raise ValueError(cursor)
+            values = [self.to_python(model, name, value) for (name, _, _), value in zip(self.ordering_fields, payload['v'])]
+            return values, bool(payload['r'])
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_field(self, model, name):
+        parts = name.split('__')
+        try:
+            for part in parts[:-1]:
+                model = model._meta.get_field(part).related_model
+            return model._meta.pk if parts[-1] == 'pk' else model._meta.get_field(parts[-1])
+        except (AttributeError, FieldDoesNotExist):
+            # Annotations such as search_rank
+            return None
+
+    def to_python(self, model, name, value):
+        field = self.get_field(model, name)
+        if field is None or value is None:
+            # Annotations are plain JSON numbers
+            return value
+        return field.to_python(value)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,65 @@
+import logging
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Levantada quando uma view ultrapassa seu orçamento de consultas e
+    ``QUERY_BUDGET_STRICT`` está ativo (suíte de testes).
+    """
+
+class QueryCounter:
+    """
+    Wrapper de execução que conta as consultas SQL enviadas ao banco.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+class QueryBudgetMixin:
+    """
+    Mixin para views DRF que declara um número máximo de consultas por requisição.
+
+    ``query_budget`` pode ser um inteiro (vale para toda a view) ou um dicionário
+    indexado pela action do viewset (``list``, ``retrieve``...) ou, em APIViews,
+    pelo método HTTP em minúsculas. Quando o orçamento é ultrapassado, um aviso é
+    registrado no log; com ``QUERY_BUDGET_STRICT = True`` a requisição falha com
+    ``QueryBudgetExceeded``, o que torna os N+1 visíveis nos testes.
+    """
+    query_budget = None
+
+    def get_query_budget(self):
+        budget = self.query_budget
+        if isinstance(budget, dict):
+            key = getattr(self, 'action', None) or self.request.method.lower()
+            return budget.get(key)
+        return budget
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = super().dispatch(request, *args, **kwargs)
+        self.check_query_budget(counter.count, response)
+        return response
+
+    def check_query_budget(self, count, response):
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(count)
+        budget = self.get_query_budget()
+        if budget is None or count <= budget:
+            return
+        message = (
+            f'{self.__class__.__name__} executou {count} consultas em '
+            f'{self.request.method} {self.request.path} (orçamento: {budget})'
+        )
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
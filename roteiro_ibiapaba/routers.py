@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = ContextVar('replica_reads', default=None)
+
+def replica_alias():
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+@contextmanager
+def read_from_replica():
+    """
+    Envia à réplica as leituras feitas dentro do bloco (também serve como
+    decorador de views). Depois de uma escrita no bloco, as leituras voltam ao
+    banco principal para que a própria requisição veja o que gravou.
+    """
+    token = _replica_reads.set({'wrote': False})
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+def use_primary():
+    """
+    Faz as próximas leituras do bloco ``read_from_replica`` atual irem ao
+    banco principal.
+    """
+    state = _replica_reads.get()
+    if state is not None:
+        state['wrote'] = True
+
+def _pin_key(user):
+    return f'replica:pin:{user.pk}'
+
+def _pin_cache():
+    # Pins must be seen by every process, so they live in a shared cache
+    return caches[getattr(settings, 'DATABASE_REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+def pin_user(user):
+    """
+    Mantém no banco principal, por ``DATABASE_REPLICA_MAX_LAG`` segundos, as
+    leituras do usuário que acabou de gravar dados que ele mesmo verá (por
+    exemplo, ``is_favorited``), até a réplica alcançá-las.
+    """
+    max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 10)
+    if max_lag and replica_alias() is not None:
+        _pin_cache().set(_pin_key(user), 1, max_lag)
+
+def is_pinned(user):
+    return bool(user.is_authenticated and replica_alias() is not None and _pin_cache().get(_pin_key(user)))
+
+class PrimaryReplicaRouter:
+    """
+    Escritas sempre no banco principal; leituras na réplica apenas dentro de
+    ``read_from_replica`` (views de leitura do catálogo e documentação), fora
+    de transações e se ``DATABASES`` tiver o alias da réplica.
+    """
+    def db_for_read(self, model, **hints):
+        state = _replica_reads.get()
+        if state is None or state['wrote'] or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _replica_reads.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema through replication
+        if db == replica_alias():
+            return False
+        return None
+
+class ReplicaReadMixin:
+    """
+    Mixin para viewsets cujas actions em ``replica_actions`` leem da réplica
+    (ver ``PrimaryReplicaRouter``). Usuários com gravações recentes
+    (``pin_user``) leem do banco principal.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Authentication has run by now
+        if is_pinned(request.user):
+            use_primary()
+
+    def use_replica(self, request, action):
+        return action in self.replica_actions and replica_alias() is not None
+
+    def dispatch(self, request, *args, **kwargs):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        if not self.use_replica(request, action):
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
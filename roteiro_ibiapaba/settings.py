@@ -1,6 +1,8 @@
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
+from roteiro_ibiapaba.database import databases_from_env
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -37,16 +39,47 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
-# Use WhiteNoise for static files in production
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
+# Use WhiteNoise for static files in production. Uploaded media get content-hashed
+# names so their URLs can be cached forever (Cache-Control: immutable).
+STORAGES = {
+    'default': {'BACKEND': 'roteiro_ibiapaba.media.HashedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedStaticFilesStorage'},
+}
 WHITENOISE_USE_FINDERS = True
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# How media are served (roteiro_ibiapaba.media.serve_media):
+#   'django'     FileResponse with ETag/conditional and Range support
+#   'x-accel'    nginx sends the file (internal location at MEDIA_ACCEL_REDIRECT_PREFIX)
+#   'x-sendfile' Apache/lighttpd send the file
+#   'off'        the web server or CDN serves MEDIA_URL itself; no Django route
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Cache lifetime for media without a content hash in the name (older uploads)
+MEDIA_CACHE_MAX_AGE = 60 * 60
 
 # Creating a Superuser in Docker Container
 
+# Database: DATABASE_URL (postgres://... or sqlite:///...), persistent connections
+# checked before reuse (DATABASE_CONN_MAX_AGE seconds, 0 under SERVER_MODE=asgi) or
+# DATABASE_POOL=True for Django's psycopg 3 pool, DATABASE_STATEMENT_TIMEOUT in ms
+# (30 s for the web server; unset means no limit for manage.py commands such as migrate).
+# DATABASE_REPLICA_URL adds a read replica used by the catalog views (see
+# roteiro_ibiapaba/routers.py); two SQLite files can stand in for both locally.
+DATABASES = databases_from_env(
+    os.environ, f"sqlite:///{BASE_DIR / 'db.sqlite3'}", server_mode=os.environ.get('SERVER_MODE', 'wsgi'),
+    management_command=Path(sys.argv[0]).name == 'manage.py',
+)
+DATABASE_ROUTERS = ['roteiro_ibiapaba.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+# Seconds after a catalog change during which catalog reads stay on the primary
+DATABASE_REPLICA_MAX_LAG = int(os.environ.get('DATABASE_REPLICA_MAX_LAG', 10))
+# ...and during which a user who just favorited reads from the primary; the pin is
+# kept in this cache, which must be shared by all processes in production
+DATABASE_REPLICA_PIN_CACHE_ALIAS = 'catalog'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -56,15 +89,60 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     # Change the default permission class to allow any user
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    # Per client IP, counted in the default cache (per process unless it is shared)
+    'DEFAULT_THROTTLE_RATES': {
+        'password_reset': os.environ.get('PASSWORD_RESET_THROTTLE_RATE', '5/hour'),
+    },
+}
+
+# Caches. The catalog cache holds anonymous tourist spot responses and is
+# invalidated by a version counter (see tourist_spots/cache.py). Local memory is
+# per process; use a shared backend with several workers, e.g.
+#   CATALOG_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   CATALOG_CACHE_LOCATION=/var/tmp/roteiro_catalog_cache
+# or django.core.cache.backends.redis.RedisCache with redis://host:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': os.environ.get('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
 }
+CATALOG_CACHE_ALIAS = 'catalog'
+# Upper bound on how long stale versions linger in the backend
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24))
+# Favorite counters don't bump the catalog version; responses showing them expire sooner
+POPULAR_CACHE_TIMEOUT = int(os.environ.get('POPULAR_CACHE_TIMEOUT', 300))
+
+# Co-favorite recommendations, rebuilt by `manage.py build_recommendations`
+# (schedule a full run nightly and --incremental runs in between)
+RECOMMENDATION_TOP_K = 20
+RECOMMENDATION_MAX_USER_FAVORITES = 500
+RECOMMENDATION_MIN_SUPPORT = int(os.environ.get('RECOMMENDATION_MIN_SUPPORT', 1))
+RECOMMENDATION_FALLBACK_RADIUS_KM = 25
+# `build_recommendations --incremental` re-reads favorites stamped this many seconds
+# before the last build (stamped before commit); removals need the full rebuild
+RECOMMENDATION_INCREMENTAL_OVERLAP = 300
+
+# Query budgets (see roteiro_ibiapaba/query_budget.py): exceeding a view's budget
+# logs a warning; the test suite turns it into a failure with QUERY_BUDGET_STRICT
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'False') == 'True'
+
+# Search backend for ?search= on tourist spots: 'postgres' (full-text search) or
+# 'inverted_index' (portable). When unset, Postgres is used if it is the database.
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or None
 
 # JWT settings
 SIMPLE_JWT = {
@@ -80,11 +158,88 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
 }
 
-# Email settings
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# Revoked refresh tokens (see users/revocation.py): an in-process Bloom filter
+# answers most refreshes without touching the blacklist table. Other processes'
+# logouts are seen at once only with a shared cache (Redis, memcached) behind
+# REVOCATION_CACHE_ALIAS; with the per-process LocMemCache they are seen within
+# REVOCATION_SYNC_INTERVAL seconds. Each sync re-reads the last REVOCATION_SYNC_OVERLAP
+# blacklist rows, since transactions may commit out of id order.
+# Purge expired rows daily with `manage.py purge_expired_tokens`.
+REVOCATION_CACHE_ALIAS = 'default'
+REVOCATION_SYNC_INTERVAL = int(os.environ.get('REVOCATION_SYNC_INTERVAL', 5))
+REVOCATION_SYNC_OVERLAP = 1000
+REVOCATION_FILTER_CAPACITY = 100000
+REVOCATION_FILTER_ERROR_RATE = 0.01
+
+# Users resolved from access tokens are cached (see users/authentication.py) and
+# evicted when saved; the timeout bounds staleness across processes with LocMemCache
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60))
+
+# Email settings. For offline development use the console backend (default) or
+# 'django.core.mail.backends.filebased.EmailBackend', which writes to EMAIL_FILE_PATH
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
+# Outbound emails are stored in users.OutboundEmail and sent by a background thread
+# (users/outbox.py) over one connection per batch; typed emails such as password
+# resets are rendered at send time (users/emails.py). 0 workers sends inline. Failed
+# sends are retried with doubling delays by `manage.py send_outbox_emails`.
+EMAIL_OUTBOX_WORKERS = int(os.environ.get('EMAIL_OUTBOX_WORKERS', 1))
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_SENDING_TIMEOUT = 300
+# Sent, skipped and failed emails are deleted by `send_outbox_emails` after this many days
+EMAIL_OUTBOX_RETENTION_DAYS = 7
 
 
 # Gemini API settings
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')  # Set your API key in environment variables
\ No newline at end of file
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')  # Set your API key in environment variables
+
+# Image derivatives (tourist_spots.images), generated after upload off the request path.
+# AVIF is skipped unless Pillow supports it (natively or through pillow-avif-plugin).
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1280)
+IMAGE_DERIVATIVE_FORMATS = ('avif', 'webp')
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+IMAGE_STRIP_ORIGINAL_METADATA = True
+# Multi-image uploads: files validated/stored concurrently, all-or-nothing
+IMAGE_UPLOAD_WORKERS = 4
+IMAGE_UPLOAD_MAX_FILES = 30
+
+# Process-wide LLM client (tourist_spots.llm): per-call deadline in seconds, concurrent
+# calls, retries with jittered backoff and circuit breaker. FakeBackend needs no API key.
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'tourist_spots.llm.GeminiBackend')
+LLM_MODEL = 'gemini-pro'
+LLM_TIMEOUT = int(os.environ.get('LLM_TIMEOUT', 30))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 4))
+LLM_MAX_RETRIES = 2
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 4.0
+LLM_CIRCUIT_FAILURE_THRESHOLD = 5
+LLM_CIRCUIT_RESET_TIMEOUT = 30
+# Per-process call metrics are served to staff at /api/llm/stats/ and, every N seconds
+# (0 disables), logged at INFO by the tourist_spots.llm logger
+LLM_METRICS_LOG_INTERVAL = int(os.environ.get('LLM_METRICS_LOG_INTERVAL', 0))
+# Simulated model latency (seconds) for FakeBackend, e.g. in `benchmark_concurrency` runs
+LLM_FAKE_LATENCY = float(os.environ.get('LLM_FAKE_LATENCY', 0))
+
+# Generated itineraries are cached per normalized request + spot set fingerprint
+ITINERARY_CACHE_ALIAS = 'default'
+ITINERARY_CACHE_TIMEOUT = int(os.environ.get('ITINERARY_CACHE_TIMEOUT', 60 * 60 * 24 * 7))
+# How long other processes wait for an in-flight generation of the same itinerary
+ITINERARY_LOCK_TIMEOUT = 120
+# Background itinerary jobs ('assincrono': true). 0 workers runs jobs inline.
+ITINERARY_JOB_WORKERS = int(os.environ.get('ITINERARY_JOB_WORKERS', 2))
+ITINERARY_MAX_PENDING_JOBS = int(os.environ.get('ITINERARY_MAX_PENDING_JOBS', 50))
+ITINERARY_JOB_TIMEOUT = 300
+ITINERARY_GENERATOR = 'tourist_spots.itinerary.generate_with_gemini'
+ITINERARY_STREAM_GENERATOR = 'tourist_spots.itinerary.stream_with_gemini'
+# Local itinerary planner: visits per day (one less when traveling with children)
+PLANNER_MAX_VISITS_PER_DAY = 5
+# Upper bound on the requested trip length (the planner and prompt grow with it)
+ITINERARY_MAX_DIAS = 30
+# Approximate token budget for the spot descriptions sent to Gemini
+ITINERARY_PROMPT_TOKEN_BUDGET = 2500
\ No newline at end of file
@@ -6,8 +6,10 @@ from django.views.generic import RedirectView
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from users.views import SignupView, LogoutView, PasswordResetView, UserProfileView
-from tourist_spots.views import TouristSpotViewSet
+from tourist_spots.views import TouristSpotViewSet, GenerateItineraryView, GenerateItineraryStreamView, ItineraryJobView, LLMStatsView
 from favorites.views import FavoriteViewSet
+from roteiro_ibiapaba.media import media_urlpatterns
+from roteiro_ibiapaba.routers import read_from_replica
 
 # Swagger documentation
 from rest_framework import permissions
@@ -38,8 +40,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     
     # Documentation
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('swagger/', read_from_replica()(schema_view.with_ui('swagger', cache_timeout=0)), name='schema-swagger-ui'),
+    path('redoc/', read_from_replica()(schema_view.with_ui('redoc', cache_timeout=0)), name='schema-redoc'),
     
     # Authentication endpoints
     path('api/auth/signup/', SignupView.as_view(), name='signup'),
@@ -51,10 +53,17 @@ urlpatterns = [
     # User profile
     path('api/profile/', UserProfileView.as_view(), name='user_profile'),
     
+    # Itinerary generation
+    path('api/generate-itinerary/', GenerateItineraryView.as_view(), name='generate-itinerary'),
+    path('api/generate-itinerary/stream/', GenerateItineraryStreamView.as_view(), name='generate-itinerary-stream'),
+    path('api/generate-itinerary/<uuid:job_id>/', ItineraryJobView.as_view(), name='itinerary-job'),
+    path('api/llm/stats/', LLMStatsView.as_view(), name='llm-stats'),
+    
     # API router
     path('api/', include(router.urls)),
 ]
 
 # Serve static files in both development and production
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media: offloaded to the web server or served with range/conditional support (MEDIA_SERVE_MODE)
+urlpatterns += media_urlpatterns()
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'roteiro_ibiapaba.settings')
 
 application = get_wsgi_application()
+
+# Load the revoked token filter before the first refresh request
+from users.revocation import revoked_tokens  # noqa: E402
+
+revoked_tokens.warm()
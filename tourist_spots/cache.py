@@ -0,0 +1,126 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+VERSION_KEY = 'catalog:version'
+CHANGED_AT_KEY = 'catalog:changed_at'
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+def get_catalog_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+def get_catalog_version():
+    """
+    Versão atual do catálogo. Na ausência da chave (cache vazio ou expulso),
+    parte de um valor baseado no relógio para nunca reaproveitar versões antigas.
+    """
+    cache = get_catalog_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+def bump_catalog_version():
+    """
+    Invalida todas as respostas em cache do catálogo.
+    """
+    cache = get_catalog_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+    cache.set(CHANGED_AT_KEY, time.time(), timeout=None)
+
+def changed_within(seconds):
+    """
+    Se o catálogo mudou nos últimos ``seconds`` segundos (por exemplo, para
+    não ler de uma réplica que ainda não recebeu a mudança).
+    """
+    changed_at = get_catalog_cache().get(CHANGED_AT_KEY)
+    return changed_at is not None and time.time() - changed_at < seconds
+
+def increment_counter(cache, key):
+    """
+    Incrementa um contador de estatística guardado no cache.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+def get_cache_stats():
+    """
+    Retorna os contadores de acertos e falhas do cache do catálogo.
+    """
+    cache = get_catalog_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+        'version': get_catalog_version(),
+    }
+
+def reset_cache_stats():
+    get_catalog_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+def build_cache_key(request, version):
+    """
+    Chave da resposta: versão do catálogo, URL base e parâmetros da query
+    normalizados (ordenados, sem valores vazios, sem ``page=1``).
+    """
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != '' and not (key == 'page' and value == '1')
+    )
+    raw = f'{request.build_absolute_uri(request.path)}?{params!r}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'catalog:v{version}:{digest}'
+
+class CatalogCacheMixin:
+    """
+    Mixin que guarda em cache o ``response.data`` das actions listadas em
+    ``cached_actions`` para requisições anônimas.
+
+    A invalidação não depende de TTL: os sinais de ``TouristSpot`` e
+    ``TouristSpotImage`` incrementam a versão do catálogo, que faz parte da
+    chave, e as entradas antigas simplesmente deixam de ser lidas. Dados que
+    mudam sem passar por esses sinais (como os contadores de favoritos) usam
+    um TTL menor via ``get_cache_timeout``.
+    """
+    cached_actions = ('list', 'retrieve', 'nearby')
+
+    def get_cache_timeout(self, request):
+        return getattr(settings, 'CATALOG_CACHE_TIMEOUT', None)
+
+    def should_cache_response(self, request):
+        return (
+            self.action in self.cached_actions
+            and request.method == 'GET'
+            and not request.user.is_authenticated
+        )
+
+    def cached(self, request, handler, *args, **kwargs):
+        if not self.should_cache_response(request):
+            return handler(request, *args, **kwargs)
+        key = build_cache_key(request, get_catalog_version())
+        cache = get_catalog_cache()
+        data = cache.get(key)
+        if data is not None:
+            increment_counter(cache, HITS_KEY)
+            return Response(data, headers={'X-Cache': 'HIT'})
+        increment_counter(cache, MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.get_cache_timeout(request))
+        response['X-Cache'] = 'MISS'
+        return response
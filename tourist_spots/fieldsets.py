@@ -0,0 +1,71 @@
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+def _split(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+def is_root(serializer):
+    """
+    Se o serializer é o da resposta (sozinho ou como filho de ``many=True``),
+    e não um serializer aninhado.
+    """
+    parent = serializer.parent
+    return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+class SparseFieldsSerializerMixin:
+    """
+    Serializer cujos campos podem ser escolhidos pela view (``fields`` no
+    contexto). Campos listados em ``Meta.expandable_fields`` só aparecem
+    quando pedidos. O recorte vale apenas para o serializer raiz, não para
+    serializers aninhados que recebem o mesmo contexto.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields') if is_root(self) else None
+        if requested is None:
+            expandable = getattr(self.Meta, 'expandable_fields', ())
+            return {name: field for name, field in fields.items() if name not in expandable}
+        return {name: field for name, field in fields.items() if name in requested}
+
+class SparseFieldsMixin:
+    """
+    Mixin para viewsets com ``?fields=``, ``?omit=``, ``?expand=`` e
+    ``?view=compact``.
+
+    O conjunto de campos é resolvido uma vez por requisição
+    (``get_requested_fields``) e repassado ao serializer pelo contexto; a view
+    usa o mesmo conjunto para projetar a consulta (veja ``project_queryset``).
+    Só vale para as actions em ``sparse_fields_actions``.
+    """
+    sparse_fields_actions = ('list', 'retrieve')
+
+    def get_requested_fields(self):
+        if self.action not in self.sparse_fields_actions:
+            return None
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self.resolve_fields(self.request.query_params)
+        return self._requested_fields
+
+    def resolve_fields(self, params):
+        meta = self.get_serializer_class().Meta
+        expandable = set(getattr(meta, 'expandable_fields', ()))
+        available = set(meta.fields) | expandable
+        compact = params.get('view') == 'compact'
+        if not (compact or params.get('fields') or params.get('omit') or params.get('expand')):
+            return None
+
+        fields = set(meta.compact_fields) if compact else set(meta.fields) - expandable
+        if params.get('fields'):
+            fields = _split(params['fields'])
+        fields = (fields | _split(params.get('expand'))) - _split(params.get('omit'))
+
+        requested = _split(params.get('fields')) | _split(params.get('expand')) | _split(params.get('omit'))
+        unknown = requested - available
+        if unknown:
+            raise ValidationError({'fields': f"Campos desconhecidos: {', '.join(sorted(unknown))}."})
+        return fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        return context
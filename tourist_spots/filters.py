@@ -0,0 +1,49 @@
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from . import geo
+from .search import get_search_backend
+
+def parse_bbox(value):
+    """
+    Converte ``min_lng,min_lat,max_lng,max_lat`` em uma tupla
+    ``(min_lat, min_lng, max_lat, max_lng)`` validada.
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValidationError({'bbox': 'Use o formato min_lng,min_lat,max_lng,max_lat.'})
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+        raise ValidationError({'bbox': 'Coordenadas da caixa delimitadora inválidas.'})
+    return min_lat, min_lng, max_lat, max_lng
+
+class BoundingBoxFilter(filters.BaseFilterBackend):
+    """
+    Filtra pontos turísticos dentro de uma caixa delimitadora (``?bbox=``).
+
+    As células geohash que cobrem a caixa selecionam os candidatos pelo
+    índice e a comparação exata das coordenadas descarta as bordas.
+    """
+    bbox_param = 'bbox'
+
+    def filter_queryset(self, request, queryset, view):
+        value = request.query_params.get(self.bbox_param)
+        if not value:
+            return queryset
+        min_lat, min_lng, max_lat, max_lng = parse_bbox(value)
+        cells = geo.cells_for_bbox(min_lat, min_lng, max_lat, max_lng)
+        return queryset.filter(geo.cells_query(cells)).filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng),
+        )
+
+class RankedSearchFilter(filters.SearchFilter):
+    """
+    Substitui a busca por ``icontains`` do DRF pelo motor de busca do app:
+    insensível a acentos, com radicais em português e resultados ordenados
+    por relevância (``search_rank``).
+    """
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return get_search_backend().search(queryset, query)
@@ -0,0 +1,120 @@
+import math
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+MAX_BBOX_CELLS = 32
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Codifica uma coordenada em geohash com a precisão informada.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+def cell_size(precision):
+    """
+    Retorna (altura, largura) em graus de uma célula geohash.
+    """
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+def precision_for_radius(radius_km, latitude):
+    """
+    Maior precisão cuja célula cobre o raio informado, de modo que a célula
+    central e suas oito vizinhas contenham todo o círculo de busca.
+    """
+    cos_lat = max(math.cos(math.radians(float(latitude))), 0.01)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if min(height * KM_PER_DEGREE, width * KM_PER_DEGREE * cos_lat) >= radius_km:
+            return precision
+    return 1
+
+def cells_for_radius(latitude, longitude, radius_km):
+    """
+    Células geohash candidatas para uma busca por raio: a célula do ponto
+    central e suas oito vizinhas.
+    """
+    precision = precision_for_radius(radius_km, latitude)
+    height, width = cell_size(precision)
+    latitude, longitude = float(latitude), float(longitude)
+    cells = set()
+    for dlat in (-height, 0, height):
+        lat = latitude + dlat
+        if lat < -90 or lat > 90:
+            continue
+        for dlng in (-width, 0, width):
+            lng = (longitude + dlng + 180) % 360 - 180
+            cells.add(encode(lat, lng, precision))
+    return cells
+
+def cells_for_bbox(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_BBOX_CELLS):
+    """
+    Conjunto de células que cobre a caixa delimitadora, usando a maior
+    precisão que não ultrapassa ``max_cells`` células.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        cols = math.floor(max_lng / width) - math.floor(min_lng / width) + 1
+        if rows * cols <= max_cells or precision == 1:
+            break
+    cells = set()
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            cells.add(encode(min(lat, max_lat), min(lng, max_lng), precision))
+            if lng >= max_lng:
+                break
+            lng = min(lng + width, max_lng)
+        if lat >= max_lat:
+            break
+        lat = min(lat + height, max_lat)
+    return cells
+
+def cells_query(cells, field='geohash'):
+    """
+    Monta um filtro por prefixo de geohash (``LIKE 'cell%'``). No Postgres a
+    busca por prefixo usa o índice ``varchar_pattern_ops`` que o Django cria
+    para ``CharField`` indexados, qualquer que seja a collation do banco.
+    """
+    query = Q()
+    for cell in cells:
+        query |= Q(**{f'{field}__startswith': cell})
+    return query
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    Distância em quilômetros entre dois pontos pela fórmula de haversine.
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, map(float, (lat1, lng1, lat2, lng2)))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
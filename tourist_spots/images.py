@@ -0,0 +1,268 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connections, transaction
+from django.db.models import JSONField, OuterRef, Subquery
+from PIL import Image, ImageOps
+from .cache import bump_catalog_version
+from .models import TouristSpotImage
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Registers the AVIF codec on Pillow builds without native support
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+FORMATS = {
+    'avif': {'pil': 'AVIF', 'mime': 'image/avif', 'options': {'quality': 60}},
+    'webp': {'pil': 'WEBP', 'mime': 'image/webp', 'options': {'quality': 80, 'method': 4}},
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def available_formats():
+    """
+    Formatos de ``IMAGE_DERIVATIVE_FORMATS`` suportados pelo Pillow instalado.
+    """
+    registered = set(Image.registered_extensions().values())
+    return [
+        fmt for fmt in getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ('avif', 'webp'))
+        if fmt in FORMATS and FORMATS[fmt]['pil'] in registered
+    ]
+
+def derivative_widths(original_width):
+    """
+    Larguras a gerar: as de ``IMAGE_DERIVATIVE_WIDTHS`` menores que o original
+    (nunca ampliamos) ou, se o original for menor que todas, a própria largura.
+    """
+    widths = [w for w in sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1280))) if w < original_width]
+    return widths or [original_width]
+
+def derivative_path(image, width, fmt):
+    return f"tourist_spots/derivados/{image.pk}/{width}.{fmt}"
+
+def _has_metadata(img):
+    return bool(img.getexif()) or 'xmp' in img.info or 'XML:com.adobe.xmp' in img.info
+
+def _strip_original(image, img):
+    """
+    Regrava o original sem EXIF (inclusive GPS) e XMP, com a orientação já
+    aplicada aos pixels. O perfil de cor é preservado. Retorna o nome do
+    arquivo anterior, a apagar depois que a imagem for salva.
+    """
+    buffer = BytesIO()
+    fmt = img.format or 'JPEG'
+    clean = ImageOps.exif_transpose(img)
+    options = {'icc_profile': img.info['icc_profile']} if img.info.get('icc_profile') else {}
+    if fmt == 'JPEG':
+        clean.convert('RGB').save(buffer, fmt, quality=90, optimize=True, **options)
+    else:
+        clean.save(buffer, fmt, **options)
+    storage = image.imagem.storage
+    name = image.imagem.name
+    image.imagem.name = storage.save(name, ContentFile(buffer.getvalue()))
+    return name
+
+def process_image(image):
+    """
+    Gera os derivados (larguras fixas em WebP/AVIF, sem metadados) de uma
+    imagem e os registra em ``derivados``. Os arquivos anteriores só são
+    apagados depois que a imagem é salva apontando para os novos. Retorna o
+    dicionário gerado.
+    """
+    storage = image.imagem.storage
+    with image.imagem.open('rb') as f:
+        img = Image.open(f)
+        img.load()
+
+    stale = derivative_paths(image)
+    update_fields = ['derivados']
+    if getattr(settings, 'IMAGE_STRIP_ORIGINAL_METADATA', True) and _has_metadata(img):
+        stale.add(_strip_original(image, img))
+        update_fields.append('imagem')
+
+    source = ImageOps.exif_transpose(img)
+    source = source.convert('RGBA' if 'A' in source.getbands() or 'transparency' in source.info else 'RGB')
+    derivados = {'largura': source.width, 'altura': source.height}
+    for fmt in available_formats():
+        spec = FORMATS[fmt]
+        derivados[fmt] = {}
+        for width in derivative_widths(source.width):
+            resized = source if width == source.width else source.resize(
+                (width, max(round(source.height * width / source.width), 1)), Image.LANCZOS
+            )
+            buffer = BytesIO()
+            # Pillow only writes EXIF when it is passed explicitly
+            resized.save(buffer, spec['pil'], **spec['options'])
+            derivados[fmt][str(width)] = storage.save(derivative_path(image, width, fmt), ContentFile(buffer.getvalue()))
+
+    image.derivados = derivados
+    image.save(update_fields=update_fields)
+    for path in stale - derivative_paths(image) - {image.imagem.name}:
+        storage.delete(path)
+    return derivados
+
+def derivative_paths(image):
+    return {
+        path
+        for fmt in FORMATS
+        for path in (image.derivados or {}).get(fmt, {}).values()
+    }
+
+def delete_derivatives(image):
+    storage = image.imagem.storage
+    for path in derivative_paths(image):
+        storage.delete(path)
+
+def get_executor():
+    """
+    Pool de threads do processo para o processamento de imagens, criado sob
+    demanda com ``IMAGE_PROCESSING_WORKERS`` threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2),
+                thread_name_prefix='image-derivatives',
+            )
+        return _executor
+
+def process_image_by_id(image_id):
+    try:
+        image = TouristSpotImage.objects.get(pk=image_id)
+    except TouristSpotImage.DoesNotExist:
+        return None
+    return process_image(image)
+
+def _process_safely(image_id):
+    try:
+        process_image_by_id(image_id)
+        return True
+    except Exception:
+        logger.exception('Falha ao gerar derivados da imagem %s', image_id)
+        return False
+
+def _run_in_worker(image_id):
+    close_old_connections()
+    try:
+        return _process_safely(image_id)
+    finally:
+        # Worker threads own their connections; don't leak them
+        connections.close_all()
+
+def schedule(image_id):
+    """
+    Agenda a geração dos derivados para depois do commit, fora do ciclo da
+    requisição. Com ``IMAGE_PROCESSING_WORKERS = 0`` roda na própria thread.
+    """
+    def submit():
+        if getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2) == 0:
+            _process_safely(image_id)
+        else:
+            get_executor().submit(_run_in_worker, image_id)
+    transaction.on_commit(submit)
+
+def upload_workers(count):
+    return max(1, min(count, getattr(settings, 'IMAGE_UPLOAD_WORKERS', 4)))
+
+def save_batch(spot, items):
+    """
+    Salva um lote de imagens já validadas (dicionários com ``imagem`` e
+    ``descricao``): os arquivos são gravados no storage em paralelo e as linhas
+    inseridas com um único ``bulk_create`` em uma transação. Se algo falhar,
+    nenhuma linha é criada e os arquivos já gravados são apagados.
+    """
+    instances = [
+        TouristSpotImage(ponto_turistico=spot, descricao=item.get('descricao', ''))
+        for item in items
+    ]
+    field = TouristSpotImage._meta.get_field('imagem')
+
+    def store(pair):
+        instance, item = pair
+        upload = item['imagem']
+        instance.imagem.name = field.storage.save(field.generate_filename(instance, upload.name), upload)
+        return instance.imagem.name
+
+    stored = []
+    try:
+        with ThreadPoolExecutor(max_workers=upload_workers(len(items)), thread_name_prefix='image-upload') as pool:
+            futures = [pool.submit(store, pair) for pair in zip(instances, items)]
+            # Wait for every write so the cleanup below sees all stored files
+            errors = []
+            for future in futures:
+                try:
+                    stored.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            raise errors[0]
+        with transaction.atomic():
+            TouristSpotImage.objects.bulk_create(instances)
+            # bulk_create sends no post_save; do what the signals would
+            transaction.on_commit(bump_catalog_version)
+            for instance in instances:
+                schedule(instance.pk)
+    except Exception:
+        for name in stored:
+            field.storage.delete(name)
+        raise
+    return instances
+
+def annotate_cover(queryset):
+    """
+    Anota ``capa_imagem`` e ``capa_derivados`` (primeira imagem de cada ponto)
+    com subconsultas, para mostrar a capa sem o prefetch de todas as imagens.
+    """
+    cover = TouristSpotImage.objects.filter(ponto_turistico=OuterRef('pk')).order_by('pk')
+    return queryset.annotate(
+        capa_imagem=Subquery(cover.values('imagem')[:1]),
+        capa_derivados=Subquery(cover.values('derivados')[:1], output_field=JSONField()),
+    )
+
+def build_srcset(image, fmt):
+    return ', '.join(
+        f"{image.imagem.storage.url(path)} {width}w"
+        for width, path in sorted(image.derivados.get(fmt, {}).items(), key=lambda item: int(item[0]))
+    )
+
+def thumbnail_url(image):
+    """
+    Menor derivado no formato mais amplamente suportado disponível (WebP antes
+    de AVIF), ou o original enquanto os derivados não existem.
+    """
+    for fmt in ('webp', 'avif'):
+        paths = (image.derivados or {}).get(fmt)
+        if paths:
+            return image.imagem.storage.url(paths[min(paths, key=int)])
+    return image.imagem.url if image.imagem else None
+
+def srcsets(image):
+    """
+    ``srcset`` por tipo MIME, pronto para os ``<source>`` de um ``<picture>``.
+    """
+    return {
+        FORMATS[fmt]['mime']: build_srcset(image, fmt)
+        for fmt in FORMATS if (image.derivados or {}).get(fmt)
+    }
+
+def backfill(queryset, workers=4):
+    """
+    Gera derivados das imagens de ``queryset`` em paralelo. Retorna
+    ``(processadas, falhas)``.
+    """
+    image_ids = list(queryset.values_list('pk', flat=True))
+    if workers <= 1:
+        results = [_process_safely(image_id) for image_id in image_ids]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-backfill') as pool:
+            results = list(pool.map(_run_in_worker, image_ids))
+    processed = sum(results)
+    return processed, len(results) - processed
@@ -0,0 +1,519 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+from . import llm
+from .cache import increment_counter
+from .models import SearchTerm, TouristSpot
+from .planner import plan_itinerary, select_spots
+from .prompts import PromptBuilder
+from .search import fold, tokenize
+
+ALL_REGION_ALIASES = ('serra', 'todas', 'tudo', 'all')
+DEFAULT_GENERATOR = 'tourist_spots.itinerary.generate_with_gemini'
+
+STATS_KEYS = {
+    'hits': 'itinerary:stats:hits',
+    'misses': 'itinerary:stats:misses',
+    'coalesced': 'itinerary:stats:coalesced',
+    'upstream_calls': 'itinerary:stats:upstream_calls',
+}
+
+class NoSpotsFound(Exception):
+    """
+    Nenhum ponto turístico cadastrado para a região pedida.
+    """
+
+def get_itinerary_cache():
+    return caches[getattr(settings, 'ITINERARY_CACHE_ALIAS', 'default')]
+
+def _as_bool(value, default=False):
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'sim', 'yes')
+    return bool(value)
+
+def _as_coordinate(value, limit):
+    if value in (None, ''):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('Coordenadas da hospedagem inválidas.')
+    if not -limit <= value <= limit:
+        raise ValueError('Coordenadas da hospedagem inválidas.')
+    return value
+
+def normalize_request(data):
+    """
+    Valida e normaliza os parâmetros de geração de roteiro.
+
+    Levanta ``ValueError`` quando o número de dias, as categorias ou as
+    coordenadas da hospedagem são inválidos.
+    """
+    try:
+        dias = int(data.get('dias'))
+    except (TypeError, ValueError):
+        raise ValueError('Informe o número de dias da viagem.')
+    if dias < 1:
+        raise ValueError('Informe o número de dias da viagem.')
+    max_dias = getattr(settings, 'ITINERARY_MAX_DIAS', 30)
+    if dias > max_dias:
+        raise ValueError(f'O roteiro pode ter no máximo {max_dias} dias.')
+
+    cidade = (data.get('cidade') or '').strip()
+    if not cidade or cidade.lower() in ALL_REGION_ALIASES:
+        cidade = ''
+
+    categorias = data.get('categorias') or []
+    if isinstance(categorias, str):
+        categorias = [categoria.strip() for categoria in categorias.split(',') if categoria.strip()]
+    valid_categories = dict(TouristSpot.CATEGORY_CHOICES)
+    if not isinstance(categorias, (list, tuple)) or any(
+        not isinstance(categoria, str) or categoria not in valid_categories for categoria in categorias
+    ):
+        raise ValueError(f"Categorias válidas: {', '.join(valid_categories)}.")
+
+    hospedagem_lat = _as_coordinate(data.get('hospedagem_lat'), 90)
+    hospedagem_lng = _as_coordinate(data.get('hospedagem_lng'), 180)
+    if (hospedagem_lat is None) != (hospedagem_lng is None):
+        raise ValueError('Informe latitude e longitude da hospedagem.')
+
+    return {
+        'cidade': cidade,
+        'dias': dias,
+        'interesses': ' '.join((data.get('interesses') or '').split()),
+        'com_criancas': _as_bool(data.get('com_criancas')),
+        'hospedagem': ' '.join((data.get('hospedagem') or '').split()),
+        'hospedagem_lat': hospedagem_lat,
+        'hospedagem_lng': hospedagem_lng,
+        'categorias': sorted(set(categorias)),
+        'narrativa': _as_bool(data.get('narrativa'), default=True),
+    }
+
+def build_cache_key(params, spots_fingerprint):
+    """
+    Chave do roteiro: parâmetros normalizados (sem acentos e sem distinção de
+    maiúsculas) mais a impressão digital dos pontos usados no prompt.
+    """
+    normalized = {
+        key: fold(value) if isinstance(value, str) else value
+        for key, value in params.items()
+    }
+    raw = json.dumps(normalized, sort_keys=True) + spots_fingerprint
+    return 'itinerary:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class SingleFlight:
+    """
+    Garante que apenas uma execução por chave esteja em andamento no processo;
+    chamadas concorrentes com a mesma chave aguardam e recebem o mesmo resultado.
+    """
+    class _Call:
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Executa ``fn`` ou aguarda a execução em andamento. Retorna
+        ``(resultado, compartilhado)``.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+_single_flight = SingleFlight()
+
+class AsyncSingleFlight:
+    """
+    ``SingleFlight`` para corrotinas: chamadas concorrentes com a mesma chave,
+    no mesmo event loop, aguardam a mesma execução.
+
+    Só há coalescência sob ASGI, onde as requisições do worker compartilham o
+    event loop. Sob WSGI cada chamada via ``async_to_sync`` roda em um event
+    loop novo, então aqui nada é compartilhado; nesse caso apenas a trava no
+    cache de ``aget_or_generate`` evita chamadas repetidas ao modelo.
+    """
+    def __init__(self):
+        # Futures belong to one event loop, so calls are tracked per loop
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key, fn):
+        """
+        Executa ``fn()`` ou aguarda a execução em andamento. Retorna
+        ``(resultado, compartilhado)``.
+
+        A execução roda em uma task própria: se quem a iniciou for cancelado
+        (cliente desconectado), as demais chamadas recebem o resultado em vez
+        do cancelamento.
+        """
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        task = calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(calls, key, done))
+        return await asyncio.shield(task), shared
+
+    @staticmethod
+    def _finished(calls, key, task):
+        if calls.get(key) is task:
+            del calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when nobody is left waiting
+            task.exception()
+
+_async_single_flight = AsyncSingleFlight()
+
+def get_or_generate(key, generate):
+    """
+    Retorna o roteiro em cache ou o gera com ``generate()``.
+
+    Dentro do processo as chamadas idênticas são coalescidas pelo
+    ``SingleFlight``; entre processos, uma trava no cache (``cache.add``) faz com
+    que os demais aguardem o resultado do processo que chamou o modelo.
+    Retorna ``(roteiro, origem)`` com origem ``hit``, ``coalesced`` ou ``miss``.
+    """
+    cache = get_itinerary_cache()
+    roteiro = cache.get(key)
+    if roteiro is not None:
+        increment_counter(cache, STATS_KEYS['hits'])
+        return roteiro, 'hit'
+
+    timeout = getattr(settings, 'ITINERARY_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+    lock_timeout = getattr(settings, 'ITINERARY_LOCK_TIMEOUT', 120)
+    poll_interval = getattr(settings, 'ITINERARY_LOCK_POLL_INTERVAL', 0.25)
+
+    def lead():
+        lock_key = key + ':lock'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + lock_timeout
+        while not cache.add(lock_key, token, lock_timeout):
+            time.sleep(poll_interval)
+            roteiro = cache.get(key)
+            if roteiro is not None:
+                return roteiro, True
+            if time.monotonic() > deadline:
+                # Generate anyway, leaving the lock to whoever holds it
+                token = None
+                break
+        try:
+            roteiro = cache.get(key)
+            if roteiro is not None:
+                return roteiro, True
+            increment_counter(cache, STATS_KEYS['upstream_calls'])
+            roteiro = generate()
+            cache.set(key, roteiro, timeout)
+            return roteiro, False
+        finally:
+            # The lock may have expired and been taken by another process
+            if token is not None and cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    (roteiro, waited), shared = _single_flight.do(key, lead)
+    if shared or waited:
+        increment_counter(cache, STATS_KEYS['coalesced'])
+        return roteiro, 'coalesced'
+    increment_counter(cache, STATS_KEYS['misses'])
+    return roteiro, 'miss'
+
+async def aget_or_generate(key, agenerate):
+    """
+    Versão assíncrona de ``get_or_generate``: as esperas (trava entre
+    processos e chamada ao modelo) não ocupam uma thread.
+    """
+    cache = get_itinerary_cache()
+    count = sync_to_async(increment_counter, thread_sensitive=False)
+    roteiro = await cache.aget(key)
+    if roteiro is not None:
+        await count(cache, STATS_KEYS['hits'])
+        return roteiro, 'hit'
+
+    timeout = getattr(settings, 'ITINERARY_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+    lock_timeout = getattr(settings, 'ITINERARY_LOCK_TIMEOUT', 120)
+    poll_interval = getattr(settings, 'ITINERARY_LOCK_POLL_INTERVAL', 0.25)
+
+    async def lead():
+        lock_key = key + ':lock'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + lock_timeout
+        while not await cache.aadd(lock_key, token, lock_timeout):
+            await asyncio.sleep(poll_interval)
+            roteiro = await cache.aget(key)
+            if roteiro is not None:
+                return roteiro, True
+            if time.monotonic() > deadline:
+                # Generate anyway, leaving the lock to whoever holds it
+                token = None
+                break
+        try:
+            roteiro = await cache.aget(key)
+            if roteiro is not None:
+                return roteiro, True
+            await count(cache, STATS_KEYS['upstream_calls'])
+            roteiro = await agenerate()
+            await cache.aset(key, roteiro, timeout)
+            return roteiro, False
+        finally:
+            # The lock may have expired and been taken by another process
+            if token is not None and await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    (roteiro, waited), shared = await _async_single_flight.do(key, lead)
+    if shared or waited:
+        await count(cache, STATS_KEYS['coalesced'])
+        return roteiro, 'coalesced'
+    await count(cache, STATS_KEYS['misses'])
+    return roteiro, 'miss'
+
+def get_stats():
+    """
+    Contadores do cache de roteiros. ``upstream_saved`` soma as requisições
+    atendidas sem chamar o modelo (acertos e chamadas coalescidas).
+    """
+    cache = get_itinerary_cache()
+    stats = {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['coalesced'] + stats['misses']
+    stats['upstream_saved'] = stats['hits'] + stats['coalesced']
+    stats['hit_rate'] = stats['upstream_saved'] / total if total else 0.0
+    return stats
+
+def reset_stats():
+    get_itinerary_cache().delete_many(list(STATS_KEYS.values()))
+
+def get_region(params):
+    """
+    Retorna ``(queryset de pontos, nome da região)`` para os parâmetros.
+    """
+    if not params['cidade']:
+        return TouristSpot.objects.all(), "Serra da Ibiapaba"
+    return TouristSpot.objects.filter(cidade__iexact=params['cidade']), params['cidade']
+
+def get_candidates(params):
+    """
+    Retorna ``(queryset de pontos candidatos, nome da região)``: os pontos da
+    região nas categorias pedidas.
+    """
+    spots, cidade_nome = get_region(params)
+    if params['categorias']:
+        spots = spots.filter(categoria__in=params['categorias'])
+    return spots, cidade_nome
+
+def fetch_spots(params):
+    """
+    Carrega, em uma única consulta, os pontos candidatos da região com o número
+    de imagens (``num_imagens``) e, quando há interesses, a relevância no índice
+    de busca (``relevancia``).
+    """
+    spots, cidade_nome = get_candidates(params)
+    spots = spots.only('id', 'nome', 'descricao', 'cidade', 'categoria', 'latitude', 'longitude')
+    spots = spots.annotate(num_imagens=Count('imagens'))
+    terms = sorted(set(tokenize(params['interesses'])))
+    if terms:
+        relevancia = (
+            SearchTerm.objects.filter(documento_id=OuterRef('pk'), termo__in=terms)
+            .values('documento_id')
+            .annotate(total=Sum('peso'))
+            .values('total')
+        )
+        spots = spots.annotate(relevancia=Coalesce(Subquery(relevancia), Value(0)))
+    return list(spots), cidade_nome
+
+def build_plan(params, spots):
+    """
+    Monta o plano dia a dia com o planejador local (sem chamar o modelo).
+    """
+    max_visits = getattr(settings, 'PLANNER_MAX_VISITS_PER_DAY', 5)
+    if params['com_criancas']:
+        max_visits = max(max_visits - 1, 1)
+    # Large regions: keep only the best ranked spots that fit in the trip
+    selected = select_spots(spots, params['categorias'], params['interesses'], limit=params['dias'] * max_visits)
+    start = None
+    if params['hospedagem_lat'] is not None:
+        start = (params['hospedagem_lat'], params['hospedagem_lng'])
+    return plan_itinerary(selected, params['dias'], start=start, max_visits_per_day=max_visits)
+
+def serialize_plan(plan):
+    """
+    Representação JSON do plano retornada pela API.
+    """
+    days = []
+    for numero, visits in enumerate(plan, start=1):
+        days.append({
+            'dia': numero,
+            'distancia_km': round(sum(leg for _, leg in visits), 2),
+            'visitas': [
+                {
+                    'id': str(spot.id),
+                    'nome': spot.nome,
+                    'cidade': spot.cidade,
+                    'categoria': spot.categoria,
+                    'latitude': str(spot.latitude),
+                    'longitude': str(spot.longitude),
+                    'distancia_km': round(leg, 2),
+                }
+                for spot, leg in visits
+            ],
+        })
+    return days
+
+def prepare(params):
+    """
+    Busca os pontos da região, calcula o plano e retorna
+    ``(plano, prompt, chave de cache)``.
+
+    Levanta ``NoSpotsFound`` quando a região não tem pontos cadastrados.
+    """
+    spots, cidade_nome = fetch_spots(params)
+    plan = build_plan(params, spots)
+    if not any(plan):
+        raise NoSpotsFound('Nenhum ponto turístico encontrado para esta região.')
+    prompt, spots_text = PromptBuilder().build(params, plan, cidade_nome)
+    return plan, prompt, build_cache_key(params, fingerprint(spots_text))
+
+def get_generator():
+    """
+    Função que recebe o prompt e retorna o roteiro, configurada em
+    ``ITINERARY_GENERATOR`` (caminho pontilhado). Testes podem apontá-la para
+    um gerador falso e rodar sem acesso ao Gemini.
+    """
+    return import_string(getattr(settings, 'ITINERARY_GENERATOR', DEFAULT_GENERATOR))
+
+def generate(params):
+    """
+    Calcula o plano para parâmetros já normalizados e, se ``narrativa`` estiver
+    ativa, gera (ou reaproveita do cache) o texto do roteiro.
+    Retorna ``(plano serializado, roteiro, origem)``; sem narrativa o roteiro é
+    ``None`` e a origem ``local``. Veja ``get_or_generate``.
+    """
+    plan, prompt, cache_key = prepare(params)
+    plano = serialize_plan(plan)
+    if not params['narrativa']:
+        return plano, None, 'local'
+    generator = get_generator()
+    roteiro, origem = get_or_generate(cache_key, lambda: generator(prompt))
+    return plano, roteiro, origem
+
+def get_async_generator():
+    """
+    Corrotina que recebe o prompt e retorna o roteiro: a de
+    ``ITINERARY_ASYNC_GENERATOR`` ou, se apenas ``ITINERARY_GENERATOR`` foi
+    trocado (testes, por exemplo), essa função síncrona executada em uma thread.
+    """
+    path = getattr(settings, 'ITINERARY_ASYNC_GENERATOR', None)
+    if path:
+        return import_string(path)
+    if getattr(settings, 'ITINERARY_GENERATOR', DEFAULT_GENERATOR) != DEFAULT_GENERATOR:
+        return sync_to_async(get_generator(), thread_sensitive=False)
+    return agenerate_with_gemini
+
+async def agenerate(params):
+    """
+    Versão assíncrona de ``generate``. A consulta dos pontos e o plano rodam
+    na thread do ORM; a chamada ao modelo é assíncrona.
+    """
+    plan, prompt, cache_key = await sync_to_async(prepare)(params)
+    plano = serialize_plan(plan)
+    if not params['narrativa']:
+        return plano, None, 'local'
+    generator = get_async_generator()
+    roteiro, origem = await aget_or_generate(cache_key, lambda: generator(prompt))
+    return plano, roteiro, origem
+
+def get_stream_generator():
+    """
+    Versão em streaming de ``get_generator``: a função configurada em
+    ``ITINERARY_STREAM_GENERATOR`` recebe o prompt e produz trechos de texto.
+    """
+    return import_string(getattr(settings, 'ITINERARY_STREAM_GENERATOR', 'tourist_spots.itinerary.stream_with_gemini'))
+
+def stream_events(params, prepared):
+    """
+    Produz os eventos ``(nome, payload)`` de um roteiro em streaming: o plano
+    logo de início, os trechos da narrativa à medida que o modelo os gera e,
+    por fim, ``fim`` (ou ``erro``). A narrativa completa é guardada no mesmo
+    cache usado por ``generate``.
+    """
+    plan, prompt, cache_key = prepared
+    yield 'plano', {'plano': serialize_plan(plan)}
+    if not params['narrativa']:
+        yield 'fim', {'origem': 'local'}
+        return
+
+    cache = get_itinerary_cache()
+    roteiro = cache.get(cache_key)
+    if roteiro is not None:
+        increment_counter(cache, STATS_KEYS['hits'])
+        yield 'trecho', {'texto': roteiro}
+        yield 'fim', {'origem': 'hit'}
+        return
+
+    increment_counter(cache, STATS_KEYS['misses'])
+    increment_counter(cache, STATS_KEYS['upstream_calls'])
+    parts = []
+    try:
+        for texto in get_stream_generator()(prompt):
+            if texto:
+                parts.append(texto)
+                yield 'trecho', {'texto': texto}
+    except Exception as e:
+        yield 'erro', {'error': f'Erro ao gerar roteiro: {str(e)}'}
+        return
+    cache.set(cache_key, ''.join(parts), getattr(settings, 'ITINERARY_CACHE_TIMEOUT', 60 * 60 * 24 * 7))
+    yield 'fim', {'origem': 'miss'}
+
+def generate_with_gemini(prompt):
+    """
+    Envia o prompt ao Gemini pelo cliente compartilhado e retorna o texto do
+    roteiro. Veja ``llm.LLMClient``.
+    """
+    return llm.get_client().generate(prompt)
+
+def stream_with_gemini(prompt):
+    """
+    Envia o prompt ao Gemini em modo streaming e produz os trechos de texto.
+    """
+    return llm.get_client().stream(prompt)
+
+async def agenerate_with_gemini(prompt):
+    """
+    Versão assíncrona de ``generate_with_gemini``.
+    """
+    return await llm.get_client().agenerate(prompt)
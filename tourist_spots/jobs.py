@@ -0,0 +1,118 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+from . import itinerary
+from .models import ItineraryJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+class JobQueueFull(Exception):
+    """
+    Há pedidos de roteiro demais aguardando processamento.
+    """
+
+def get_executor():
+    """
+    Pool de threads do processo, criado sob demanda com
+    ``ITINERARY_JOB_WORKERS`` threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ITINERARY_JOB_WORKERS', 2),
+                thread_name_prefix='itinerary-job',
+            )
+        return _executor
+
+def enqueue(usuario, params):
+    """
+    Registra um pedido de roteiro e o agenda no pool após o commit.
+
+    Levanta ``JobQueueFull`` quando há ``ITINERARY_MAX_PENDING_JOBS`` ou mais
+    pedidos ainda não concluídos.
+    """
+    max_pending = getattr(settings, 'ITINERARY_MAX_PENDING_JOBS', 50)
+    active = ItineraryJob.objects.filter(
+        status__in=[ItineraryJob.STATUS_PENDING, ItineraryJob.STATUS_RUNNING]
+    ).count()
+    if active >= max_pending:
+        raise JobQueueFull('Muitos roteiros em processamento. Tente novamente em instantes.')
+
+    job = ItineraryJob.objects.create(usuario=usuario, parametros=params)
+    transaction.on_commit(lambda: submit(job.pk))
+    return job
+
+def submit(job_id):
+    """
+    Envia o pedido ao pool. Com ``ITINERARY_JOB_WORKERS = 0`` o pedido é
+    processado na própria thread (útil em testes).
+    """
+    if getattr(settings, 'ITINERARY_JOB_WORKERS', 2) == 0:
+        run_job(job_id)
+        return
+    get_executor().submit(_run_in_worker, job_id)
+
+def _run_in_worker(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    except Exception:
+        logger.exception('Falha inesperada no pedido de roteiro %s', job_id)
+    finally:
+        # Worker threads own their connections; don't leak them
+        connections.close_all()
+
+def run_job(job_id):
+    """
+    Processa um pedido pendente. O pedido é reivindicado com um UPDATE
+    condicional, então um mesmo pedido nunca é processado duas vezes.
+    """
+    claimed = ItineraryJob.objects.filter(pk=job_id, status=ItineraryJob.STATUS_PENDING).update(
+        status=ItineraryJob.STATUS_RUNNING, iniciado_em=timezone.now()
+    )
+    if not claimed:
+        return
+
+    job = ItineraryJob.objects.get(pk=job_id)
+    try:
+        plano, roteiro, _ = itinerary.generate(itinerary.normalize_request(job.parametros))
+    except Exception as e:
+        job.status = ItineraryJob.STATUS_FAILED
+        job.erro = str(e) if isinstance(e, itinerary.NoSpotsFound) else f'Erro ao gerar roteiro: {str(e)}'
+    else:
+        job.status = ItineraryJob.STATUS_DONE
+        job.plano = plano
+        job.roteiro = roteiro or ''
+    job.concluido_em = timezone.now()
+    job.save(update_fields=['status', 'plano', 'roteiro', 'erro', 'concluido_em'])
+
+def requeue_stale_jobs():
+    """
+    Devolve à fila pedidos em andamento há mais de ``ITINERARY_JOB_TIMEOUT``
+    segundos (processo reiniciado no meio da geração).
+    """
+    limit = timezone.now() - timedelta(seconds=getattr(settings, 'ITINERARY_JOB_TIMEOUT', 300))
+    return ItineraryJob.objects.filter(
+        status=ItineraryJob.STATUS_RUNNING, iniciado_em__lt=limit
+    ).update(status=ItineraryJob.STATUS_PENDING, iniciado_em=None)
+
+def run_pending_jobs(limit=None):
+    """
+    Processa sequencialmente os pedidos pendentes, do mais antigo ao mais novo.
+    """
+    job_ids = ItineraryJob.objects.filter(status=ItineraryJob.STATUS_PENDING).order_by('data_criacao').values_list('pk', flat=True)
+    if limit:
+        job_ids = job_ids[:limit]
+    processed = 0
+    for job_id in list(job_ids):
+        run_job(job_id)
+        processed += 1
+    return processed
@@ -0,0 +1,468 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Upstream errors worth retrying, matched by name so google-api-core stays an
+# implementation detail of the Gemini backend
+RETRYABLE_ERROR_NAMES = frozenset({
+    'DeadlineExceeded', 'InternalServerError', 'ResourceExhausted',
+    'ServiceUnavailable', 'TooManyRequests', 'RetryError',
+})
+
+class LLMError(Exception):
+    """
+    Erro base do cliente de modelo de linguagem.
+    """
+
+class LLMUnavailable(LLMError):
+    """
+    O modelo não pode ser chamado agora (circuito aberto ou limite de
+    chamadas simultâneas atingido). O cliente deve tentar mais tarde.
+    """
+
+class LLMTransientError(LLMError):
+    """
+    Falha temporária que pode ser repetida.
+    """
+
+def is_retryable(exc):
+    return isinstance(exc, (TimeoutError, ConnectionError, LLMTransientError)) or type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+class GeminiBackend:
+    """
+    Backend do Gemini. A configuração da API e o modelo são criados uma única
+    vez, na primeira chamada.
+    """
+    def __init__(self, model_name=None):
+        self.model_name = model_name or getattr(settings, 'LLM_MODEL', 'gemini-pro')
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt, timeout):
+        response = self.get_model().generate_content(prompt, request_options={'timeout': timeout})
+        if hasattr(response, 'text'):
+            return response.text
+        return response.candidates[0].content.parts[0].text
+
+    async def agenerate(self, prompt, timeout):
+        response = await self.get_model().generate_content_async(prompt, request_options={'timeout': timeout})
+        if hasattr(response, 'text'):
+            return response.text
+        return response.candidates[0].content.parts[0].text
+
+    def stream(self, prompt, timeout):
+        response = self.get_model().generate_content(prompt, stream=True, request_options={'timeout': timeout})
+        for chunk in response:
+            yield chunk.text
+
+class FakeBackend:
+    """
+    Backend local para testes e desenvolvimento sem acesso ao Gemini.
+
+    ``errors`` é uma lista de exceções levantadas, uma por chamada, antes de
+    as chamadas passarem a ter sucesso.
+    """
+    def __init__(self, response=None, latency=None, errors=None):
+        self.response = response if response is not None else getattr(settings, 'LLM_FAKE_RESPONSE', 'Dia 1: roteiro de teste.')
+        self.latency = latency if latency is not None else getattr(settings, 'LLM_FAKE_LATENCY', 0.0)
+        self.errors = list(errors or [])
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def generate(self, prompt, timeout):
+        self._call()
+        return self.response
+
+    async def agenerate(self, prompt, timeout):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.response
+
+    def stream(self, prompt, timeout):
+        self._call()
+        for word in self.response.split(' '):
+            yield word + ' '
+
+class CircuitBreaker:
+    """
+    Após ``failure_threshold`` falhas seguidas o circuito abre e as chamadas
+    falham imediatamente por ``reset_timeout`` segundos; depois disso uma
+    única chamada de teste decide se ele fecha ou abre novamente.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise LLMUnavailable('Serviço de roteiros temporariamente indisponível.')
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise LLMUnavailable('Serviço de roteiros temporariamente indisponível.')
+                self._trial_in_flight = True
+
+    def cancel_trial(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+class Metrics:
+    """
+    Contadores, erros por tipo e latências (últimas ``window`` chamadas).
+    Com ``log_interval`` o resumo é registrado no log a cada ``log_interval``
+    segundos, no máximo, junto de uma chamada.
+    """
+    COUNTERS = ('calls', 'successes', 'failures', 'retries', 'rejected', 'short_circuited')
+
+    def __init__(self, window=500, log_interval=0):
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.errors = {}
+        self.latencies = deque(maxlen=window)
+        self.log_interval = log_interval
+        self._logged_at = time.monotonic()
+
+    def incr(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def error(self, exc):
+        name = type(exc).__name__
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def observe(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            now = time.monotonic()
+            due = self.log_interval and now - self._logged_at >= self.log_interval
+            if due:
+                self._logged_at = now
+        if due:
+            logger.info('Métricas do modelo: %s', self.snapshot())
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.counters, errors=dict(self.errors))
+            latencies = sorted(self.latencies)
+        if latencies:
+            data['latency_p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 1)
+            data['latency_p95_ms'] = round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000, 1)
+            data['latency_max_ms'] = round(latencies[-1] * 1000, 1)
+        return data
+
+class _Slot:
+    """
+    Vaga no semáforo de concorrência, liberada só quando a chamada e todas as
+    threads iniciadas por ela terminam.
+    """
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self._holders = 1
+        self._lock = threading.Lock()
+
+    def hold(self):
+        with self._lock:
+            self._holders += 1
+
+    def release(self):
+        with self._lock:
+            self._holders -= 1
+            last = self._holders == 0
+        if last:
+            self._semaphore.release()
+
+class LLMClient:
+    """
+    Cliente do modelo compartilhado pelo processo.
+
+    Cada chamada tem um prazo total (``timeout`` segundos, incluindo as novas
+    tentativas), disputa um semáforo global que limita as chamadas
+    simultâneas, é repetida com backoff exponencial com jitter em falhas
+    temporárias e passa por um circuit breaker que falha rápido enquanto o
+    serviço estiver instável.
+    """
+    def __init__(self, backend, timeout=30, max_concurrency=4, max_retries=2,
+                 backoff_base=0.5, backoff_max=4.0, failure_threshold=5, reset_timeout=30,
+                 metrics_log_interval=0):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = Metrics(log_interval=metrics_log_interval)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _acquire(self, deadline):
+        try:
+            self.breaker.before_call()
+        except LLMUnavailable:
+            self.metrics.incr('short_circuited')
+            raise
+        if not self.semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            self.breaker.cancel_trial()
+            self.metrics.incr('rejected')
+            raise LLMUnavailable('Muitos roteiros sendo gerados. Tente novamente em instantes.')
+
+    def _retry_delay(self, exc, attempt, deadline):
+        """
+        Espera antes da próxima tentativa, ou ``None`` se não houver nova tentativa.
+        """
+        if not is_retryable(exc) or attempt >= self.max_retries:
+            return None
+        # Full jitter: random delay up to the exponential cap, never past the deadline
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        self.metrics.incr('retries')
+        return delay
+
+    def _should_retry(self, exc, attempt, deadline):
+        delay = self._retry_delay(exc, attempt, deadline)
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _failed(self, exc, started):
+        elapsed = time.monotonic() - started
+        self.metrics.observe(elapsed)
+        self.metrics.error(exc)
+        logger.warning('Falha na chamada ao modelo após %.0f ms: %s: %s', elapsed * 1000, type(exc).__name__, exc)
+
+    def _succeeded(self, started):
+        self.metrics.observe(time.monotonic() - started)
+        self.metrics.incr('successes')
+        self.breaker.record_success()
+
+    def _gave_up(self):
+        self.metrics.incr('failures')
+        self.breaker.record_failure()
+
+    def generate(self, prompt):
+        """
+        Retorna o texto gerado para o prompt.
+        """
+        deadline = time.monotonic() + self.timeout
+        self._acquire(deadline)
+        try:
+            attempt = 0
+            while True:
+                self.metrics.incr('calls')
+                started = time.monotonic()
+                try:
+                    result = self.backend.generate(prompt, timeout=max(deadline - started, 0.001))
+                except Exception as exc:
+                    self._failed(exc, started)
+                    if self._should_retry(exc, attempt, deadline):
+                        attempt += 1
+                        continue
+                    self._gave_up()
+                    raise
+                self._succeeded(started)
+                return result
+        finally:
+            self.semaphore.release()
+
+    async def _aacquire(self, deadline):
+        try:
+            self.breaker.before_call()
+        except LLMUnavailable:
+            self.metrics.incr('short_circuited')
+            raise
+        # The semaphore is shared with the sync path, so poll it instead of blocking the loop
+        while not self.semaphore.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self.breaker.cancel_trial()
+                self.metrics.incr('rejected')
+                raise LLMUnavailable('Muitos roteiros sendo gerados. Tente novamente em instantes.')
+            await asyncio.sleep(0.05)
+
+    def _get_executor(self):
+        # Threads hold a concurrency slot while they run, so this many always suffice
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='llm')
+            return self._executor
+
+    def _in_thread(self, slot, prompt, timeout):
+        """
+        Chama o backend síncrono em uma thread que mantém a vaga no semáforo
+        até retornar, mesmo que quem espera seja cancelado. O prazo fica a
+        cargo do backend: sem ``wait_for`` nenhuma thread abandonada continua
+        chamando o modelo fora do limite de concorrência.
+        """
+        future = self._get_executor().submit(self.backend.generate, prompt, timeout)
+        slot.hold()
+        future.add_done_callback(lambda f: slot.release())
+        return asyncio.wrap_future(future)
+
+    async def agenerate(self, prompt):
+        """
+        Versão assíncrona de ``generate``, com os mesmos prazo, limite de
+        concorrência, novas tentativas e circuit breaker. Usa ``agenerate`` do
+        backend quando existe; senão, a chamada síncrona roda em uma thread.
+        """
+        native = getattr(self.backend, 'agenerate', None)
+        deadline = time.monotonic() + self.timeout
+        await self._aacquire(deadline)
+        slot = _Slot(self.semaphore)
+        try:
+            attempt = 0
+            while True:
+                self.metrics.incr('calls')
+                started = time.monotonic()
+                remaining = max(deadline - started, 0.001)
+                try:
+                    if native is not None:
+                        result = await asyncio.wait_for(native(prompt, timeout=remaining), remaining)
+                    else:
+                        result = await self._in_thread(slot, prompt, remaining)
+                except Exception as exc:
+                    self._failed(exc, started)
+                    delay = self._retry_delay(exc, attempt, deadline)
+                    if delay is not None:
+                        await asyncio.sleep(delay)
+                        attempt += 1
+                        continue
+                    self._gave_up()
+                    raise
+                self._succeeded(started)
+                return result
+        finally:
+            # A cancelled request (client gone) must not leave a half-open trial pending
+            self.breaker.cancel_trial()
+            slot.release()
+
+    def stream(self, prompt):
+        """
+        Produz os trechos de texto gerados para o prompt. Só há nova tentativa
+        enquanto nenhum trecho foi entregue; a vaga no semáforo fica ocupada
+        até o fim do stream.
+        """
+        deadline = time.monotonic() + self.timeout
+        self._acquire(deadline)
+        try:
+            attempt = 0
+            while True:
+                self.metrics.incr('calls')
+                started = time.monotonic()
+                produced = False
+                try:
+                    for chunk in self.backend.stream(prompt, timeout=max(deadline - started, 0.001)):
+                        produced = True
+                        yield chunk
+                except Exception as exc:
+                    self._failed(exc, started)
+                    if not produced and self._should_retry(exc, attempt, deadline):
+                        attempt += 1
+                        continue
+                    self._gave_up()
+                    raise
+                self._succeeded(started)
+                return
+        finally:
+            # An abandoned stream must not keep a half-open circuit waiting forever
+            self.breaker.cancel_trial()
+            self.semaphore.release()
+
+    def stats(self):
+        """
+        Métricas deste processo e o estado do circuito.
+        """
+        return dict(self.metrics.snapshot(), circuit=self.breaker.state)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Cliente único do processo, criado na primeira chamada a partir das
+    configurações ``LLM_*``.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                backend_class = import_string(getattr(settings, 'LLM_BACKEND', 'tourist_spots.llm.GeminiBackend'))
+                _client = LLMClient(
+                    backend_class(),
+                    timeout=getattr(settings, 'LLM_TIMEOUT', 30),
+                    max_concurrency=getattr(settings, 'LLM_MAX_CONCURRENCY', 4),
+                    max_retries=getattr(settings, 'LLM_MAX_RETRIES', 2),
+                    backoff_base=getattr(settings, 'LLM_BACKOFF_BASE', 0.5),
+                    backoff_max=getattr(settings, 'LLM_BACKOFF_MAX', 4.0),
+                    failure_threshold=getattr(settings, 'LLM_CIRCUIT_FAILURE_THRESHOLD', 5),
+                    reset_timeout=getattr(settings, 'LLM_CIRCUIT_RESET_TIMEOUT', 30),
+                    metrics_log_interval=getattr(settings, 'LLM_METRICS_LOG_INTERVAL', 0),
+                )
+    return _client
+
+def reset_client():
+    global _client
+    with _client_lock:
+        _client = None
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith('LLM_') or setting == 'GEMINI_API_KEY':
+        reset_client()
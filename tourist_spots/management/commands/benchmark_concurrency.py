@@ -0,0 +1,52 @@
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = 'Mede quantas gerações de roteiro simultâneas um servidor em execução (WSGI ou ASGI) atende'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000', help='Endereço do servidor')
+        parser.add_argument('--token', required=True, help='Token de acesso JWT')
+        parser.add_argument('--cidade', default='serra', help='Cidade dos roteiros pedidos')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requisições simultâneas')
+        parser.add_argument('--requests', type=int, default=200, help='Total de requisições')
+        parser.add_argument('--timeout', type=float, default=120, help='Tempo máximo por requisição, em segundos')
+
+    def handle(self, *args, **options):
+        url = options['url'].rstrip('/') + '/api/generate-itinerary/'
+        headers = {'Authorization': f"Bearer {options['token']}", 'Content-Type': 'application/json'}
+
+        def call(_):
+            # A unique interest per request defeats the itinerary cache
+            body = json.dumps({'cidade': options['cidade'], 'dias': 1, 'interesses': uuid.uuid4().hex}).encode()
+            started = time.monotonic()
+            try:
+                with urlopen(Request(url, data=body, headers=headers), timeout=options['timeout']) as response:
+                    status = response.status
+            except HTTPError as e:
+                status = e.code
+            except (URLError, TimeoutError):
+                status = None
+            return status, time.monotonic() - started
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(call, range(options['requests'])))
+        elapsed = time.monotonic() - started
+
+        latencies = sorted(latency for status, latency in results if status == 200)
+        statuses = {}
+        for status, _ in results:
+            statuses[status or 'erro'] = statuses.get(status or 'erro', 0) + 1
+        self.stdout.write(f"Requisições: {len(results)} em {elapsed:.1f} s ({len(latencies) / elapsed:.1f} roteiros/s)")
+        self.stdout.write(f"Status: {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))}")
+        if latencies:
+            self.stdout.write(
+                f"Latência p50: {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+                f"p95: {latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000:.0f} ms"
+            )
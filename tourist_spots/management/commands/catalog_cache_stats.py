@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from tourist_spots.cache import get_cache_stats, reset_cache_stats
+
+class Command(BaseCommand):
+    help = 'Exibe os acertos e falhas do cache de respostas do catálogo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zera os contadores após exibi-los')
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        self.stdout.write(
+            f"Versão do catálogo: {stats['version']}\n"
+            f"Acertos: {stats['hits']}\n"
+            f"Falhas: {stats['misses']}\n"
+            f"Taxa de acerto: {stats['hit_rate']:.1%}"
+        )
+        if options['reset']:
+            reset_cache_stats()
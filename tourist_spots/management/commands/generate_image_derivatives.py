@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from tourist_spots.images import backfill
+from tourist_spots.models import TouristSpotImage
+
+class Command(BaseCommand):
+    help = 'Gera miniaturas e versões WebP/AVIF das imagens de pontos turísticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reprocessa também as imagens que já têm derivados')
+        parser.add_argument('--workers', type=int, default=4, help='Número de imagens processadas em paralelo')
+
+    def handle(self, *args, **options):
+        queryset = TouristSpotImage.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(derivados={})
+        processed, failed = backfill(queryset, workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'{processed} imagens processadas, {failed} falhas.'))
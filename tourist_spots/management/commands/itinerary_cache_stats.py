@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from tourist_spots.itinerary import get_stats, reset_stats
+
+class Command(BaseCommand):
+    help = 'Exibe a taxa de acerto do cache de roteiros e as chamadas ao modelo economizadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zera os contadores após exibi-los')
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        self.stdout.write(
+            f"Acertos: {stats['hits']}\n"
+            f"Coalescidas: {stats['coalesced']}\n"
+            f"Falhas: {stats['misses']}\n"
+            f"Chamadas ao modelo: {stats['upstream_calls']}\n"
+            f"Chamadas economizadas: {stats['upstream_saved']}\n"
+            f"Taxa de acerto: {stats['hit_rate']:.1%}"
+        )
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from tourist_spots.models import TouristSpot
+from tourist_spots.search import index_spot
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca de todos os pontos turísticos'
+
+    def handle(self, *args, **options):
+        total = 0
+        for spot in TouristSpot.objects.iterator():
+            index_spot(spot)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'{total} pontos turísticos indexados.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from tourist_spots.jobs import requeue_stale_jobs, run_pending_jobs
+
+class Command(BaseCommand):
+    help = 'Processa pedidos de roteiro pendentes (recupera pedidos interrompidos por reinícios)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Número máximo de pedidos a processar')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        processed = run_pending_jobs(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{requeued} pedidos devolvidos à fila, {processed} pedidos processados.'
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:08
+
+from django.db import migrations, models
+
+from tourist_spots.geo import encode
+
+
+def populate_geohash(apps, schema_editor):
+    TouristSpot = apps.get_model('tourist_spots', 'TouristSpot')
+    spots = list(TouristSpot.objects.only('id', 'latitude', 'longitude'))
+    for spot in spots:
+        spot.geohash = encode(spot.latitude, spot.longitude)
+    TouristSpot.objects.bulk_update(spots, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourist_spots', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touristspot',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
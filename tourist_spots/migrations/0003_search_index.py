@@ -0,0 +1,68 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from tourist_spots.search import POSTGRES_VECTOR_SQL, build_document, build_terms
+
+
+def create_postgres_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    vector = POSTGRES_VECTOR_SQL.format(table='"tourist_spots_searchdocument"')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS tourist_spots_searchdocument_vector_idx '
+        f'ON tourist_spots_searchdocument USING GIN ({vector})'
+    )
+
+
+def drop_postgres_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS tourist_spots_searchdocument_vector_idx')
+
+
+def populate_search_index(apps, schema_editor):
+    TouristSpot = apps.get_model('tourist_spots', 'TouristSpot')
+    SearchDocument = apps.get_model('tourist_spots', 'SearchDocument')
+    SearchTerm = apps.get_model('tourist_spots', 'SearchTerm')
+    for spot in TouristSpot.objects.all():
+        titulo, corpo = build_document(spot)
+        document = SearchDocument.objects.create(ponto_turistico=spot, titulo=titulo, corpo=corpo)
+        SearchTerm.objects.bulk_create([
+            SearchTerm(documento=document, termo=term, peso=weight)
+            for term, weight in build_terms(spot).items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourist_spots', '0002_touristspot_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('ponto_turistico', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='documento_busca', serialize=False, to='tourist_spots.touristspot')),
+                ('titulo', models.TextField()),
+                ('corpo', models.TextField()),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termo', models.CharField(db_index=True, max_length=64)),
+                ('peso', models.PositiveIntegerField()),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termos', to='tourist_spots.searchdocument')),
+            ],
+            options={
+                'unique_together': {('documento', 'termo')},
+            },
+        ),
+        migrations.RunPython(create_postgres_index, drop_postgres_index),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
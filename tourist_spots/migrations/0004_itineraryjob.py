@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:16
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourist_spots', '0003_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItineraryJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('parametros', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em andamento'), ('done', 'Concluído'), ('failed', 'Falhou')], db_index=True, default='pending', max_length=10)),
+                ('roteiro', models.TextField(blank=True)),
+                ('erro', models.TextField(blank=True)),
+                ('data_criacao', models.DateTimeField(default=django.utils.timezone.now)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='roteiros', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
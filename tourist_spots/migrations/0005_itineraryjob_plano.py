@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourist_spots', '0004_itineraryjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itineraryjob',
+            name='plano',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourist_spots', '0005_itineraryjob_plano'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touristspotimage',
+            name='derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
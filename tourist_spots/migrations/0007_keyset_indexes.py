@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourist_spots', '0006_touristspotimage_derivados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='touristspot',
+            index=models.Index(fields=['nome', 'id'], name='touristspot_nome_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='touristspot',
+            index=models.Index(fields=['cidade', 'id'], name='touristspot_cidade_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='touristspot',
+            index=models.Index(fields=['data_criacao', 'id'], name='touristspot_criacao_id_idx'),
+        ),
+    ]
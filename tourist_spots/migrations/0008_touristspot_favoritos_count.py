@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourist_spots', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='touristspot',
+            name='favoritos_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='touristspot',
+            index=models.Index(fields=['favoritos_count', 'id'], name='touristspot_favoritos_id_idx'),
+        ),
+    ]
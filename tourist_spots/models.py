@@ -1,6 +1,8 @@
 import uuid
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
+from . import geo
 
 class TouristSpot(models.Model):
     CATEGORY_CHOICES = (
@@ -21,6 +23,34 @@ class TouristSpot(models.Model):
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
     categoria = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     data_criacao = models.DateTimeField(default=timezone.now)
+    geohash = models.CharField(max_length=geo.GEOHASH_PRECISION, db_index=True, editable=False, blank=True)
+    # Maintained by favorites.counters; reconcile with `manage.py reconcile_favorite_counts`
+    favoritos_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    def save(self, *args, **kwargs):
+        # Keep the spatial key in sync with the coordinates
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+                kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # The in-memory counter may be stale; only F() updates may write it
+            skip = self.get_deferred_fields() | {'favoritos_count'}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skip and field.name not in skip
+            ]
+        super().save(*args, **kwargs)
+    
+    class Meta:
+        # Keyset pagination seeks on (ordering field, id)
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='touristspot_nome_id_idx'),
+            models.Index(fields=['cidade', 'id'], name='touristspot_cidade_id_idx'),
+            models.Index(fields=['data_criacao', 'id'], name='touristspot_criacao_id_idx'),
+            models.Index(fields=['favoritos_count', 'id'], name='touristspot_favoritos_id_idx'),
+        ]
     
     def __str__(self):
         return self.nome
@@ -30,6 +60,64 @@ class TouristSpotImage(models.Model):
     ponto_turistico = models.ForeignKey(TouristSpot, related_name='imagens', on_delete=models.CASCADE)
     imagem = models.ImageField(upload_to='tourist_spots/')
     descricao = models.CharField(max_length=255, blank=True)
+    # Generated by tourist_spots.images: {'largura', 'altura', '<formato>': {'<largura>': path}}
+    derivados = models.JSONField(default=dict, blank=True, editable=False)
     
     def __str__(self):
         return f"Imagem de {self.ponto_turistico.nome}"
+
+class SearchDocument(models.Model):
+    """
+    Documento de busca normalizado (sem acentos) de um ponto turístico.
+    Mantido por ``tourist_spots.search.index_spot``.
+    """
+    ponto_turistico = models.OneToOneField(TouristSpot, primary_key=True, related_name='documento_busca', on_delete=models.CASCADE)
+    titulo = models.TextField()
+    corpo = models.TextField()
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.titulo
+
+class SearchTerm(models.Model):
+    """
+    Entrada do índice invertido: um radical e seu peso em um documento.
+    """
+    documento = models.ForeignKey(SearchDocument, related_name='termos', on_delete=models.CASCADE)
+    termo = models.CharField(max_length=64, db_index=True)
+    peso = models.PositiveIntegerField()
+    
+    class Meta:
+        unique_together = ('documento', 'termo')
+    
+    def __str__(self):
+        return self.termo
+
+class ItineraryJob(models.Model):
+    """
+    Pedido de geração de roteiro processado em segundo plano.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pendente'),
+        (STATUS_RUNNING, 'Em andamento'),
+        (STATUS_DONE, 'Concluído'),
+        (STATUS_FAILED, 'Falhou'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='roteiros')
+    parametros = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    plano = models.JSONField(null=True, blank=True)
+    roteiro = models.TextField(blank=True)
+    erro = models.TextField(blank=True)
+    data_criacao = models.DateTimeField(default=timezone.now)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Roteiro {self.id} ({self.get_status_display()})"
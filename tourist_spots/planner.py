@@ -0,0 +1,168 @@
+import math
+from .geo import haversine_km
+from .search import tokenize
+
+MAX_KMEANS_ITERATIONS = 25
+
+def _coords(spot):
+    return float(spot.latitude), float(spot.longitude)
+
+def _distance(a, b):
+    return haversine_km(a[0], a[1], b[0], b[1])
+
+def _interest_score(spot, interest_terms):
+    # Spots loaded by itinerary.fetch_spots carry the search index relevance
+    relevancia = getattr(spot, 'relevancia', None)
+    if relevancia is not None:
+        return relevancia
+    terms = set(tokenize(f'{spot.nome} {spot.get_categoria_display()} {spot.descricao}'))
+    return len(terms & interest_terms)
+
+def select_spots(spots, categorias=None, interesses='', limit=None):
+    """
+    Filtra os pontos pelas categorias e, quando há interesses, mantém apenas
+    os pontos relacionados a eles (se nenhum for, mantém todos).
+
+    Os pontos são classificados pela afinidade com os interesses e, em
+    seguida, pelo número de imagens; com ``limit`` ficam os mais bem
+    classificados. A ordem de saída é determinística.
+    """
+    spots = [spot for spot in spots if not categorias or spot.categoria in categorias]
+    interest_terms = set(tokenize(interesses))
+    scored = [
+        (_interest_score(spot, interest_terms) if interest_terms else 0, spot)
+        for spot in spots
+    ]
+    if interest_terms and any(score for score, _ in scored):
+        scored = [(score, spot) for score, spot in scored if score]
+    scored.sort(key=lambda item: (-item[0], -getattr(item[1], 'num_imagens', 0), item[1].nome, str(item[1].id)))
+    if limit is not None:
+        scored = scored[:limit]
+    return [spot for _, spot in scored]
+
+def _farthest_first(points, k):
+    """
+    Centróides iniciais: o ponto mais distante da média e, em seguida, sempre o
+    ponto mais distante dos centróides já escolhidos.
+    """
+    mean = (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+    chosen = [max(range(len(points)), key=lambda i: (_distance(points[i], mean), -i))]
+    while len(chosen) < k:
+        chosen.append(max(
+            (i for i in range(len(points)) if i not in chosen),
+            key=lambda i: (min(_distance(points[i], points[c]) for c in chosen), -i),
+        ))
+    return [points[i] for i in chosen]
+
+def cluster(points, k):
+    """
+    K-means com capacidade: divide ``points`` (lista de ``(lat, lng)``) em ``k``
+    grupos de no máximo ``ceil(n / k)`` pontos. Retorna a lista de grupos
+    (índices dos pontos).
+    """
+    if not points:
+        return [[] for _ in range(k)]
+    k = min(k, len(points))
+    capacity = math.ceil(len(points) / k)
+    centroids = _farthest_first(points, k)
+    assignment = None
+
+    for _ in range(MAX_KMEANS_ITERATIONS):
+        distances = [[_distance(point, centroid) for centroid in centroids] for point in points]
+        # Points with the most to lose from not getting their nearest cluster go first
+        order = sorted(
+            range(len(points)),
+            key=lambda i: (-(sorted(distances[i])[1] - min(distances[i])) if k > 1 else 0, i),
+        )
+        sizes = [0] * k
+        new_assignment = [None] * len(points)
+        for i in order:
+            for c in sorted(range(k), key=lambda c: (distances[i][c], c)):
+                if sizes[c] < capacity:
+                    new_assignment[i] = c
+                    sizes[c] += 1
+                    break
+        if new_assignment == assignment:
+            break
+        assignment = new_assignment
+        for c in range(k):
+            members = [points[i] for i in range(len(points)) if assignment[i] == c]
+            if not members:
+                # Capacity can leave a cluster empty (e.g. duplicate coordinates); keep its centroid
+                continue
+            centroids[c] = (sum(p[0] for p in members) / len(members), sum(p[1] for p in members) / len(members))
+
+    groups = [[] for _ in range(k)]
+    for i, c in enumerate(assignment):
+        groups[c].append(i)
+    return groups
+
+def _path_length(path, points, start):
+    length = _distance(start, points[path[0]]) if start is not None and path else 0.0
+    return length + sum(_distance(points[a], points[b]) for a, b in zip(path, path[1:]))
+
+def order_route(indices, points, start=None):
+    """
+    Ordena as visitas de um dia: vizinho mais próximo a partir de ``start``
+    (ou do ponto mais afastado do centro do grupo) seguido de 2-opt.
+    """
+    if len(indices) <= 1:
+        return list(indices)
+    remaining = set(indices)
+    if start is not None:
+        current = min(remaining, key=lambda i: (_distance(start, points[i]), i))
+    else:
+        center = (sum(points[i][0] for i in indices) / len(indices), sum(points[i][1] for i in indices) / len(indices))
+        current = max(remaining, key=lambda i: (_distance(center, points[i]), -i))
+    route = [current]
+    remaining.remove(current)
+    while remaining:
+        current = min(remaining, key=lambda i: (_distance(points[route[-1]], points[i]), i))
+        route.append(current)
+        remaining.remove(current)
+
+    # 2-opt on the open path
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(route) - 1):
+            for j in range(i + 1, len(route)):
+                candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                if _path_length(candidate, points, start) + 1e-9 < _path_length(route, points, start):
+                    route = candidate
+                    improved = True
+    return route
+
+def plan_itinerary(spots, dias, start=None, max_visits_per_day=None):
+    """
+    Distribui os pontos em ``dias`` dias agrupando-os por proximidade e ordena
+    as visitas de cada dia. ``start`` é a coordenada ``(lat, lng)`` da
+    hospedagem, quando conhecida.
+
+    Retorna uma lista (um item por dia) de listas ``(ponto, km desde a parada
+    anterior)``.
+    """
+    if max_visits_per_day is not None:
+        spots = spots[:dias * max_visits_per_day]
+    points = [_coords(spot) for spot in spots]
+    groups = [group for group in cluster(points, dias) if group]
+
+    def group_center(group):
+        return (sum(points[i][0] for i in group) / len(group), sum(points[i][1] for i in group) / len(group))
+
+    if start is not None:
+        groups.sort(key=lambda group: (_distance(start, group_center(group)), min(group)))
+
+    days = []
+    for group in groups:
+        route = order_route(group, points, start)
+        visits = []
+        previous = start
+        for i in route:
+            leg = _distance(previous, points[i]) if previous is not None else 0.0
+            visits.append((spots[i], leg))
+            previous = points[i]
+        days.append(visits)
+    while len(days) < dias:
+        days.append([])
+    return days
@@ -0,0 +1,87 @@
+import re
+from django.conf import settings
+
+# Rough average for Portuguese text; good enough to keep prompts bounded
+CHARS_PER_TOKEN = 4
+MIN_DESCRIPTION_CHARS = 60
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+def summarize(text, max_chars):
+    """
+    Reduz a descrição a no máximo ``max_chars`` caracteres, mantendo frases
+    inteiras sempre que possível.
+    """
+    text = ' '.join((text or '').split())
+    if len(text) <= max_chars:
+        return text
+    summary = ''
+    for sentence in SENTENCE_RE.split(text):
+        candidate = f'{summary} {sentence}'.strip()
+        if len(candidate) > max_chars:
+            break
+        summary = candidate
+    if summary:
+        return summary
+    cut = text[:max_chars - 1].rsplit(' ', 1)[0]
+    return cut.rstrip(',;:') + '…'
+
+def spot_line(spot, descricao):
+    imagem_info = f", Imagens disponíveis: {spot.num_imagens}" if spot.num_imagens else ""
+    return (
+        f"- {spot.nome}: {descricao} (Categoria: {spot.get_categoria_display()}, "
+        f"Cidade: {spot.cidade}, Coordenadas: {spot.latitude},{spot.longitude}{imagem_info})"
+    )
+
+class PromptBuilder:
+    """
+    Monta o prompt de narrativa do roteiro a partir do plano calculado.
+
+    As descrições dos pontos dividem igualmente o orçamento de
+    ``ITINERARY_PROMPT_TOKEN_BUDGET`` tokens, descontado o espaço ocupado pelo
+    restante de cada linha. Os pontos devem vir anotados com ``num_imagens``.
+    """
+    def __init__(self, token_budget=None):
+        if token_budget is None:
+            token_budget = getattr(settings, 'ITINERARY_PROMPT_TOKEN_BUDGET', 2500)
+        self.token_budget = token_budget
+
+    def description_limit(self, spots):
+        fixed = sum(len(spot_line(spot, '')) for spot in spots)
+        available = self.token_budget * CHARS_PER_TOKEN - fixed
+        return max(available // max(len(spots), 1), MIN_DESCRIPTION_CHARS)
+
+    def build_spots_text(self, plan):
+        limit = self.description_limit([spot for visits in plan for spot, _ in visits])
+        days_text = []
+        for numero, visits in enumerate(plan, start=1):
+            if not visits:
+                days_text.append(f"Dia {numero}: dia livre")
+                continue
+            lines = [f"Dia {numero}:"]
+            lines.extend(spot_line(spot, summarize(spot.descricao, limit)) for spot, _ in visits)
+            days_text.append("\n".join(lines))
+        return "\n\n".join(days_text)
+
+    def build(self, params, plan, cidade_nome):
+        """
+        Retorna ``(prompt, texto dos pontos)``; o texto dos pontos compõe a
+        impressão digital usada no cache de roteiros.
+        """
+        spots_text = self.build_spots_text(plan)
+
+        criancas_texto = "Sim, estou viajando com crianças. " if params['com_criancas'] else ""
+        hospedagem_texto = f"Estarei hospedado em {params['hospedagem']}. " if params['hospedagem'] else ""
+        interesses = params['interesses']
+
+        prompt = (
+            f"Sou um turista e vou passar {params['dias']} dias na região {cidade_nome}. "
+            f"{criancas_texto}{hospedagem_texto}"
+            f"Meus interesses são: {interesses if interesses else 'diversos'}. "
+            "Este é o meu plano de visitas, já dividido por dia e ordenado pela proximidade geográfica:"
+            f"\n\n{spots_text}\n\n"
+            "Por favor, escreva um roteiro diário detalhado a partir desse plano, mantendo os pontos e a ordem "
+            "de cada dia. Inclua sugestões de horários para cada atração e dicas práticas. "
+            "Organize o roteiro por dia (Dia 1, Dia 2, etc.) e seja objetivo. "
+            "Responda em português do Brasil."
+        )
+        return prompt, spots_text
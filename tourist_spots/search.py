@@ -0,0 +1,179 @@
+import re
+import unicodedata
+from collections import Counter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.expressions import RawSQL
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+MAX_TERM_LENGTH = 64
+
+STOPWORDS = frozenset("""
+    a ao aos as com da das de do dos e em entre na nas no nos o os ou para pela
+    pelas pelo pelos por que se sem sob sobre um uma umas uns
+""".split())
+
+# Field weights used by the inverted index ranking
+FIELD_WEIGHTS = {'nome': 8, 'cidade': 4, 'categoria': 2, 'descricao': 1}
+
+# Light Portuguese stemmer (a reduced RSLP): plural, diminutive/adverb and
+# final vowel, applied to accent-folded tokens. Order matters.
+PLURAL_SUFFIXES = (
+    ('oes', 'ao'), ('aes', 'ao'), ('ns', 'm'), ('ais', 'al'), ('eis', 'el'),
+    ('ois', 'ol'), ('res', 'r'), ('les', 'l'), ('zes', 'z'), ('s', ''),
+)
+DERIVATION_SUFFIXES = ('zinho', 'zinha', 'inho', 'inha', 'mente')
+FINAL_VOWELS = ('a', 'e', 'o')
+
+POSTGRES_VECTOR_SQL = (
+    "(setweight(to_tsvector('portuguese', {table}.\"titulo\"), 'A') || "
+    "setweight(to_tsvector('portuguese', {table}.\"corpo\"), 'B'))"
+)
+
+def fold(text):
+    """
+    Remove acentos e converte para minúsculas ("Tianguá" -> "tiangua").
+    """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+def stem(token):
+    """
+    Reduz um token já normalizado ao seu radical.
+    """
+    if len(token) > 3 and not token.endswith('ss'):
+        for suffix, replacement in PLURAL_SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+                token = token[:-len(suffix)] + replacement
+                break
+    for suffix in DERIVATION_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+    if len(token) > 4 and token.endswith(FINAL_VOWELS):
+        token = token[:-1]
+    return token
+
+def tokenize(text):
+    """
+    Normaliza o texto e retorna os radicais, descartando stopwords.
+    """
+    return [
+        stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(fold(text))
+        if token not in STOPWORDS
+    ]
+
+def build_document(spot):
+    """
+    Monta o documento de busca (título e corpo normalizados) de um ponto turístico.
+    """
+    titulo = fold(spot.nome)
+    corpo = ' '.join(fold(value) for value in (spot.cidade, spot.get_categoria_display(), spot.descricao))
+    return titulo, corpo
+
+def build_terms(spot):
+    """
+    Calcula o peso de cada termo do ponto turístico para o índice invertido.
+    """
+    weights = Counter()
+    fields = {
+        'nome': spot.nome,
+        'cidade': spot.cidade,
+        'categoria': spot.get_categoria_display(),
+        'descricao': spot.descricao,
+    }
+    for field, text in fields.items():
+        for term in tokenize(text):
+            weights[term] += FIELD_WEIGHTS[field]
+    return weights
+
+def index_spot(spot):
+    """
+    Atualiza o documento e as entradas do índice invertido de um ponto turístico.
+    """
+    from .models import SearchDocument, SearchTerm
+
+    titulo, corpo = build_document(spot)
+    with transaction.atomic():
+        document, _ = SearchDocument.objects.update_or_create(
+            ponto_turistico=spot, defaults={'titulo': titulo, 'corpo': corpo}
+        )
+        SearchTerm.objects.filter(documento=document).delete()
+        SearchTerm.objects.bulk_create([
+            SearchTerm(documento=document, termo=term, peso=weight)
+            for term, weight in build_terms(spot).items()
+        ])
+
+class InvertedIndexBackend:
+    """
+    Busca no índice invertido mantido em ``SearchTerm``. Funciona em qualquer
+    banco; exige que todos os termos da consulta estejam presentes e ordena
+    pela soma dos pesos.
+
+    A consulta parte do índice (``termo``): apenas os documentos que contêm os
+    termos são agrupados, e o catálogo é filtrado por esses ids.
+    """
+    def search(self, queryset, query):
+        from .models import SearchTerm
+
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return queryset
+        matches = (
+            SearchTerm.objects.filter(termo__in=terms)
+            .values('documento_id')
+            .annotate(matched=Count('pk'), score=Sum('peso'))
+            .filter(matched=len(terms))
+        )
+        # The score subquery runs only for the matched rows in the result
+        score = (
+            SearchTerm.objects.filter(documento_id=OuterRef('pk'), termo__in=terms)
+            .values('documento_id')
+            .annotate(score=Sum('peso'))
+            .values('score')
+        )
+        return (
+            queryset
+            .filter(pk__in=matches.values('documento_id'))
+            .annotate(search_rank=Subquery(score))
+            .order_by(F('search_rank').desc(nulls_last=True), 'nome')
+        )
+
+class PostgresSearchBackend:
+    """
+    Busca textual nativa do Postgres (dicionário ``portuguese``) sobre o
+    documento normalizado, usando o índice GIN criado na migração.
+    """
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+        query = fold(query).strip()
+        if not query:
+            return queryset
+        # Same expression as the GIN index, so the planner can use it
+        vector = RawSQL(
+            POSTGRES_VECTOR_SQL.format(table='"tourist_spots_searchdocument"'), (), output_field=SearchVectorField()
+        )
+        ts_query = SearchQuery(query, config='portuguese')
+        return (
+            queryset
+            .filter(documento_busca__isnull=False)
+            .annotate(search_vector=vector)
+            .filter(search_vector=ts_query)
+            .annotate(search_rank=SearchRank(F('search_vector'), ts_query))
+            .order_by('-search_rank', 'nome')
+        )
+
+def get_search_backend():
+    """
+    Retorna o backend configurado em ``SEARCH_BACKEND`` (``postgres`` ou
+    ``inverted_index``); por padrão usa o Postgres quando disponível.
+    """
+    name = getattr(settings, 'SEARCH_BACKEND', None)
+    if name is None:
+        name = 'postgres' if connection.vendor == 'postgresql' else 'inverted_index'
+    if name == 'postgres':
+        return PostgresSearchBackend()
+    return InvertedIndexBackend()
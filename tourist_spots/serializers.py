@@ -1,28 +1,46 @@
 from rest_framework import serializers
-from .models import TouristSpot, TouristSpotImage
+from . import images
+from .fieldsets import SparseFieldsSerializerMixin, is_root
+from .models import ItineraryJob, TouristSpot, TouristSpotImage
 
 class TouristSpotImageSerializer(serializers.ModelSerializer):
     """
     Serializer para imagens de pontos turísticos.
     """
+    thumbnail = serializers.SerializerMethodField(help_text='URL da menor versão da imagem (o original enquanto as versões não foram geradas)')
+    srcset = serializers.SerializerMethodField(help_text='srcset por tipo MIME (image/webp, image/avif) com as larguras disponíveis')
+
     class Meta:
         model = TouristSpotImage
-        fields = ('id', 'imagem', 'descricao')
+        fields = ('id', 'imagem', 'descricao', 'thumbnail', 'srcset')
         extra_kwargs = {
             'imagem': {'help_text': 'Arquivo de imagem do ponto turístico'},
             'descricao': {'help_text': 'Descrição opcional da imagem'},
         }
 
-class TouristSpotSerializer(serializers.ModelSerializer):
+    def get_thumbnail(self, obj):
+        url = images.thumbnail_url(obj)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request and url else url
+
+    def get_srcset(self, obj):
+        return images.srcsets(obj)
+
+class TouristSpotSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer para pontos turísticos.
     """
     imagens = TouristSpotImageSerializer(many=True, read_only=True)
+    capa = serializers.SerializerMethodField(help_text='URL da miniatura da imagem de capa (apenas com ?expand=capa ou ?view=compact)')
+    is_favorited = serializers.BooleanField(read_only=True, help_text='Se o ponto está nos favoritos do usuário (apenas para usuários autenticados)')
     
     class Meta:
         model = TouristSpot
-        fields = ('id', 'nome', 'descricao', 'cidade', 'latitude', 'longitude', 'categoria', 'imagens', 'data_criacao')
-        read_only_fields = ('id', 'data_criacao')
+        fields = ('id', 'nome', 'descricao', 'cidade', 'latitude', 'longitude', 'categoria', 'imagens', 'data_criacao', 'capa', 'is_favorited', 'favoritos_count')
+        expandable_fields = ('capa', 'favoritos_count')
+        # ?view=compact: what list and map screens need
+        compact_fields = ('id', 'nome', 'categoria', 'cidade', 'latitude', 'longitude', 'capa', 'is_favorited')
+        read_only_fields = ('id', 'data_criacao', 'favoritos_count')
         extra_kwargs = {
             'nome': {'help_text': 'Nome do ponto turístico'},
             'descricao': {'help_text': 'Descrição detalhada do ponto turístico'},
@@ -31,4 +49,64 @@ class TouristSpotSerializer(serializers.ModelSerializer):
             'longitude': {'help_text': 'Longitude da localização (formato decimal)'},
             'categoria': {'help_text': 'Categoria do ponto turístico (natural, histórico, etc.)'},
             'imagens': {'help_text': 'Imagens relacionadas ao ponto turístico'},
-        }  
\ No newline at end of file
+            'favoritos_count': {'help_text': 'Quantos usuários favoritaram o ponto (apenas com ?expand=favoritos_count)'},
+        }
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Only TouristSpotViewSet annotates the flag, and only for authenticated users
+        if not (self.context.get('with_is_favorited') and is_root(self)):
+            fields.pop('is_favorited', None)
+        return fields
+
+    def get_capa(self, obj):
+        if hasattr(obj, 'capa_imagem'):
+            # Annotated by TouristSpotViewSet when the images aren't prefetched
+            if not obj.capa_imagem:
+                return None
+            image = TouristSpotImage(imagem=obj.capa_imagem, derivados=obj.capa_derivados or {})
+        else:
+            image = min(obj.imagens.all(), key=lambda image: image.pk, default=None)
+            if image is None:
+                return None
+        url = images.thumbnail_url(image)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class TouristSpotSummarySerializer(TouristSpotSerializer):
+    """
+    Resumo de um ponto turístico (campos de ``?view=compact``), para uso
+    aninhado. Os pontos devem vir anotados com ``images.annotate_cover``.
+    """
+    class Meta(TouristSpotSerializer.Meta):
+        fields = TouristSpotSerializer.Meta.compact_fields
+        expandable_fields = ()
+        read_only_fields = fields
+
+class TouristSpotNearbySerializer(TouristSpotSerializer):
+    """
+    Serializer para pontos turísticos retornados por busca de proximidade.
+    """
+    distancia_km = serializers.FloatField(read_only=True, help_text='Distância em quilômetros até o ponto de referência')
+
+    class Meta(TouristSpotSerializer.Meta):
+        fields = TouristSpotSerializer.Meta.fields + ('distancia_km',)
+        compact_fields = TouristSpotSerializer.Meta.compact_fields + ('distancia_km',)
+
+class TouristSpotPopularSerializer(TouristSpotSerializer):
+    """
+    Serializer para o ranking de pontos mais favoritados, com o número de
+    favoritos sempre presente.
+    """
+    class Meta(TouristSpotSerializer.Meta):
+        expandable_fields = ('capa',)
+        compact_fields = TouristSpotSerializer.Meta.compact_fields + ('favoritos_count',)
+
+class ItineraryJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer para pedidos de geração de roteiro em segundo plano.
+    """
+    class Meta:
+        model = ItineraryJob
+        fields = ('id', 'status', 'parametros', 'plano', 'roteiro', 'erro', 'data_criacao', 'iniciado_em', 'concluido_em')
+        read_only_fields = fields
@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from . import images
+from .cache import bump_catalog_version
+from .models import TouristSpot, TouristSpotImage
+from .search import index_spot
+
+@receiver(post_save, sender=TouristSpot)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """
+    Reindexa o ponto turístico salvo. A remoção é propagada ao índice pelo
+    ``on_delete=CASCADE`` de ``SearchDocument``.
+    """
+    if raw:
+        return
+    index_spot(instance)
+
+@receiver(post_init, sender=TouristSpotImage)
+def remember_image_name(sender, instance, **kwargs):
+    # Read the raw value so a deferred field isn't loaded here
+    instance._saved_imagem_name = getattr(instance.__dict__.get('imagem'), 'name', instance.__dict__.get('imagem'))
+
+@receiver(post_save, sender=TouristSpotImage)
+def generate_image_derivatives(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Imagens novas, ou com o arquivo trocado, ganham derivados (miniaturas
+    WebP/AVIF) em segundo plano. O salvamento feito pelo próprio
+    processamento (que grava ``derivados``) não o agenda de novo.
+    """
+    if raw or 'imagem' not in instance.__dict__:
+        # A deferred, untouched file can't have changed
+        return
+    name = instance.imagem.name
+    changed = created or name != instance._saved_imagem_name
+    instance._saved_imagem_name = name
+    if changed and not (update_fields and 'derivados' in update_fields):
+        images.schedule(instance.pk)
+
+@receiver(post_delete, sender=TouristSpotImage)
+def delete_image_derivatives(sender, instance, **kwargs):
+    transaction.on_commit(lambda: images.delete_derivatives(instance))
+
+@receiver(post_save, sender=TouristSpot)
+@receiver(post_delete, sender=TouristSpot)
+@receiver(post_save, sender=TouristSpotImage)
+@receiver(post_delete, sender=TouristSpotImage)
+def invalidate_catalog_cache(sender, **kwargs):
+    """
+    Qualquer alteração no catálogo invalida as respostas em cache. A versão
+    muda de novo após o commit: respostas montadas por outras requisições
+    antes dele (com os dados antigos) ficam sob a versão intermediária.
+    """
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
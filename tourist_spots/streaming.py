@@ -0,0 +1,69 @@
+import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+def format_sse(event, payload):
+    data = json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f"event: {event}\ndata: {data}\n\n"
+
+def format_ndjson(event, payload):
+    return json.dumps({'tipo': event, **payload}, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Server-Sent Events. Respostas que não são streams (erros de validação,
+    por exemplo) viram um único evento ``erro``.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_sse('erro', data or {}).encode(self.charset)
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Um objeto JSON por linha (``application/x-ndjson``).
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_ndjson('erro', data or {}).encode(self.charset)
+
+async def _aiterate(iterator):
+    # Pull each chunk in a worker thread so the event loop is never blocked
+    sentinel = object()
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    while True:
+        chunk = await next_chunk(iterator, sentinel)
+        if chunk is sentinel:
+            break
+        yield chunk
+
+def event_stream_response(request, events):
+    """
+    Transmite ``events`` (pares ``(evento, payload)``) como SSE ou NDJSON,
+    conforme o renderer negociado pela view.
+
+    Sob ASGI o Django consumiria um iterador síncrono inteiro antes de enviar
+    o primeiro byte; por isso ele é convertido em um iterador assíncrono.
+    """
+    if request.accepted_renderer.format == 'sse':
+        formatter, content_type = format_sse, 'text/event-stream; charset=utf-8'
+    else:
+        formatter, content_type = format_ndjson, 'application/x-ndjson; charset=utf-8'
+
+    chunks = (formatter(event, payload) for event, payload in events)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = _aiterate(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Cache-Control'] = 'no-cache'
+    # Disable proxy buffering (nginx) so events reach the client as they are produced
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,3 +1,969 @@
-from django.test import TestCase
+import asyncio
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.request import Request
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from roteiro_ibiapaba import routers
+from roteiro_ibiapaba.pagination import KeysetPagination
+from roteiro_ibiapaba.query_budget import QueryBudgetMixin, QueryBudgetExceeded
+from . import geo, images, itinerary, llm
+from .cache import get_cache_stats, get_catalog_cache, get_catalog_version
+from .models import ItineraryJob, TouristSpot, TouristSpotImage
+from .planner import cluster, plan_itinerary
+from .prompts import PromptBuilder, summarize
 
-# Create your tests here.
+
+def fake_generator(prompt):
+    visits = [line[2:].split(':')[0] for line in prompt.splitlines() if line.startswith('- ')]
+    return 'Roteiro: ' + ', '.join(visits)
+
+
+def fake_stream_generator(prompt):
+    yield 'Dia 1: '
+    yield 'manhã na cachoeira.'
+
+
+def failing_generator(prompt):
+    raise RuntimeError('upstream indisponível')
+
+
+class CountingGenerator:
+    """
+    Cliente falso do modelo que conta as chamadas (e pode demorar).
+    """
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt=None):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return 'Dia 1: roteiro gerado.'
+
+
+counting_generator = CountingGenerator()
+
+
+def create_spots(count, images_per_spot=2):
+    spots = []
+    for i in range(count):
+        spot = TouristSpot.objects.create(
+            nome=f'Ponto {i}',
+            descricao='Descrição',
+            cidade='Ubajara',
+            latitude=-3.85 + i * 0.001,
+            longitude=-40.92,
+            categoria='natural',
+        )
+        for j in range(images_per_spot):
+            TouristSpotImage.objects.create(ponto_turistico=spot, imagem=f'tourist_spots/{i}_{j}.jpg')
+        spots.append(spot)
+    return spots
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class TouristSpotQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spots = create_spots(12)
+
+    def test_list_within_budget(self):
+        response = self.client.get('/api/tourist-spots/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results'][0]['imagens']), 2)
+
+    def test_retrieve_within_budget(self):
+        response = self.client.get(f'/api/tourist-spots/{self.spots[0].id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_nearby_within_budget(self):
+        response = self.client.get('/api/tourist-spots/nearby/', {'lat': -3.85, 'lng': -40.92, 'radius_km': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 12)
+
+
+class QueryBudgetMixinTests(TestCase):
+    class OverBudgetView(QueryBudgetMixin, APIView):
+        query_budget = {'get': 1}
+
+        def get(self, request):
+            return Response({'count': len(list(TouristSpot.objects.all())) + TouristSpot.objects.count()})
+
+    def call_view(self):
+        request = APIRequestFactory().get('/over-budget/')
+        return self.OverBudgetView.as_view()(request)
+
+    def test_exceeding_budget_logs_warning(self):
+        with self.assertLogs('roteiro_ibiapaba.query_budget', level='WARNING'):
+            response = self.call_view()
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_exceeding_budget_fails_in_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.call_view()
+
+
+def create_spot_at(nome, latitude, longitude):
+    return TouristSpot.objects.create(
+        nome=nome, descricao='Descrição', cidade='Ubajara', latitude=latitude, longitude=longitude, categoria='natural'
+    )
+
+
+class GeohashTests(TestCase):
+    def test_encode_known_coordinates(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 9), 'u4pruydqq')
+        self.assertEqual(geo.encode(42.6, -5.6, 5), 'ezs42')
+        self.assertEqual(create_spot_at('Ponto', 57.64911, 10.40744).geohash, 'u4pruydqq')
+
+    def test_nearby_matches_haversine(self):
+        center = (-3.85, -40.92)
+        offsets = [0.001, 0.01, 0.03, 0.05, 0.2]
+        for i, offset in enumerate(offsets):
+            create_spot_at(f'Ponto {i}', center[0] + offset, center[1] - offset)
+        response = APIClient().get('/api/tourist-spots/nearby/', {'lat': center[0], 'lng': center[1], 'radius_km': 6})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        expected = [
+            round(geo.haversine_km(*center, center[0] + offset, center[1] - offset), 3)
+            for offset in offsets
+            if geo.haversine_km(*center, center[0] + offset, center[1] - offset) <= 6
+        ]
+        self.assertEqual([spot['distancia_km'] for spot in results], expected)
+        self.assertEqual([spot['nome'] for spot in results], ['Ponto 0', 'Ponto 1', 'Ponto 2'])
+
+
+class BoundingBoxFilterTests(TestCase):
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.client = APIClient()
+
+    def names(self, bbox):
+        response = self.client.get('/api/tourist-spots/', {'bbox': bbox})
+        self.assertEqual(response.status_code, 200)
+        return sorted(spot['nome'] for spot in response.data['results'])
+
+    def test_spots_inside_and_outside(self):
+        create_spot_at('Dentro', -3.85, -40.92)
+        create_spot_at('Fora', -3.70, -40.92)
+        self.assertEqual(self.names('-40.95,-3.90,-40.90,-3.80'), ['Dentro'])
+
+    def test_box_crossing_a_cell_boundary(self):
+        # The equator and the prime meridian split the top-level geohash cells
+        for nome, lat, lng in [('NE', 0.001, 0.001), ('NO', 0.001, -0.001), ('SE', -0.001, 0.001), ('SO', -0.001, -0.001), ('Longe', 0.5, 0.5)]:
+            create_spot_at(nome, lat, lng)
+        self.assertEqual(len({spot.geohash[0] for spot in TouristSpot.objects.exclude(nome='Longe')}), 4)
+        self.assertEqual(self.names('-0.01,-0.01,0.01,0.01'), ['NE', 'NO', 'SE', 'SO'])
+
+    def test_invalid_and_inverted_boxes_are_rejected(self):
+        for bbox in ('abc', '1,2,3', '-40.90,-3.80,-40.95,-3.90', '-40.95,-91,-40.90,-3.80'):
+            response = self.client.get('/api/tourist-spots/', {'bbox': bbox})
+            self.assertEqual(response.status_code, 400, bbox)
+            self.assertIn('bbox', response.data)
+
+
+@override_settings(SEARCH_BACKEND='inverted_index')
+class SearchTests(TestCase):
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.client = APIClient()
+        self.cachoeira = TouristSpot.objects.create(
+            nome='Cachoeira do Frade', descricao='Trilha curta até a queda.', cidade='Ubajara',
+            latitude=-3.85, longitude=-40.92, categoria='natural',
+        )
+        self.mirante = TouristSpot.objects.create(
+            nome='Mirante de Tianguá', descricao='Vista das cachoeiras da serra.', cidade='Tianguá',
+            latitude=-3.73, longitude=-40.99, categoria='natural',
+        )
+        self.igreja = TouristSpot.objects.create(
+            nome='Igreja Matriz', descricao='Igreja do século XVIII.', cidade='Viçosa do Ceará',
+            latitude=-3.56, longitude=-41.09, categoria='religious',
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/tourist-spots/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [spot['nome'] for spot in response.data['results']]
+
+    def test_accents_and_case_are_ignored(self):
+        self.assertEqual(self.search('TIANGUA'), ['Mirante de Tianguá'])
+        self.assertEqual(self.search('viçosa'), self.search('VICOSA'))
+        self.assertEqual(self.search('vicosa'), ['Igreja Matriz'])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('cachoeira serra'), ['Mirante de Tianguá'])
+        self.assertEqual(self.search('cachoeira igreja'), [])
+
+    def test_name_matches_rank_first(self):
+        # "cachoeiras" in a description stems to the same term as the name "Cachoeira"
+        self.assertEqual(self.search('cachoeira'), ['Cachoeira do Frade', 'Mirante de Tianguá'])
+
+    def test_edited_spot_is_reindexed(self):
+        self.igreja.descricao = 'Igreja ao lado de uma cachoeira.'
+        self.igreja.save()
+        self.assertIn('Igreja Matriz', self.search('cachoeira'))
+        self.igreja.delete()
+        self.assertNotIn('Igreja Matriz', self.search('igreja'))
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.spots = create_spots(3, images_per_spot=0)
+        self.client = APIClient()
+
+    def test_anonymous_list_and_retrieve_are_cached(self):
+        for url in ('/api/tourist-spots/', f'/api/tourist-spots/{self.spots[0].id}/'):
+            self.assertEqual(self.client.get(url).headers['X-Cache'], 'MISS')
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.headers['X-Cache'], 'HIT')
+        self.assertEqual(get_cache_stats()['hits'], 2)
+
+    def test_save_and_delete_invalidate_the_cache(self):
+        self.client.get('/api/tourist-spots/')
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spots[0].nome = 'Mirante renomeado'
+            self.spots[0].save()
+        self.assertNotEqual(get_catalog_version(), version)
+        response = self.client.get('/api/tourist-spots/')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertIn('Mirante renomeado', [spot['nome'] for spot in response.data['results']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spots[1].delete()
+        response = self.client.get('/api/tourist-spots/')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_version_changes_again_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.spots[0].save()
+        version = get_catalog_version()
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client.force_authenticate(user)
+        for _ in range(2):
+            response = self.client.get('/api/tourist-spots/')
+            self.assertNotIn('X-Cache', response.headers)
+        self.assertEqual(get_cache_stats()['hits'], 0)
+
+
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    # Transactions pin reads to the primary, so these run outside TestCase's atomic block
+    databases = '__all__'
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+
+    @mock.patch.object(routers, 'replica_alias', return_value='replica')
+    def test_reads_go_to_the_replica_only_inside_the_block(self, _):
+        self.assertIsNone(self.router.db_for_read(TouristSpot))
+        with routers.read_from_replica():
+            self.assertEqual(self.router.db_for_read(TouristSpot), 'replica')
+            with transaction.atomic():
+                self.assertIsNone(self.router.db_for_read(TouristSpot))
+            self.assertEqual(self.router.db_for_write(TouristSpot), 'default')
+            self.assertIsNone(self.router.db_for_read(TouristSpot))
+
+    # The primary stands in for the replica alias
+    @mock.patch.object(routers, 'replica_alias', return_value='default')
+    def test_only_catalog_reads_use_the_replica(self, _):
+        get_catalog_cache().clear()
+        user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch.object(routers, 'read_from_replica', wraps=routers.read_from_replica) as read_from_replica:
+            client.get('/api/tourist-spots/')
+            client.get('/api/favorites/')
+        self.assertEqual(read_from_replica.call_count, 1)
+
+    @mock.patch.object(routers, 'replica_alias', return_value='default')
+    def test_reads_stay_on_the_primary_right_after_a_change(self, _):
+        create_spots(1, images_per_spot=0)
+        with mock.patch.object(routers, 'read_from_replica', wraps=routers.read_from_replica) as read_from_replica:
+            APIClient().get('/api/tourist-spots/')
+        self.assertFalse(read_from_replica.called)
+
+    @mock.patch.object(routers, 'replica_alias', return_value='default')
+    def test_user_reads_from_the_primary_right_after_favoriting(self, _):
+        get_catalog_cache().clear()
+        spot = create_spots(1, images_per_spot=0)[0]
+        User = get_user_model()
+        client, other = APIClient(), APIClient()
+        client.force_authenticate(User.objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista'))
+        other.force_authenticate(User.objects.create_user(email='outro@example.com', password='senha-segura-123', nome='Outro'))
+        self.assertEqual(client.post('/api/favorites/', {'ponto_turistico': str(spot.pk)}, format='json').status_code, 201)
+        with mock.patch('tourist_spots.views.changed_within', return_value=False), \
+                mock.patch.object(routers, 'use_primary', wraps=routers.use_primary) as use_primary:
+            response = client.get('/api/tourist-spots/')
+            other.get('/api/tourist-spots/')
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+        self.assertEqual(use_primary.call_count, 1)
+
+    @skipUnless(routers.replica_alias(), 'DATABASE_REPLICA_URL não configurada')
+    @override_settings(DATABASE_REPLICA_MAX_LAG=0)
+    def test_catalog_list_queries_the_replica(self):
+        get_catalog_cache().clear()
+        create_spots(2, images_per_spot=0)
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            response = APIClient().get('/api/tourist-spots/')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertTrue(replica.captured_queries)
+        self.assertFalse(primary.captured_queries)
+
+
+@override_settings(ITINERARY_GENERATOR='tourist_spots.tests.fake_generator', ITINERARY_JOB_WORKERS=0)
+class ItineraryJobTests(TestCase):
+    def setUp(self):
+        itinerary.get_itinerary_cache().clear()
+        create_spots(3, images_per_spot=0)
+        self.user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_job_is_processed_and_polled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/generate-itinerary/', {'dias': 2, 'cidade': 'Ubajara', 'assincrono': True}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], ItineraryJob.STATUS_PENDING)
+
+        response = self.client.get(f"/api/generate-itinerary/{response.data['id']}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], ItineraryJob.STATUS_DONE)
+        self.assertEqual(len(response.data['plano']), 2)
+        self.assertTrue(response.data['roteiro'].startswith('Roteiro: Ponto'))
+
+    @override_settings(ITINERARY_GENERATOR='tourist_spots.tests.failing_generator')
+    def test_failed_job_reports_error(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/generate-itinerary/', {'dias': 1, 'assincrono': True}, format='json')
+        job = ItineraryJob.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, ItineraryJob.STATUS_FAILED)
+        self.assertIn('upstream indisponível', job.erro)
+
+    def test_categories_are_validated_before_enqueueing(self):
+        for categorias, expected in ((['vulcao'], 400), (5, 400), ([{'a': 1}], 400), (['religious'], 404)):
+            response = self.client.post('/api/generate-itinerary/', {'dias': 1, 'categorias': categorias, 'assincrono': True}, format='json')
+            self.assertEqual(response.status_code, expected, categorias)
+        self.assertFalse(ItineraryJob.objects.exists())
+
+    def test_job_of_another_user_is_not_visible(self):
+        other = get_user_model().objects.create_user(email='outro@example.com', password='senha-segura-123', nome='Outro')
+        job = ItineraryJob.objects.create(usuario=other, parametros={'dias': 1})
+        response = self.client.get(f'/api/generate-itinerary/{job.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(ITINERARY_MAX_PENDING_JOBS=1)
+    def test_full_queue_is_rejected(self):
+        ItineraryJob.objects.create(usuario=self.user, parametros={'dias': 1})
+        response = self.client.post('/api/generate-itinerary/', {'dias': 1, 'assincrono': True}, format='json')
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(ITINERARY_GENERATOR='tourist_spots.tests.counting_generator')
+class ItineraryCacheTests(TestCase):
+    def setUp(self):
+        itinerary.get_itinerary_cache().clear()
+        counting_generator.calls = 0
+        create_spots(3, images_per_spot=0)
+        self.user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cancelled_leader_does_not_fail_coalesced_requests(self):
+        single_flight = itinerary.AsyncSingleFlight()
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def generate():
+                await release.wait()
+                return 'Roteiro'
+
+            leader = asyncio.ensure_future(single_flight.do('chave', generate))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(single_flight.do('chave', generate))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            return leader.cancelled(), await follower
+
+        self.assertEqual(async_to_sync(scenario)(), (True, ('Roteiro', True)))
+
+    def test_identical_normalized_request_hits_the_cache(self):
+        first = self.client.post('/api/generate-itinerary/', {'dias': 1, 'cidade': 'Ubajara', 'interesses': 'Trilhas'}, format='json')
+        second = self.client.post('/api/generate-itinerary/', {'dias': '1', 'cidade': ' ubajara ', 'interesses': ' trilhas  '}, format='json')
+        self.assertEqual((first.headers['X-Cache'], second.headers['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(second.data['roteiro'], first.data['roteiro'])
+        self.assertEqual(counting_generator.calls, 1)
+        self.assertEqual(itinerary.get_stats()['upstream_saved'], 1)
+
+    def test_concurrent_identical_requests_call_the_model_once(self):
+        generate = CountingGenerator(latency=0.2)
+        results = []
+
+        def request():
+            results.append(itinerary.get_or_generate('itinerary:teste', generate))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(generate.calls, 1)
+        self.assertEqual(sorted(origem for _, origem in results), ['coalesced'] * 4 + ['miss'])
+        self.assertEqual({roteiro for roteiro, _ in results}, {'Dia 1: roteiro gerado.'})
+
+    @override_settings(ITINERARY_LOCK_POLL_INTERVAL=0.01)
+    def test_waits_for_another_process_holding_the_lock(self):
+        cache = itinerary.get_itinerary_cache()
+        key = 'itinerary:outro-processo'
+        cache.add(key + ':lock', 1, 60)
+
+        def other_process():
+            time.sleep(0.1)
+            cache.set(key, 'Roteiro do outro processo')
+            cache.delete(key + ':lock')
+
+        thread = threading.Thread(target=other_process)
+        thread.start()
+        generate = CountingGenerator()
+        self.assertEqual(itinerary.get_or_generate(key, generate), ('Roteiro do outro processo', 'coalesced'))
+        thread.join()
+        self.assertEqual(generate.calls, 0)
+
+    @override_settings(ITINERARY_LOCK_POLL_INTERVAL=0.01, ITINERARY_LOCK_TIMEOUT=0.05)
+    def test_giving_up_on_the_lock_leaves_it_to_its_owner(self):
+        cache = itinerary.get_itinerary_cache()
+        key = 'itinerary:trava-alheia'
+        cache.add(key + ':lock', 'outro-processo', 60)
+        generate = CountingGenerator()
+        self.assertEqual(itinerary.get_or_generate(key, generate)[1], 'miss')
+        self.assertEqual(generate.calls, 1)
+        self.assertEqual(cache.get(key + ':lock'), 'outro-processo')
+
+        cache.add(key + ':async:lock', 'outro-processo', 60)
+
+        async def agenerate():
+            return generate()
+
+        self.assertEqual(async_to_sync(itinerary.aget_or_generate)(key + ':async', agenerate)[1], 'miss')
+        self.assertEqual(cache.get(key + ':async:lock'), 'outro-processo')
+
+
+class ItineraryPlannerTests(TestCase):
+    def setUp(self):
+        # Two groups of spots roughly 40 km apart
+        self.north = [
+            TouristSpot(nome=f'Norte {i}', descricao='Mirante', cidade='Viçosa do Ceará', categoria='natural',
+                        latitude=-3.56 - i * 0.01, longitude=-41.09 + i * 0.01)
+            for i in range(3)
+        ]
+        self.south = [
+            TouristSpot(nome=f'Sul {i}', descricao='Cachoeira', cidade='Ubajara', categoria='natural',
+                        latitude=-3.85 - i * 0.01, longitude=-40.92 + i * 0.01)
+            for i in range(3)
+        ]
+
+    def test_groups_days_by_proximity(self):
+        plan = plan_itinerary(self.north + self.south, 2)
+        days = [{spot.nome.split()[0] for spot, _ in visits} for visits in plan]
+        self.assertCountEqual(days, [{'Norte'}, {'Sul'}])
+
+    def test_route_is_ordered_and_starts_near_lodging(self):
+        plan = plan_itinerary(self.south[::-1] + self.north, 2, start=(-3.84, -40.93))
+        self.assertEqual([spot.nome for spot, _ in plan[0]], ['Sul 0', 'Sul 1', 'Sul 2'])
+
+    def test_extra_days_are_free(self):
+        plan = plan_itinerary(self.south[:1], 3)
+        self.assertEqual([len(visits) for visits in plan], [1, 0, 0])
+
+    def test_duplicate_coordinates_may_leave_a_day_empty(self):
+        points = [(-3.51, -40.82), (-3.51, -40.82), (-3.64, -40.74), (-3.64, -40.74)]
+        groups = cluster(points, 3)
+        self.assertEqual(sorted(i for group in groups for i in group), [0, 1, 2, 3])
+        self.assertTrue(all(len(group) <= 2 for group in groups))
+
+        spots = [
+            TouristSpot(nome=f'Ponto {i}', descricao='Mirante', cidade='Ubajara', categoria='natural', latitude=lat, longitude=lng)
+            for i, (lat, lng) in enumerate(points)
+        ]
+        plan = plan_itinerary(spots, 3)
+        self.assertEqual(sum(len(visits) for visits in plan), 4)
+
+    def test_planning_without_narrative_skips_the_model(self):
+        for spot in self.north + self.south:
+            spot.save()
+        user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        client = APIClient()
+        client.force_authenticate(user)
+        with override_settings(ITINERARY_GENERATOR='tourist_spots.tests.failing_generator'):
+            response = client.post('/api/generate-itinerary/', {'dias': 2, 'narrativa': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['roteiro'])
+        self.assertEqual([len(day['visitas']) for day in response.data['plano']], [3, 3])
+
+    @override_settings(ITINERARY_MAX_DIAS=30)
+    def test_trip_length_is_bounded(self):
+        with self.assertRaisesMessage(ValueError, 'no máximo 30 dias'):
+            itinerary.normalize_request({'dias': 31})
+        user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/generate-itinerary/', {'dias': 5_000_000}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ItineraryPromptTests(TestCase):
+    def setUp(self):
+        self.spots = create_spots(20, images_per_spot=2)
+        TouristSpot.objects.filter(pk=self.spots[0].pk).update(descricao='Cachoeira com trilha. ' * 200)
+
+    def test_prepare_uses_a_single_query(self):
+        params = itinerary.normalize_request({'dias': 3, 'interesses': 'cachoeira'})
+        with self.assertNumQueries(1):
+            plan, prompt, cache_key = itinerary.prepare(params)
+        self.assertEqual(sum(len(visits) for visits in plan), 15)
+        self.assertIn('Imagens disponíveis: 2', prompt)
+
+    def test_descriptions_fit_the_token_budget(self):
+        params = itinerary.normalize_request({'dias': 1})
+        spots, cidade_nome = itinerary.fetch_spots(params)
+        plan = [[(spot, 0.0) for spot in spots]]
+        _, spots_text = PromptBuilder(token_budget=1000).build(params, plan, cidade_nome)
+        self.assertLessEqual(len(spots_text), 1000 * 4 + 200)
+
+    def test_summarize_keeps_whole_sentences(self):
+        self.assertEqual(summarize('Primeira frase. Segunda frase longa.', 20), 'Primeira frase.')
+        self.assertEqual(summarize('palavra ' * 10, 20), 'palavra palavra…')
+
+
+@override_settings(ITINERARY_STREAM_GENERATOR='tourist_spots.tests.fake_stream_generator')
+class ItineraryStreamTests(TestCase):
+    def setUp(self):
+        itinerary.get_itinerary_cache().clear()
+        create_spots(4, images_per_spot=0)
+        self.user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stream(self, accept, **data):
+        response = self.client.post('/api/generate-itinerary/stream/', data, format='json', HTTP_ACCEPT=accept)
+        content = b''.join(response.streaming_content).decode() if response.streaming else response.content.decode()
+        return response, content
+
+    def test_server_sent_events(self):
+        response, content = self.stream('text/event-stream', dias=2)
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        events = [block.split('\n')[0] for block in content.strip().split('\n\n')]
+        self.assertEqual(events, ['event: plano', 'event: trecho', 'event: trecho', 'event: fim'])
+
+    def test_ndjson_and_cached_replay(self):
+        _, content = self.stream('application/x-ndjson', dias=2)
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(''.join(line.get('texto', '') for line in lines), 'Dia 1: manhã na cachoeira.')
+        self.assertEqual(lines[-1], {'tipo': 'fim', 'origem': 'miss'})
+
+        _, content = self.stream('application/x-ndjson', dias=2)
+        self.assertEqual(json.loads(content.splitlines()[-1]), {'tipo': 'fim', 'origem': 'hit'})
+
+    def test_validation_error_is_an_event(self):
+        response, content = self.stream('text/event-stream', dias='x')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(content.startswith('event: erro'))
+
+
+class LLMClientTests(TestCase):
+    def client_for(self, backend, **kwargs):
+        kwargs.setdefault('backoff_base', 0)
+        return llm.LLMClient(backend, **kwargs)
+
+    def test_transient_errors_are_retried(self):
+        backend = llm.FakeBackend('ok', errors=[llm.LLMTransientError('503'), TimeoutError()])
+        client = self.client_for(backend, max_retries=2)
+        self.assertEqual(client.generate('prompt'), 'ok')
+        self.assertEqual(backend.calls, 3)
+        self.assertEqual(client.stats()['retries'], 2)
+
+    def test_permanent_errors_are_not_retried(self):
+        backend = llm.FakeBackend('ok', errors=[ValueError('prompt inválido')])
+        client = self.client_for(backend)
+        with self.assertRaises(ValueError):
+            client.generate('prompt')
+        self.assertEqual(backend.calls, 1)
+
+    def test_circuit_opens_and_recovers(self):
+        backend = llm.FakeBackend('ok', errors=[ValueError()] * 2)
+        client = self.client_for(backend, failure_threshold=2, reset_timeout=60)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                client.generate('prompt')
+        with self.assertRaises(llm.LLMUnavailable):
+            client.generate('prompt')
+        self.assertEqual(backend.calls, 2)
+
+        client.breaker.reset_timeout = 0
+        self.assertEqual(''.join(client.stream('prompt')), 'ok ')
+        self.assertEqual(client.stats()['circuit'], llm.CircuitBreaker.CLOSED)
+
+    def test_concurrency_is_bounded(self):
+        client = self.client_for(llm.FakeBackend('ok'), max_concurrency=1, timeout=0.05)
+        stream = client.stream('prompt')
+        next(stream)
+        with self.assertRaises(llm.LLMUnavailable):
+            client.generate('prompt')
+        stream.close()
+        self.assertEqual(client.generate('prompt'), 'ok')
+        self.assertEqual(client.stats()['rejected'], 1)
+
+    def test_async_generate_retries_and_shares_the_concurrency_limit(self):
+        backend = llm.FakeBackend('ok', errors=[llm.LLMTransientError('503')])
+        client = self.client_for(backend, max_concurrency=1, timeout=0.2)
+        self.assertEqual(async_to_sync(client.agenerate)('prompt'), 'ok')
+        self.assertEqual(backend.calls, 2)
+
+        stream = client.stream('prompt')
+        next(stream)
+        with self.assertRaises(llm.LLMUnavailable):
+            async_to_sync(client.agenerate)('prompt')
+        stream.close()
+        self.assertEqual(client.stats()['rejected'], 1)
+
+    def test_cancelled_thread_call_keeps_its_slot_until_it_returns(self):
+        class BlockingBackend:
+            def __init__(self):
+                self.unblock = threading.Event()
+
+            def generate(self, prompt, timeout):
+                self.unblock.wait(5)
+                return 'ok'
+
+        backend = BlockingBackend()
+        client = self.client_for(backend, max_concurrency=1, timeout=0.1)
+
+        async def cancel_midway():
+            task = asyncio.ensure_future(client.agenerate('prompt'))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        async_to_sync(cancel_midway)()
+        with self.assertRaises(llm.LLMUnavailable):
+            client.generate('prompt')
+        backend.unblock.set()
+        self.assertTrue(client.semaphore.acquire(timeout=1))
+        client.semaphore.release()
+
+    def test_metrics_are_logged_periodically(self):
+        client = self.client_for(llm.FakeBackend('ok'))
+        client.metrics.log_interval = 60
+        with self.assertNoLogs('tourist_spots.llm', level='INFO'):
+            client.generate('prompt')
+        client.metrics._logged_at -= 60
+        with self.assertLogs('tourist_spots.llm', level='INFO') as logs:
+            client.generate('prompt')
+        self.assertIn("'calls': 2", logs.output[0])
+
+    @override_settings(LLM_BACKEND='tourist_spots.llm.FakeBackend')
+    def test_stats_are_served_to_staff_only(self):
+        llm.get_client().generate('prompt')
+        User = get_user_model()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista'))
+        self.assertEqual(client.get('/api/llm/stats/').status_code, 403)
+        client.force_authenticate(User.objects.create_user(email='admin@example.com', password='senha-segura-123', nome='Admin', is_staff=True))
+        response = client.get('/api/llm/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['successes'], response.data['circuit']), (1, llm.CircuitBreaker.CLOSED))
+
+    @override_settings(LLM_BACKEND='tourist_spots.llm.FakeBackend', LLM_FAKE_RESPONSE='Dia 1: trilha.')
+    def test_default_generator_uses_the_shared_client(self):
+        itinerary.get_itinerary_cache().clear()
+        create_spots(2, images_per_spot=0)
+        user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/generate-itinerary/', {'dias': 1}, format='json')
+        self.assertEqual(response.data['roteiro'], 'Dia 1: trilha.')
+        self.assertIs(llm.get_client(), llm.get_client())
+
+
+@override_settings(IMAGE_PROCESSING_WORKERS=0, IMAGE_DERIVATIVE_WIDTHS=(100, 200, 1000))
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.spot = create_spots(1, images_per_spot=0)[0]
+
+    def jpeg(self, name='foto.jpg'):
+        exif = Image.Exif()
+        exif[0x010F] = 'Câmera'
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), 'green').save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def post(self, data):
+        user = get_user_model().objects.get_or_create(email='admin@example.com', defaults={'nome': 'Admin', 'is_staff': True})[0]
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post(f'/api/tourist-spots/{self.spot.pk}/upload_image/', data, format='multipart')
+
+    def upload(self):
+        response = self.post({'imagem': self.jpeg()})
+        self.assertEqual(response.status_code, 201)
+        return TouristSpotImage.objects.get(pk=response.data['id'])
+
+    def test_batch_upload(self):
+        response = self.post({'imagens': [self.jpeg(f'foto{i}.jpg') for i in range(5)]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(self.spot.imagens.exclude(derivados={}).count(), 5)
+
+    def test_batch_upload_is_all_or_nothing(self):
+        invalid = SimpleUploadedFile('texto.jpg', b'not an image', content_type='image/jpeg')
+        response = self.post({'imagens': [self.jpeg(), invalid]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['imagens'][0], {})
+        self.assertIn('imagem', response.data['imagens'][1])
+        self.assertFalse(self.spot.imagens.exists())
+
+    def test_derivatives_are_generated_without_metadata(self):
+        image = self.upload()
+        self.assertEqual(sorted(image.derivados['webp']), ['100', '200'])
+        with image.imagem.open('rb') as f:
+            self.assertFalse(Image.open(f).getexif())
+        with image.imagem.storage.open(image.derivados['webp']['100']) as f:
+            derivative = Image.open(f)
+            self.assertEqual((derivative.format, derivative.size), ('WEBP', (100, 75)))
+            self.assertFalse(derivative.getexif())
+
+    def test_previous_derivatives_are_deleted_only_after_saving(self):
+        image = self.upload()
+        storage = image.imagem.storage
+        previous = images.derivative_paths(image)
+        with mock.patch.object(TouristSpotImage, 'save', side_effect=OSError('banco indisponível')), self.assertRaises(OSError):
+            images.process_image(image)
+        image.refresh_from_db()
+        self.assertEqual(images.derivative_paths(image), previous)
+        self.assertTrue(all(storage.exists(path) for path in previous))
+
+        images.process_image(image)
+        self.assertTrue(previous.isdisjoint(images.derivative_paths(image)))
+        self.assertFalse(any(storage.exists(path) for path in previous))
+        self.assertTrue(all(storage.exists(path) for path in images.derivative_paths(image)))
+
+    def test_replacing_the_file_regenerates_derivatives(self):
+        image = self.upload()
+        previous = images.derivative_paths(image)
+        with mock.patch.object(images, 'schedule', wraps=images.schedule) as schedule:
+            image.descricao = 'Mirante'
+            with self.captureOnCommitCallbacks(execute=True):
+                image.save()
+            schedule.assert_not_called()
+
+            image = TouristSpotImage.objects.get(pk=image.pk)
+            image.imagem = self.jpeg('nova.jpg')
+            with self.captureOnCommitCallbacks(execute=True):
+                image.save()
+            schedule.assert_called_once_with(image.pk)
+        image.refresh_from_db()
+        self.assertTrue(previous.isdisjoint(images.derivative_paths(image)))
+        self.assertTrue(all(image.imagem.storage.exists(path) for path in images.derivative_paths(image)))
+
+    def test_serializer_exposes_thumbnail_and_srcset(self):
+        image = self.upload()
+        data = self.client.get(f'/api/tourist-spots/{self.spot.pk}/').data['imagens'][0]
+        self.assertTrue(data['thumbnail'].endswith(image.derivados['webp']['100']))
+        self.assertRegex(data['srcset']['image/webp'], r'/100\.[0-9a-f]{12}\.webp 100w, .*/200\.[0-9a-f]{12}\.webp 200w$')
+
+    def test_backfill_processes_pending_images(self):
+        image = self.upload()
+        TouristSpotImage.objects.filter(pk=image.pk).update(derivados={})
+        self.assertEqual(images.backfill(TouristSpotImage.objects.filter(derivados={}), workers=1), (1, 0))
+        image.refresh_from_db()
+        self.assertIn('webp', image.derivados)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.name = default_storage.save('tourist_spots/foto.jpg', ContentFile(b'0123456789' * 10))
+        self.url = default_storage.url(self.name)
+
+    def test_hashed_media_are_immutable(self):
+        self.assertRegex(self.name, r'^tourist_spots/foto\.[0-9a-f]{12}\.jpg$')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789' * 10)
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-14/100')
+        self.assertEqual(b''.join(response.streaming_content), b'01234')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=200-').status_code, 416)
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel')
+    def test_offloaded_to_nginx(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.name)
+        self.assertEqual(response.content, b'')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.spots = create_spots(8, images_per_spot=0)
+
+    def walk(self, url):
+        names, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            names.extend(item['nome'] for item in response.data['results'])
+            pages.append(response.data)
+            url = response.data['next']
+        return names, pages
+
+    def test_pages_cover_every_spot_once(self):
+        names, pages = self.walk('/api/tourist-spots/?page_size=3')
+        self.assertEqual(names, [f'Ponto {i}' for i in range(7, -1, -1)])
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 2])
+
+        previous = self.client.get(pages[-1]['previous']).data
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_ties_are_broken_by_id(self):
+        # Every spot is in the same city
+        names, _ = self.walk('/api/tourist-spots/?ordering=-cidade&page_size=3')
+        expected = sorted(self.spots, key=lambda spot: spot.pk, reverse=True)
+        self.assertEqual(names, [spot.nome for spot in expected])
+
+    def test_nullable_ordering_fields_keep_nulls_in_place(self):
+        user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        now = timezone.now()
+        for i in range(7):
+            ItineraryJob.objects.create(usuario=user, parametros={'dias': 1}, iniciado_em=now - timedelta(minutes=i) if i % 2 else None)
+        factory = APIRequestFactory()
+
+        def walk(queryset):
+            paginator = KeysetPagination()
+            ids, url, pages = [], '/?page_size=2', []
+            while url:
+                pages.append(paginator.paginate_queryset(queryset, Request(factory.get(url))))
+                ids.extend(job.pk for job in pages[-1])
+                url = paginator.get_next_link()
+            # Walking back from the last page gives the same pages
+            url = paginator.get_previous_link()
+            for page in reversed(pages[:-1]):
+                self.assertEqual(paginator.paginate_queryset(queryset, Request(factory.get(url))), page)
+                url = paginator.get_previous_link()
+            return ids
+
+        started = list(ItineraryJob.objects.exclude(iniciado_em=None).order_by('iniciado_em', 'pk').values_list('pk', flat=True))
+        pending = list(ItineraryJob.objects.filter(iniciado_em=None).order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(walk(ItineraryJob.objects.order_by('iniciado_em')), started + pending)
+        self.assertEqual(walk(ItineraryJob.objects.order_by(F('iniciado_em').asc(nulls_first=True))), pending + started)
+        self.assertEqual(walk(ItineraryJob.objects.order_by('-iniciado_em')), started[::-1] + pending[::-1])
+
+    def test_page_size_is_capped_and_cursor_validated(self):
+        create_spots(120, images_per_spot=0)
+        self.assertEqual(len(self.client.get('/api/tourist-spots/?page_size=1000').data['results']), 100)
+        self.assertEqual(self.client.get('/api/tourist-spots/?cursor=invalido').status_code, 404)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.spots = create_spots(3, images_per_spot=2)
+
+    def test_compact_list_uses_a_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tourist-spots/?view=compact')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('descricao', queries[0]['sql'])
+        item = response.data['results'][0]
+        self.assertEqual(set(item), {'id', 'nome', 'categoria', 'cidade', 'latitude', 'longitude', 'capa'})
+        self.assertTrue(item['capa'].startswith('http://testserver/media/tourist_spots/'))
+
+    def test_fields_omit_and_expand(self):
+        item = self.client.get('/api/tourist-spots/?fields=id,nome,imagens').data['results'][0]
+        self.assertEqual(set(item), {'id', 'nome', 'imagens'})
+
+        item = self.client.get('/api/tourist-spots/?omit=descricao,imagens&expand=capa').data['results'][0]
+        self.assertNotIn('descricao', item)
+        self.assertIn('capa', item)
+
+        item = self.client.get(f'/api/tourist-spots/{self.spots[0].pk}/?expand=capa').data
+        self.assertEqual(len(item['imagens']), 2)
+        self.assertIsNotNone(item['capa'])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/tourist-spots/?fields=nome,senha')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('senha', str(response.data))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class IsFavoritedTests(TestCase):
+    def setUp(self):
+        from favorites.models import Favorite
+
+        self.spots = create_spots(3)
+        self.user = get_user_model().objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        Favorite.objects.create(usuario=self.user, ponto_turistico=self.spots[1])
+
+    def test_flag_for_authenticated_users(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        results = client.get('/api/tourist-spots/').data['results']
+        self.assertEqual({item['nome']: item['is_favorited'] for item in results}, {'Ponto 0': False, 'Ponto 1': True, 'Ponto 2': False})
+        self.assertTrue(client.get(f'/api/tourist-spots/{self.spots[1].pk}/?view=compact').data['is_favorited'])
+
+    def test_anonymous_responses_omit_the_flag(self):
+        response = self.client.get('/api/tourist-spots/')
+        self.assertNotIn('is_favorited', response.data['results'][0])
+        self.assertEqual(response['X-Cache'], 'MISS')
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TouristSpotViewSet, GenerateItineraryView
+from .views import TouristSpotViewSet, GenerateItineraryView, GenerateItineraryStreamView, ItineraryJobView, LLMStatsView
 
 router = DefaultRouter()
 router.register(r'tourist-spots', TouristSpotViewSet)
@@ -8,4 +8,7 @@ router.register(r'tourist-spots', TouristSpotViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('generate-itinerary/', GenerateItineraryView.as_view(), name='generate-itinerary'),
+    path('generate-itinerary/stream/', GenerateItineraryStreamView.as_view(), name='generate-itinerary-stream'),
+    path('generate-itinerary/<uuid:job_id>/', ItineraryJobView.as_view(), name='itinerary-job'),
+    path('llm/stats/', LLMStatsView.as_view(), name='llm-stats'),
 ]
\ No newline at end of file
@@ -1,18 +1,35 @@
-from rest_framework import viewsets, permissions, filters
+import os
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Exists, OuterRef
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .models import TouristSpot
-from .serializers import TouristSpotSerializer
-from rest_framework import viewsets, status
+from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
-from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import TouristSpot, TouristSpotImage
-from .serializers import TouristSpotSerializer, TouristSpotImageSerializer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 from rest_framework.views import APIView
-import google.generativeai as genai
-from django.conf import settings
+from favorites import recommendations
+from favorites.serializers import RecommendedSpotSerializer
+from roteiro_ibiapaba.asyncviews import AsyncAPIView
+from roteiro_ibiapaba.pagination import KeysetPagination
+from roteiro_ibiapaba.query_budget import QueryBudgetMixin
+from roteiro_ibiapaba.routers import ReplicaReadMixin
+from .models import ItineraryJob, TouristSpot, TouristSpotImage
+from .serializers import TouristSpotSerializer, TouristSpotImageSerializer, TouristSpotNearbySerializer, TouristSpotPopularSerializer, ItineraryJobSerializer
+from .filters import BoundingBoxFilter, RankedSearchFilter
+from . import geo, images, itinerary, jobs, llm
+from .streaming import EventStreamRenderer, NDJSONRenderer, event_stream_response
+from .cache import CatalogCacheMixin, changed_within
+from .fieldsets import SparseFieldsMixin
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
@@ -24,7 +41,7 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             return True
         return request.user and request.user.is_staff
 
-class TouristSpotViewSet(viewsets.ModelViewSet):
+class TouristSpotViewSet(QueryBudgetMixin, ReplicaReadMixin, CatalogCacheMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """
     API endpoint para visualização e edição de pontos turísticos.
     
@@ -46,21 +63,89 @@ class TouristSpotViewSet(viewsets.ModelViewSet):
     destroy:
     Remove um ponto turístico (apenas administradores).
     """
-    queryset = TouristSpot.objects.all()
+    queryset = TouristSpot.objects.prefetch_related('imagens')
     serializer_class = TouristSpotSerializer
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BoundingBoxFilter, RankedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['cidade', 'categoria']
     search_fields = ['nome', 'descricao', 'cidade']
-    ordering_fields = ['nome', 'cidade', 'data_criacao']
+    ordering_fields = ['nome', 'cidade', 'data_criacao', 'favoritos_count']
+    pagination_class = KeysetPagination
+    # similar: 1 with precomputed neighbors, 3 on the cold-start fallback
+    query_budget = {'list': 2, 'retrieve': 2, 'nearby': 2, 'popular': 2, 'similar': 3}
+    nearby_default_radius_km = 10
+    nearby_max_radius_km = 100
+    sparse_fields_actions = ('list', 'retrieve', 'nearby', 'popular')
+    cached_actions = ('list', 'retrieve', 'nearby', 'popular', 'similar')
+    replica_actions = ('list', 'retrieve', 'nearby', 'popular', 'similar')
+    # Needed whatever the client asks for: keyset pagination reads the ordering columns
+    always_loaded_fields = {'id', 'nome', 'cidade', 'data_criacao', 'favoritos_count'}
+    
+    def with_is_favorited(self):
+        # Anonymous responses never carry the flag, so the catalog cache stays shareable
+        return self.action in self.sparse_fields_actions and self.request.user.is_authenticated
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is not None:
+            queryset = self.project_queryset(queryset, fields)
+        if self.with_is_favorited() and (fields is None or 'is_favorited' in fields):
+            queryset = queryset.annotate(
+                is_favorited=Exists(self.request.user.favoritos.filter(ponto_turistico=OuterRef('pk')))
+            )
+        return queryset
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['with_is_favorited'] = self.with_is_favorited()
+        return context
+    
+    def use_replica(self, request, action):
+        # Right after a change the replica may still lag; a cache miss read there
+        # would pin the old rows under the new catalog version
+        max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 10)
+        return super().use_replica(request, action) and not changed_within(max_lag)
+    
+    def get_cache_timeout(self, request):
+        # Favorite counters change without bumping the catalog version
+        params = request.query_params
+        requested = ','.join(params.get(name, '') for name in ('ordering', 'fields', 'expand'))
+        if self.action == 'popular' or 'favoritos_count' in requested:
+            return getattr(settings, 'POPULAR_CACHE_TIMEOUT', 300)
+        return super().get_cache_timeout(request)
+    
+    def project_queryset(self, queryset, fields):
+        """
+        Carrega apenas as colunas dos campos pedidos, dispensa o prefetch das
+        imagens quando ``imagens`` não foi pedido e anota a capa com subconsultas
+        na própria consulta principal.
+        """
+        columns = {field.name for field in TouristSpot._meta.concrete_fields}
+        load = (fields & columns) | self.always_loaded_fields
+        if self.action == 'nearby':
+            load |= {'latitude', 'longitude'}
+        queryset = queryset.only(*load)
+        if 'imagens' not in fields:
+            queryset = queryset.prefetch_related(None)
+            if 'capa' in fields:
+                queryset = images.annotate_cover(queryset)
+        return queryset
     
     @swagger_auto_schema(
         operation_description="Retorna uma lista paginada de pontos turísticos",
         manual_parameters=[
             openapi.Parameter('cidade', openapi.IN_QUERY, description="Filtrar por cidade", type=openapi.TYPE_STRING),
             openapi.Parameter('categoria', openapi.IN_QUERY, description="Filtrar por categoria", type=openapi.TYPE_STRING),
-            openapi.Parameter('search', openapi.IN_QUERY, description="Buscar por nome, descrição ou cidade", type=openapi.TYPE_STRING),
+            openapi.Parameter('search', openapi.IN_QUERY, description="Buscar por nome, descrição ou cidade (sem distinção de acentos, ordenado por relevância)", type=openapi.TYPE_STRING),
             openapi.Parameter('ordering', openapi.IN_QUERY, description="Ordenar por campo (ex: nome, -data_criacao)", type=openapi.TYPE_STRING),
+            openapi.Parameter('bbox', openapi.IN_QUERY, description="Caixa delimitadora no formato min_lng,min_lat,max_lng,max_lat", type=openapi.TYPE_STRING),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor da página (use os links next/previous da resposta)", type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Itens por página (máximo 100)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('fields', openapi.IN_QUERY, description="Campos a retornar, separados por vírgula (ex: id,nome,latitude,longitude)", type=openapi.TYPE_STRING),
+            openapi.Parameter('omit', openapi.IN_QUERY, description="Campos a omitir (ex: descricao,imagens)", type=openapi.TYPE_STRING),
+            openapi.Parameter('expand', openapi.IN_QUERY, description="Campos opcionais a incluir (ex: capa)", type=openapi.TYPE_STRING),
+            openapi.Parameter('view', openapi.IN_QUERY, description="compact: id, nome, categoria, cidade, coordenadas e capa", type=openapi.TYPE_STRING),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -68,8 +153,11 @@ class TouristSpotViewSet(viewsets.ModelViewSet):
         Retorna uma lista paginada de pontos turísticos.
         
         Permite filtrar por cidade e categoria, buscar por texto e ordenar por diferentes campos.
+        ``?view=compact``, ``?fields=``, ``?omit=`` e ``?expand=`` reduzem a resposta e
+        a própria consulta ao banco.
+        Respostas para usuários anônimos são servidas do cache do catálogo.
         """
-        return super().list(request, *args, **kwargs)
+        return self.cached(request, super().list, *args, **kwargs)
     
     @swagger_auto_schema(
         operation_description="Cria um novo ponto turístico (apenas administradores)"
@@ -89,7 +177,7 @@ class TouristSpotViewSet(viewsets.ModelViewSet):
         """
         Retorna os detalhes de um ponto turístico específico.
         """
-        return super().retrieve(request, *args, **kwargs)
+        return self.cached(request, super().retrieve, *args, **kwargs)
     
     @swagger_auto_schema(
         operation_description="Atualiza um ponto turístico (apenas administradores)"
@@ -128,16 +216,139 @@ class TouristSpotViewSet(viewsets.ModelViewSet):
         """
         Allow anyone to view tourist spots, but require authentication for other actions.
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'nearby', 'popular', 'similar']:
             permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
+    
+    @property
+    def paginator(self):
+        # Nearby results are ordered by distance in Python, so they are paged by number
+        if not hasattr(self, '_paginator'):
+            self._paginator = PageNumberPagination() if self.action == 'nearby' else self.pagination_class()
+        return self._paginator
+    
+    def get_serializer_class(self):
+        if self.action == 'nearby':
+            return TouristSpotNearbySerializer
+        if self.action == 'popular':
+            return TouristSpotPopularSerializer
+        return super().get_serializer_class()
+    
+    @swagger_auto_schema(
+        operation_description="Retorna os pontos turísticos num raio a partir de uma coordenada, ordenados pela distância",
+        manual_parameters=[
+            openapi.Parameter('lat', openapi.IN_QUERY, description="Latitude do ponto de referência", type=openapi.TYPE_NUMBER, required=True),
+            openapi.Parameter('lng', openapi.IN_QUERY, description="Longitude do ponto de referência", type=openapi.TYPE_NUMBER, required=True),
+            openapi.Parameter('radius_km', openapi.IN_QUERY, description="Raio de busca em quilômetros (padrão 10, máximo 100)", type=openapi.TYPE_NUMBER),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Retorna os pontos turísticos próximos a uma coordenada.
+        
+        As células geohash ao redor do ponto selecionam os candidatos pelo índice;
+        a distância exata (haversine) é calculada apenas para esses candidatos.
+        """
+        return self.cached(request, self._nearby)
+    
+    def _nearby(self, request):
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            radius_km = float(request.query_params.get('radius_km', self.nearby_default_radius_km))
+        except (KeyError, ValueError):
+            return Response({'error': 'Informe lat, lng e radius_km numéricos.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({'error': 'Coordenadas inválidas.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < radius_km <= self.nearby_max_radius_km:
+            return Response(
+                {'error': f'O raio deve estar entre 0 e {self.nearby_max_radius_km} km.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        cells = geo.cells_for_radius(lat, lng, radius_km)
+        candidates = self.filter_queryset(self.get_queryset()).filter(geo.cells_query(cells))
+        
+        spots = []
+        for spot in candidates:
+            distancia = geo.haversine_km(lat, lng, spot.latitude, spot.longitude)
+            if distancia <= radius_km:
+                spot.distancia_km = round(distancia, 3)
+                spots.append(spot)
+        spots.sort(key=lambda spot: spot.distancia_km)
+        
+        page = self.paginate_queryset(spots)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(spots, many=True)
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Retorna os pontos turísticos mais favoritados, do mais para o menos popular",
+        manual_parameters=[
+            openapi.Parameter('cidade', openapi.IN_QUERY, description="Filtrar por cidade", type=openapi.TYPE_STRING),
+            openapi.Parameter('categoria', openapi.IN_QUERY, description="Filtrar por categoria", type=openapi.TYPE_STRING),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor da página (use os links next/previous da resposta)", type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Itens por página (máximo 100)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('view', openapi.IN_QUERY, description="compact: campos resumidos e o número de favoritos", type=openapi.TYPE_STRING),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def popular(self, request):
+        """
+        Ranking de popularidade pelo contador ``favoritos_count`` mantido a cada
+        favorito criado ou removido: cada página é uma busca no índice
+        ``(favoritos_count, id)``, sem agregar a tabela de favoritos.
+        Respostas anônimas ficam em cache por ``POPULAR_CACHE_TIMEOUT`` segundos.
+        """
+        return self.cached(request, self._popular)
+    
+    def _popular(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-favoritos_count')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Retorna pontos turísticos semelhantes, favoritados pelos mesmos usuários",
+        manual_parameters=[
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Número de pontos (padrão 10, máximo RECOMMENDATION_TOP_K)", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: RecommendedSpotSerializer(many=True), 404: "Ponto turístico não encontrado"}
+    )
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        "Quem favoritou este ponto também favoritou": vizinhos pré-calculados
+        por ``manage.py build_recommendations``, lidos em uma única consulta.
+        Pontos ainda sem vizinhos recebem pontos próximos e da mesma categoria.
+        """
+        return self.cached(request, self._similar, pk=pk)
+    
+    def _similar(self, request, pk=None):
+        limit = recommendations.requested_limit(request)
+        try:
+            spot_id = TouristSpot._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise Http404
+        spots = recommendations.similar_spots(spot_id, limit)
+        if not spots:
+            spot = get_object_or_404(TouristSpot.objects.only('id', 'latitude', 'longitude', 'categoria'), pk=spot_id)
+            spots = recommendations.fallback_for_spot(spot, limit)
+        return Response(RecommendedSpotSerializer(spots, many=True, context=self.get_serializer_context()).data)
 
     @action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def upload_image(self, request, pk=None):
         """
-        Upload an image for a tourist spot
+        Upload an image for a tourist spot.
+        
+        Several files can be sent at once in ``imagens``: they are validated and
+        stored in parallel and saved all-or-nothing.
         """
         tourist_spot = self.get_object()
         
@@ -156,22 +367,27 @@ class TouristSpotViewSet(viewsets.ModelViewSet):
         
         # Handle multiple image upload
         elif 'imagens' in request.data:
-            images = request.FILES.getlist('imagens')
-            data = []
-            
-            for image in images:
-                image_serializer = TouristSpotImageSerializer(data={
-                    'ponto_turistico': tourist_spot.id,
-                    'imagem': image,
-                    'descricao': request.data.get('descricao', '')
-                })
-                
-                if image_serializer.is_valid():
-                    image_serializer.save(ponto_turistico=tourist_spot)
-                    data.append(image_serializer.data)
-                else:
-                    return Response(image_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
+            files = request.FILES.getlist('imagens')
+            max_files = getattr(settings, 'IMAGE_UPLOAD_MAX_FILES', 30)
+            if len(files) > max_files:
+                return Response({'error': f'Envie no máximo {max_files} imagens por vez.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            descricao = request.data.get('descricao', '')
+            image_serializers = [
+                TouristSpotImageSerializer(data={'imagem': image, 'descricao': descricao})
+                for image in files
+            ]
+            # Decoding and verifying each file is CPU/IO bound and independent
+            with ThreadPoolExecutor(max_workers=images.upload_workers(len(files))) as pool:
+                valid = list(pool.map(lambda serializer: serializer.is_valid(), image_serializers))
+            if not all(valid):
+                return Response(
+                    {'imagens': [serializer.errors for serializer in image_serializers]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            created = images.save_batch(tourist_spot, [serializer.validated_data for serializer in image_serializers])
+            data = TouristSpotImageSerializer(created, many=True, context=self.get_serializer_context()).data
             return Response(data, status=status.HTTP_201_CREATED)
         
         return Response({'error': 'No image provided'}, status=status.HTTP_400_BAD_REQUEST)
@@ -195,11 +411,11 @@ class TouristSpotViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Image not found'}, status=status.HTTP_404_NOT_FOUND)
 
 # Add this new class at the end of the file
-class GenerateItineraryView(APIView):
+class GenerateItineraryView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     @swagger_auto_schema(
-        operation_description="Gera um roteiro personalizado usando a API Gemini",
+        operation_description="Gera um roteiro personalizado: plano local por proximidade e narrativa opcional via API Gemini",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=['dias'],
@@ -209,90 +425,166 @@ class GenerateItineraryView(APIView):
                 'interesses': openapi.Schema(type=openapi.TYPE_STRING, description='Interesses do usuário (opcional)'),
                 'com_criancas': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Viagem com crianças (opcional)'),
                 'hospedagem': openapi.Schema(type=openapi.TYPE_STRING, description='Local de hospedagem (opcional)'),
+                'hospedagem_lat': openapi.Schema(type=openapi.TYPE_NUMBER, description='Latitude da hospedagem; as visitas de cada dia partem dela (opcional)'),
+                'hospedagem_lng': openapi.Schema(type=openapi.TYPE_NUMBER, description='Longitude da hospedagem (opcional)'),
+                'categorias': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING), description='Categorias de pontos a incluir (opcional)'),
+                'narrativa': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Pede ao Gemini o texto do roteiro sobre o plano (padrão: true)'),
+                'assincrono': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Gera em segundo plano e responde 202 com o id do pedido (opcional)'),
             }
         ),
         responses={
+            202: "Pedido de roteiro criado; consulte a URL retornada",
             200: openapi.Response(
                 description="Roteiro gerado com sucesso",
                 schema=openapi.Schema(
                     type=openapi.TYPE_OBJECT,
                     properties={
-                        'roteiro': openapi.Schema(type=openapi.TYPE_STRING)
+                        'plano': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT), description='Visitas por dia, ordenadas pela rota'),
+                        'roteiro': openapi.Schema(type=openapi.TYPE_STRING, description='Narrativa gerada pelo Gemini (nulo sem narrativa)')
                     }
                 )
             ),
             400: "Parâmetros inválidos",
-            404: "Nenhum ponto turístico encontrado"
+            404: "Nenhum ponto turístico encontrado",
+            503: "Fila de roteiros cheia ou serviço do modelo indisponível"
         }
     )
-    def post(self, request):
+    async def post(self, request):
         """
         Gera um roteiro personalizado usando a API Gemini.
         
-        Recebe informações como cidade, número de dias e interesses do usuário,
-        e retorna um roteiro detalhado com base nos pontos turísticos cadastrados.
-        """
-        cidade = request.data.get('cidade')
-        dias = request.data.get('dias')
-        interesses = request.data.get('interesses', '')
-        com_criancas = request.data.get('com_criancas', False)
-        hospedagem = request.data.get('hospedagem', '')
+        Recebe informações como cidade, número de dias e interesses do usuário.
+        O plano dia a dia é calculado localmente a partir das coordenadas dos pontos
+        (agrupamento por proximidade e rota de cada dia); o Gemini apenas escreve a
+        narrativa sobre esse plano, o que pode ser dispensado com ``narrativa: false``.
+        Roteiros para os mesmos parâmetros e pontos são reaproveitados do cache.
+        Com ``assincrono`` o roteiro é gerado em segundo plano e o cliente consulta
+        ``/api/generate-itinerary/<id>/`` até o pedido ser concluído.
+        A view é assíncrona: sob ASGI a espera pelo modelo não ocupa um worker.
+        """
+        try:
+            params = itinerary.normalize_request(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not dias:
-            return Response({'error': 'Informe o número de dias da viagem.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.data.get('assincrono') in (True, 'true', 'True', '1'):
+            return await sync_to_async(self.enqueue)(request, params)
 
-        # If 'cidade' is 'serra', 'todas', or empty, fetch all spots
-        if not cidade or cidade.strip().lower() in ['serra', 'todas', 'tudo', 'all']:
-            spots = TouristSpot.objects.all()
-            cidade_nome = "Serra da Ibiapaba"
-        else:
-            spots = TouristSpot.objects.filter(cidade__iexact=cidade)
-            cidade_nome = cidade
+        try:
+            plano, roteiro, origem = await itinerary.agenerate(params)
+            return Response({'plano': plano, 'roteiro': roteiro}, headers={'X-Cache': origem.upper()})
+        except itinerary.NoSpotsFound as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except llm.LLMUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '10'})
+        except Exception as e:
+            return Response({'error': f'Erro ao gerar roteiro: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        if not spots.exists():
+    def enqueue(self, request, params):
+        """
+        Cria um pedido de roteiro em segundo plano e responde 202 com seu id.
+        
+        Os parâmetros já passaram por ``normalize_request``; aqui se verifica,
+        como em ``prepare``, que há pontos na região e nas categorias pedidas,
+        para que o pedido não falhe depois no worker.
+        """
+        if not itinerary.get_candidates(params)[0].exists():
             return Response({'error': 'Nenhum ponto turístico encontrado para esta região.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            job = jobs.enqueue(request.user, params)
+        except jobs.JobQueueFull as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '10'})
+        url = request.build_absolute_uri(reverse('itinerary-job', kwargs={'job_id': job.id}))
+        return Response(
+            {'id': job.id, 'status': job.status, 'url': url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': url}
+        )
 
-        # Prepare spot data for the prompt
-        spots_data = []
-        for spot in spots:
-            # Get image URLs if available
-            imagens = spot.imagens.all()
-            imagem_info = f", Imagens disponíveis: {imagens.count()}" if imagens.exists() else ""
-            
-            spots_data.append(
-                f"{spot.nome}: {spot.descricao} (Categoria: {spot.get_categoria_display()}, "
-                f"Cidade: {spot.cidade}, Coordenadas: {spot.latitude},{spot.longitude}{imagem_info})"
-            )
+class GenerateItineraryStreamView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, NDJSONRenderer, JSONRenderer]
+    
+    @swagger_auto_schema(
+        operation_description="Gera um roteiro transmitindo o plano e a narrativa à medida que são produzidos (SSE ou NDJSON)",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['dias'],
+            properties={
+                'cidade': openapi.Schema(type=openapi.TYPE_STRING, description='Cidade a visitar (ou "serra" para todas)'),
+                'dias': openapi.Schema(type=openapi.TYPE_INTEGER, description='Número de dias da viagem'),
+                'interesses': openapi.Schema(type=openapi.TYPE_STRING, description='Interesses do usuário (opcional)'),
+                'com_criancas': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Viagem com crianças (opcional)'),
+                'hospedagem': openapi.Schema(type=openapi.TYPE_STRING, description='Local de hospedagem (opcional)'),
+                'hospedagem_lat': openapi.Schema(type=openapi.TYPE_NUMBER, description='Latitude da hospedagem (opcional)'),
+                'hospedagem_lng': openapi.Schema(type=openapi.TYPE_NUMBER, description='Longitude da hospedagem (opcional)'),
+                'categorias': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING), description='Categorias de pontos a incluir (opcional)'),
+                'narrativa': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Transmite a narrativa do Gemini (padrão: true)'),
+            }
+        ),
+        responses={
+            200: "Stream de eventos: plano, trecho (várias vezes), fim ou erro",
+            400: "Parâmetros inválidos",
+            404: "Nenhum ponto turístico encontrado"
+        }
+    )
+    def post(self, request):
+        """
+        Gera um roteiro em streaming.
         
-        spots_text = "\n".join(spots_data)
+        O plano calculado localmente é enviado imediatamente no evento ``plano``;
+        a narrativa chega em eventos ``trecho`` conforme o Gemini a produz, e o
+        stream termina com ``fim`` (ou ``erro``). Responde com Server-Sent Events
+        (``Accept: text/event-stream``, padrão) ou JSON por linha
+        (``Accept: application/x-ndjson`` ou ``?format=ndjson``).
+        """
+        try:
+            params = itinerary.normalize_request(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            prepared = itinerary.prepare(params)
+        except itinerary.NoSpotsFound as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        return event_stream_response(request, itinerary.stream_events(params, prepared))
 
-        # Build a comprehensive prompt for Gemini
-        criancas_texto = "Sim, estou viajando com crianças. " if com_criancas else ""
-        hospedagem_texto = f"Estarei hospedado em {hospedagem}. " if hospedagem else ""
+class ItineraryJobView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Consulta o andamento de um roteiro gerado em segundo plano",
+        responses={
+            200: ItineraryJobSerializer,
+            404: "Pedido não encontrado"
+        }
+    )
+    def get(self, request, job_id):
+        """
+        Retorna o status de um pedido de roteiro e, quando concluído, o roteiro gerado.
         
-        prompt = (
-            f"Sou um turista e vou passar {dias} dias na região {cidade_nome}. "
-            f"{criancas_texto}{hospedagem_texto}"
-            f"Meus interesses são: {interesses if interesses else 'diversos'}. "
-            f"Esses são os pontos turísticos cadastrados na região:\n\n{spots_text}\n\n"
-            "Por favor, monte um roteiro diário detalhado e otimizado, sugerindo quais pontos visitar em cada dia, "
-            "considerando a proximidade geográfica, variedade de experiências e aproveitamento do tempo. "
-            "Inclua sugestões de horários para cada atração e dicas práticas. "
-            "Organize o roteiro por dia (Dia 1, Dia 2, etc.) e seja objetivo. "
-            "Responda em português do Brasil."
-        )
-
+        Apenas o usuário que criou o pedido pode consultá-lo.
+        """
         try:
-            # Call Gemini API
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(prompt)
-            
-            if hasattr(response, 'text'):
-                roteiro = response.text
-            else:
-                roteiro = response.candidates[0].content.parts[0].text
-                
-            return Response({'roteiro': roteiro})
-        except Exception as e:
-            return Response({'error': f'Erro ao gerar roteiro: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            job = ItineraryJob.objects.get(id=job_id, usuario=request.user)
+        except ItineraryJob.DoesNotExist:
+            return Response({'error': 'Pedido não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ItineraryJobSerializer(job).data)
+
+class LLMStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    @swagger_auto_schema(
+        operation_description="Métricas do cliente do modelo de linguagem no processo que atende a requisição (Admin)",
+        responses={
+            200: openapi.Schema(type=openapi.TYPE_OBJECT)
+        }
+    )
+    def get(self, request):
+        """
+        Retorna os contadores, erros por tipo, latências e o estado do circuito
+        do cliente do modelo.
+        
+        As métricas são do processo que atendeu a requisição (``pid``); com
+        vários workers, cada um tem as suas.
+        """
+        return Response(dict(llm.get_client().stats(), pid=os.getpid()))
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import OutboundEmail, User
 
 class UserAdmin(BaseUserAdmin):
     list_display = ('email', 'nome', 'is_staff', 'is_active')
@@ -23,3 +23,10 @@ class UserAdmin(BaseUserAdmin):
     readonly_fields = ('data_criacao',)
 
 admin.site.register(User, UserAdmin)
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('assunto', 'tipo', 'status', 'tentativas', 'data_criacao', 'enviado_em')
+    list_filter = ('status', 'tipo')
+    readonly_fields = ('data_criacao', 'enviado_em', 'iniciado_em')
+
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+User = get_user_model()
+
+def password_reset(email):
+    """
+    Monta o email de redefinição de senha no envio: busca o usuário ativo do
+    destinatário e gera o link com ``contexto['reset_base_url']``. Retorna
+    ``None`` (email descartado) se não houver conta.
+    """
+    user = User.objects.filter(email=email.destinatarios[0], is_active=True).first()
+    if user is None:
+        return None
+    token = default_token_generator.make_token(user)
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    return (
+        'Redefinição de senha - Roteiro Ibiapaba',
+        f"Clique no link para redefinir sua senha: {email.contexto['reset_base_url']}{uid}/{token}/",
+    )
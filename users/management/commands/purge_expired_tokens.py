@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from users.revocation import invalidate_all
+
+class Command(BaseCommand):
+    help = 'Remove em lotes os tokens expirados (emitidos e revogados) das tabelas da lista negra'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens removidos por transação')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lt=now).order_by('pk')
+        total = 0
+        while True:
+            ids = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            # Short transactions keep locks brief on a live database
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+        if total:
+            invalidate_all()
+        self.stdout.write(self.style.SUCCESS(f'{total} tokens expirados removidos.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from users.outbox import flush, purge, requeue_stale
+
+class Command(BaseCommand):
+    help = (
+        'Envia os emails pendentes da caixa de saída (inclui novas tentativas e envios interrompidos por reinícios) '
+        'e remove os concluídos há mais de EMAIL_OUTBOX_RETENTION_DAYS dias'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Número máximo de emails a enviar')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        sent = flush(limit=options['limit'])
+        purged = purge()
+        self.stdout.write(self.style.SUCCESS(
+            f'{requeued} emails devolvidos à fila, {sent} emails enviados, {purged} emails antigos removidos.'
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-17 11:49
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('remetente', models.CharField(max_length=255)),
+                ('destinatarios', models.JSONField()),
+                ('assunto', models.CharField(max_length=255)),
+                ('corpo', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviado'), ('failed', 'Falhou')], default='pending', max_length=10)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+                ('lote', models.UUIDField(blank=True, editable=False, null=True)),
+                ('data_criacao', models.DateTimeField(default=django.utils.timezone.now)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('enviado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='outboundemail_status_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='contexto',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='outboundemail',
+            name='tipo',
+            field=models.CharField(blank=True, choices=[('password_reset', 'Redefinição de senha')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='assunto',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='corpo',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviado'), ('skipped', 'Descartado'), ('failed', 'Falhou')], default='pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_outboundemail_tipo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['status', 'data_criacao'], name='outboundemail_status_age_idx'),
+        ),
+    ]
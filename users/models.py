@@ -40,3 +40,52 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     def __str__(self):
         return self.email
+
+class OutboundEmail(models.Model):
+    """
+    Email aguardando envio pela caixa de saída (``users.outbox``).
+
+    Emails com ``tipo`` são montados no envio a partir de ``contexto`` (veja
+    ``users.outbox.RENDERERS``) e podem ser descartados nesse momento.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_SKIPPED = 'skipped'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pendente'),
+        (STATUS_SENDING, 'Enviando'),
+        (STATUS_SENT, 'Enviado'),
+        (STATUS_SKIPPED, 'Descartado'),
+        (STATUS_FAILED, 'Falhou'),
+    )
+    TYPE_PASSWORD_RESET = 'password_reset'
+    TYPE_CHOICES = (
+        (TYPE_PASSWORD_RESET, 'Redefinição de senha'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    remetente = models.CharField(max_length=255)
+    destinatarios = models.JSONField()
+    assunto = models.CharField(max_length=255, blank=True)
+    corpo = models.TextField(blank=True)
+    tipo = models.CharField(max_length=20, choices=TYPE_CHOICES, blank=True)
+    contexto = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    erro = models.TextField(blank=True)
+    lote = models.UUIDField(null=True, blank=True, editable=False)
+    data_criacao = models.DateTimeField(default=timezone.now)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa'], name='outboundemail_status_due_idx'),
+            models.Index(fields=['status', 'data_criacao'], name='outboundemail_status_age_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.assunto or self.get_tipo_display()} para {', '.join(self.destinatarios)} ({self.get_status_display()})"
@@ -0,0 +1,207 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_flush_scheduled = threading.Event()
+
+RENDERERS = {
+    OutboundEmail.TYPE_PASSWORD_RESET: 'users.emails.password_reset',
+}
+
+def workers():
+    return getattr(settings, 'EMAIL_OUTBOX_WORKERS', 1)
+
+def get_executor():
+    """
+    Thread do processo que envia a caixa de saída, criada sob demanda.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix='email-outbox')
+        return _executor
+
+def _run_in_worker(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Falha inesperada na tarefa de email %s', getattr(func, '__name__', func))
+    finally:
+        # Worker threads own their connections; don't leak them
+        connections.close_all()
+
+def enqueue(subject, body, recipients, from_email=None):
+    """
+    Grava um email na caixa de saída e agenda o envio após o commit.
+    """
+    email = OutboundEmail.objects.create(
+        remetente=from_email or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(recipients),
+        assunto=subject,
+        corpo=body,
+    )
+    transaction.on_commit(schedule_flush)
+    return email
+
+def enqueue_template(tipo, recipients, contexto, from_email=None):
+    """
+    Grava na caixa de saída um email de ``tipo`` (ver ``RENDERERS``), montado
+    só no envio a partir de ``contexto``. Custa um INSERT, seja qual for o
+    resultado da montagem.
+    """
+    email = OutboundEmail.objects.create(
+        remetente=from_email or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(recipients),
+        tipo=tipo,
+        contexto=contexto,
+    )
+    transaction.on_commit(schedule_flush)
+    return email
+
+def render(email):
+    """
+    Assunto e corpo do email; emails com ``tipo`` são montados pela função de
+    ``RENDERERS``, que pode retornar ``None`` para descartá-los.
+    """
+    if not email.tipo:
+        return email.assunto, email.corpo
+    return import_string(RENDERERS[email.tipo])(email)
+
+def schedule_flush():
+    # Emails enqueued while a flush is already waiting ride along in its batch
+    if workers() == 0:
+        flush()
+    elif not _flush_scheduled.is_set():
+        _flush_scheduled.set()
+        get_executor().submit(_run_in_worker, _scheduled_flush)
+
+def _scheduled_flush():
+    _flush_scheduled.clear()
+    flush()
+
+def claim_batch(limit):
+    """
+    Reivindica até ``limit`` emails pendentes e vencidos com um UPDATE
+    condicional, então um email nunca é enviado por dois processos.
+    """
+    due = OutboundEmail.objects.filter(
+        status=OutboundEmail.STATUS_PENDING, proxima_tentativa__lte=timezone.now()
+    ).order_by('proxima_tentativa')
+    ids = list(due.values_list('pk', flat=True)[:limit])
+    if not ids:
+        return []
+    batch = uuid.uuid4()
+    OutboundEmail.objects.filter(pk__in=ids, status=OutboundEmail.STATUS_PENDING).update(
+        status=OutboundEmail.STATUS_SENDING, lote=batch, iniciado_em=timezone.now()
+    )
+    return list(OutboundEmail.objects.filter(lote=batch))
+
+def _retry_later(email, exc):
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    email.tentativas += 1
+    email.erro = str(exc)
+    if email.tentativas >= max_attempts:
+        email.status = OutboundEmail.STATUS_FAILED
+        logger.error('Email %s descartado após %s tentativas: %s', email.pk, email.tentativas, exc)
+    else:
+        email.status = OutboundEmail.STATUS_PENDING
+        delay = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60) * 2 ** (email.tentativas - 1)
+        email.proxima_tentativa = timezone.now() + timedelta(seconds=delay)
+    email.save(update_fields=['status', 'tentativas', 'erro', 'proxima_tentativa'])
+
+def send_batch(emails):
+    """
+    Envia os emails por uma única conexão com o servidor de email. Falhas
+    voltam à fila com espera crescente até ``EMAIL_OUTBOX_MAX_ATTEMPTS``
+    tentativas; emails que ``render`` descarta ficam como descartados.
+    Retorna o número de emails enviados.
+    """
+    if not emails:
+        return 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            _retry_later(email, e)
+        return 0
+
+    sent, skipped = [], []
+    try:
+        for email in emails:
+            try:
+                content = render(email)
+                if content is None:
+                    skipped.append(email.pk)
+                    continue
+                # Rendered content (e.g. reset tokens) is never written back to the row
+                subject, body = content
+                message = EmailMessage(subject, body, email.remetente, email.destinatarios, connection=connection)
+                message.send()
+            except Exception as e:
+                _retry_later(email, e)
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+        OutboundEmail.objects.filter(pk__in=sent).update(
+            status=OutboundEmail.STATUS_SENT, enviado_em=timezone.now(), erro=''
+        )
+        OutboundEmail.objects.filter(pk__in=skipped).update(status=OutboundEmail.STATUS_SKIPPED)
+    return len(sent)
+
+def flush(limit=None):
+    """
+    Envia os emails pendentes em lotes de ``EMAIL_OUTBOX_BATCH_SIZE`` até
+    esvaziar a fila (ou até ``limit`` emails). Retorna o número de enviados.
+    """
+    batch_size = getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    processed = sent = 0
+    while limit is None or processed < limit:
+        emails = claim_batch(batch_size if limit is None else min(batch_size, limit - processed))
+        if not emails:
+            break
+        processed += len(emails)
+        sent += send_batch(emails)
+    return sent
+
+def requeue_stale():
+    """
+    Devolve à fila emails em envio há mais de ``EMAIL_OUTBOX_SENDING_TIMEOUT``
+    segundos (processo reiniciado no meio do envio).
+    """
+    limit = timezone.now() - timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_SENDING_TIMEOUT', 300))
+    return OutboundEmail.objects.filter(
+        status=OutboundEmail.STATUS_SENDING, iniciado_em__lt=limit
+    ).update(status=OutboundEmail.STATUS_PENDING, iniciado_em=None)
+
+def purge(batch_size=1000):
+    """
+    Remove, em lotes, os emails enviados, descartados ou que falharam há mais
+    de ``EMAIL_OUTBOX_RETENTION_DAYS`` dias. Retorna o número de removidos.
+    """
+    limit = timezone.now() - timedelta(days=getattr(settings, 'EMAIL_OUTBOX_RETENTION_DAYS', 7))
+    finished = OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.STATUS_SENT, OutboundEmail.STATUS_SKIPPED, OutboundEmail.STATUS_FAILED],
+        data_criacao__lt=limit,
+    ).order_by('pk')
+    total = 0
+    while True:
+        ids = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        # Short deletes keep locks brief on a live database
+        total += OutboundEmail.objects.filter(pk__in=ids).delete()[0]
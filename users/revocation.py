@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'revocation:version'
+EPOCH_KEY = 'revocation:epoch'
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre strings: ``in`` nunca dá falso negativo e dá falso
+    positivo com probabilidade próxima de ``error_rate`` até ``capacity``
+    itens.
+    """
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+def get_revocation_cache():
+    return caches[getattr(settings, 'REVOCATION_CACHE_ALIAS', 'default')]
+
+class RevocationFilter:
+    """
+    Filtro em memória dos ``jti`` de refresh tokens revogados, consultado
+    antes da tabela ``BlacklistedToken``: se o ``jti`` não está no filtro, o
+    token certamente não foi revogado e o banco não é consultado.
+
+    O filtro é carregado na primeira consulta e atualizado no logout. Logouts
+    em outros processos são percebidos por um contador no cache
+    (``REVOCATION_CACHE_ALIAS``) e, na falta de um cache compartilhado, pela
+    sincronização incremental a cada ``REVOCATION_SYNC_INTERVAL`` segundos.
+    A limpeza das tabelas (``purge_expired_tokens``) pede a todos os
+    processos que reconstruam o filtro.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._epoch = self._version = self._synced_id = None
+        self._checked_at = 0.0
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+            self._epoch = self._version = self._synced_id = None
+            self._checked_at = 0.0
+
+    def rebuild(self):
+        rows = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .values_list('pk', 'token__jti')
+        )
+        capacity = max(getattr(settings, 'REVOCATION_FILTER_CAPACITY', 100000), 2 * len(rows))
+        bloom = BloomFilter(capacity, getattr(settings, 'REVOCATION_FILTER_ERROR_RATE', 0.01))
+        for _, jti in rows:
+            bloom.add(jti)
+        self._filter = bloom
+        self._synced_id = max((pk for pk, _ in rows), default=None)
+
+    def _catch_up(self):
+        """
+        Acrescenta ao filtro as revogações gravadas desde a última leitura,
+        percorrendo a chave primária (indexada). As últimas
+        ``REVOCATION_SYNC_OVERLAP`` linhas já vistas são lidas de novo: uma
+        transação que reservou um id menor pode ter feito commit depois.
+        """
+        rows = BlacklistedToken.objects.all()
+        if self._synced_id is not None:
+            overlap = getattr(settings, 'REVOCATION_SYNC_OVERLAP', 1000)
+            rows = rows.filter(pk__gt=self._synced_id - overlap)
+        for pk, jti in rows.order_by('pk').values_list('pk', 'token__jti'):
+            self._filter.add(jti)
+            self._synced_id = max(self._synced_id or pk, pk)
+
+    def sync(self):
+        shared = get_revocation_cache().get_many([EPOCH_KEY, VERSION_KEY])
+        epoch, version = shared.get(EPOCH_KEY), shared.get(VERSION_KEY)
+        interval = getattr(settings, 'REVOCATION_SYNC_INTERVAL', 5)
+        if self._filter is None or epoch != self._epoch:
+            self.rebuild()
+        elif version != self._version or time.monotonic() - self._checked_at >= interval:
+            self._catch_up()
+        else:
+            return
+        self._epoch, self._version, self._checked_at = epoch, version, time.monotonic()
+
+    def might_be_revoked(self, jti):
+        with self._lock:
+            self.sync()
+            return jti in self._filter
+
+    def add(self, jti):
+        """
+        Registra uma revogação feita neste processo e avisa os demais após o
+        commit.
+        """
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+        transaction.on_commit(lambda: bump(VERSION_KEY))
+
+    def warm(self):
+        """
+        Carrega o filtro antes da primeira requisição. Falhas de banco apenas
+        adiam a carga para a primeira consulta.
+        """
+        if isinstance(get_revocation_cache(), LocMemCache) and not settings.DEBUG:
+            logger.warning(
+                'REVOCATION_CACHE_ALIAS usa um cache local: logouts feitos em outros processos '
+                'só são vistos após REVOCATION_SYNC_INTERVAL segundos'
+            )
+        try:
+            with self._lock:
+                self.sync()
+        except DatabaseError:
+            logger.warning('Filtro de tokens revogados não carregado; será carregado na primeira consulta', exc_info=True)
+
+def bump(key):
+    cache = get_revocation_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+def invalidate_all():
+    """
+    Faz todos os processos reconstruírem o filtro (após remover tokens).
+    """
+    bump(EPOCH_KEY)
+
+revoked_tokens = RevocationFilter()
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import evict_user
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def evict_cached_user(sender, instance, **kwargs):
+    """
+    Remove o usuário do cache de autenticação. A remoção é repetida após o
+    commit, para descartar uma cópia antiga guardada por outra requisição
+    enquanto a transação estava aberta.
+    """
+    evict_user(instance.pk)
+    transaction.on_commit(lambda: evict_user(instance.pk))
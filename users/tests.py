@@ -1,3 +1,202 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from . import outbox
+from .models import OutboundEmail
+from .revocation import BloomFilter, RevocationFilter, revoked_tokens
+from .tokens import RefreshToken
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class UserProfileQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_get_within_budget(self):
+        response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_put_within_budget(self):
+        response = self.client.put('/api/profile/', {'nome': 'Novo Nome'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_user_is_resolved_from_cache(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.data['nome'], 'Turista')
+
+    def test_profile_update_evicts_cached_user(self):
+        self.client.get('/api/profile/')
+        self.client.put('/api/profile/', {'nome': 'Novo Nome'}, format='json')
+        self.assertEqual(self.client.get('/api/profile/').data['nome'], 'Novo Nome')
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+
+@override_settings(REVOCATION_SYNC_INTERVAL=3600)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        revoked_tokens.reset()
+        self.user = User.objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def test_logout_revokes_refresh_token(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.post('/api/auth/refresh/', {'refresh': str(self.refresh)}, format='json').status_code, 200)
+        self.assertEqual(client.post('/api/auth/logout/', {'refresh': str(self.refresh)}, format='json').status_code, 205)
+        self.assertEqual(client.post('/api/auth/refresh/', {'refresh': str(self.refresh)}, format='json').status_code, 401)
+
+    def test_refresh_skips_the_blacklist_table(self):
+        client = APIClient()
+        client.post('/api/auth/refresh/', {'refresh': str(self.refresh)}, format='json')
+        with self.assertNumQueries(0):
+            response = client.post('/api/auth/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_revocations_from_other_processes_are_seen(self):
+        other = RevocationFilter()
+        self.assertFalse(other.might_be_revoked(self.refresh['jti']))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.refresh.blacklist()
+        self.assertTrue(other.might_be_revoked(self.refresh['jti']))
+
+    @override_settings(REVOCATION_SYNC_INTERVAL=0)
+    def test_revocations_committed_out_of_order_are_seen(self):
+        first, second = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        outstanding = {token.jti: token for token in OutstandingToken.objects.all()}
+        BlacklistedToken.objects.create(pk=10, token=outstanding[second['jti']])
+        other = RevocationFilter()
+        self.assertTrue(other.might_be_revoked(second['jti']))
+        # A transaction holding a lower id commits after the last sync
+        BlacklistedToken.objects.create(pk=5, token=outstanding[first['jti']])
+        self.assertTrue(other.might_be_revoked(first['jti']))
+
+    def test_purge_removes_expired_tokens(self):
+        self.refresh.blacklist()
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(days=1))
+        RefreshToken.for_user(self.user)
+        out = StringIO()
+        call_command('purge_expired_tokens', '--batch-size', '1', stdout=out)
+        self.assertIn('1 tokens expirados removidos', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        items = [f'jti-{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f'outro-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(EMAIL_OUTBOX_WORKERS=0, EMAIL_OUTBOX_RETRY_DELAY=60)
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='turista@example.com', password='senha-segura-123', nome='Turista')
+        self.client = APIClient()
+
+    def test_password_reset_is_sent_through_the_outbox(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/password-reset/', {'email': 'turista@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/reset-password/', mail.outbox[0].body)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, OutboundEmail.STATUS_SENT)
+        # The reset link is rendered at send time and never stored
+        self.assertEqual(email.corpo, '')
+
+    def test_unknown_email_gets_the_same_response(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            known = self.client.post('/api/auth/password-reset/', {'email': 'turista@example.com'}, format='json')
+            unknown = self.client.post('/api/auth/password-reset/', {'email': 'ninguem@example.com'}, format='json')
+        self.assertEqual((unknown.status_code, unknown.data), (known.status_code, known.data))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['turista@example.com'])
+        skipped = OutboundEmail.objects.get(destinatarios=['ninguem@example.com'])
+        self.assertEqual(skipped.status, OutboundEmail.STATUS_SKIPPED)
+
+    @override_settings(EMAIL_OUTBOX_WORKERS=1)
+    def test_view_only_records_the_request(self):
+        for address in ('turista@example.com', 'ninguem@example.com'):
+            with mock.patch.object(outbox, 'get_executor') as executor, self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+                response = self.client.post('/api/auth/password-reset/', {'email': address}, format='json')
+            self.assertEqual(response.status_code, 200)
+            executor.return_value.submit.assert_called_once()
+            outbox._flush_scheduled.clear()
+        emails = OutboundEmail.objects.all()
+        self.assertEqual(len(emails), 2)
+        self.assertTrue(all(e.status == OutboundEmail.STATUS_PENDING and not e.corpo for e in emails))
+
+    def test_emails_are_sent_in_batches_over_one_connection(self):
+        for i in range(5):
+            outbox.enqueue('Aviso', f'Mensagem {i}', [f'turista{i}@example.com'])
+        with override_settings(EMAIL_OUTBOX_BATCH_SIZE=2), mock.patch.object(outbox, 'get_connection', wraps=outbox.get_connection) as get_connection:
+            self.assertEqual(outbox.flush(), 5)
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_failed_send_is_retried_later(self):
+        email = outbox.enqueue('Aviso', 'Mensagem', ['turista@example.com'])
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('SMTP indisponível')):
+            self.assertEqual(outbox.flush(), 0)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.tentativas), (OutboundEmail.STATUS_PENDING, 1))
+        self.assertGreater(email.proxima_tentativa, timezone.now())
+
+        OutboundEmail.objects.update(proxima_tentativa=timezone.now())
+        out = StringIO()
+        call_command('send_outbox_emails', stdout=out)
+        self.assertIn('1 emails enviados', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_password_reset_is_throttled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            responses = [
+                self.client.post('/api/auth/password-reset/', {'email': f'ninguem{i}@example.com'}, format='json')
+                for i in range(6)
+            ]
+        self.assertEqual([r.status_code for r in responses], [200] * 5 + [429])
+        self.assertEqual(OutboundEmail.objects.count(), 5)
+
+    def test_finished_emails_are_purged_after_retention(self):
+        old = timezone.now() - timedelta(days=8)
+        for status in (OutboundEmail.STATUS_SENT, OutboundEmail.STATUS_SKIPPED, OutboundEmail.STATUS_FAILED, OutboundEmail.STATUS_PENDING):
+            OutboundEmail.objects.create(tipo=OutboundEmail.TYPE_PASSWORD_RESET, destinatarios=['ninguem@example.com'], status=status, data_criacao=old)
+        recent = OutboundEmail.objects.create(destinatarios=['ninguem@example.com'], status=OutboundEmail.STATUS_SKIPPED)
+        self.assertEqual(outbox.purge(batch_size=2), 3)
+        self.assertEqual(
+            set(OutboundEmail.objects.values_list('status', flat=True)),
+            {OutboundEmail.STATUS_PENDING, recent.status},
+        )
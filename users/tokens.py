@@ -0,0 +1,18 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from .revocation import revoked_tokens
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token cuja verificação de revogação passa primeiro pelo filtro em
+    memória: a tabela de tokens revogados só é consultada quando o filtro não
+    descarta o ``jti``.
+    """
+    def check_blacklist(self):
+        if revoked_tokens.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        revoked_tokens.add(self.payload[api_settings.JTI_CLAIM])
+        return result
@@ -1,18 +1,16 @@
 from rest_framework import status, permissions
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import get_user_model
-from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_encode
-from django.utils.encoding import force_bytes
-from django.core.mail import send_mail
-from django.conf import settings
+from asgiref.sync import sync_to_async
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from . import outbox
+from .models import OutboundEmail
 from .serializers import UserSerializer, UserCreateSerializer, PasswordResetSerializer
-
-User = get_user_model()
+from .tokens import RefreshToken
+from roteiro_ibiapaba.asyncviews import AsyncAPIView
+from roteiro_ibiapaba.query_budget import QueryBudgetMixin
 
 class SignupView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -71,7 +69,8 @@ class LogoutView(APIView):
         """
         Encerra a sessão do usuário.
         
-        Adiciona o token de atualização à lista negra, invalidando-o.
+        Adiciona o token de atualização à lista negra, invalidando-o, e ao
+        filtro de tokens revogados consultado nas renovações.
         """
         try:
             refresh_token = request.data["refresh"]
@@ -81,46 +80,44 @@ class LogoutView(APIView):
         except Exception:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-class PasswordResetView(APIView):
+class PasswordResetView(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
+    # Every anonymous request writes an outbox row
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'password_reset'
     
     @swagger_auto_schema(
         operation_description="Envia um email com link para redefinição de senha",
         request_body=PasswordResetSerializer,
         responses={
             200: "Email de redefinição de senha enviado",
-            400: "Email inválido"
+            400: "Email inválido",
+            429: "Muitas solicitações; tente novamente mais tarde"
         }
     )
-    def post(self, request):
+    async def post(self, request):
         """
         Envia um email com link para redefinição de senha.
         
-        Gera um token único e envia um link para o email do usuário.
+        A requisição só grava o pedido na caixa de saída (``users.outbox``);
+        a busca do usuário, a geração do token e o envio acontecem no envio
+        (``users.emails.password_reset``). A resposta é a mesma, e leva o
+        mesmo tempo, exista ou não uma conta com o email informado.
         """
         serializer = PasswordResetSerializer(data=request.data)
         if serializer.is_valid():
-            email = serializer.validated_data['email']
-            try:
-                user = User.objects.get(email=email)
-                token = default_token_generator.make_token(user)
-                uid = urlsafe_base64_encode(force_bytes(user.pk))
-                reset_link = f"{request.scheme}://{request.get_host()}/reset-password/{uid}/{token}/"
-                
-                send_mail(
-                    'Redefinição de senha - Roteiro Ibiapaba',
-                    f'Clique no link para redefinir sua senha: {reset_link}',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [email],
-                    fail_silently=False,
-                )
-                return Response({'detail': 'Email de redefinição de senha enviado.'}, status=status.HTTP_200_OK)
-            except User.DoesNotExist:
-                # Não informamos ao usuário que o email não existe por segurança
-                return Response({'detail': 'Email de redefinição de senha enviado.'}, status=status.HTTP_200_OK)
+            reset_base_url = f"{request.scheme}://{request.get_host()}/reset-password/"
+            await sync_to_async(outbox.enqueue_template)(
+                OutboundEmail.TYPE_PASSWORD_RESET,
+                [serializer.validated_data['email']],
+                {'reset_base_url': reset_base_url},
+            )
+            return Response({'detail': 'Email de redefinição de senha enviado.'}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class UserProfileView(APIView):
+class UserProfileView(QueryBudgetMixin, APIView):
+    query_budget = {'get': 1, 'put': 3}
+    
     @swagger_auto_schema(
         operation_description="Retorna os dados do perfil do usuário autenticado",
         responses={